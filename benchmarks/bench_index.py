@@ -0,0 +1,102 @@
+"""
+SummaryStore（要約の索引付きストア）のベンチマーク。
+
+合成した会議 CSV 相当の行を --rows 件取り込み、よく使う検索
+（全文検索・カテゴリ / stance / タグ / 年の絞り込み・その組み合わせ）の
+所要時間を測る。同じ行をもう一度取り込んで件数が増えないことも確かめる。
+
+    python benchmarks/bench_index.py [--rows 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sumry import stance  # noqa: E402
+from sumry.store import SummaryStore  # noqa: E402
+
+CATEGORIES = [
+    "福祉・包摂（高齢・障がい・困窮）", "子育て・教育", "議会・選挙・ガバナンス",
+    "防災・安全", "都市計画・交通", "環境・エネルギー", "産業・観光", "財政・行政改革",
+]
+TOPICS = [
+    ("子ども食堂", "孤食,貧困対策"), ("学校給食", "給食費,無償化"), ("防災訓練", "避難所,自主防災"),
+    ("公共交通", "コミュニティバス,高齢者"), ("再生可能エネルギー", "太陽光,脱炭素"),
+    ("空き家対策", "空き家,移住"), ("DX推進", "デジタル化,窓口"), ("観光振興", "インバウンド,宿泊税"),
+]
+STANCES = sorted(set(stance.STANCE_CANON.values()))
+
+
+def synthetic_meetings(rows, rows_per_meeting=20, seed=0):
+    """(base_id, rows) を rows 件ぶん作る。base_id には会議日を含める。"""
+    rng = random.Random(seed)
+    for m in range(0, rows, rows_per_meeting):
+        year = rng.choice((2022, 2023, 2024, 2025))
+        base_id = f"city{m % 300:03d}_{year}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}_{m:06d}"
+        meeting = []
+        for i in range(min(rows_per_meeting, rows - m)):
+            topic, tags = rng.choice(TOPICS)
+            minute = i * 3
+            ts = f"{minute // 60:02d}:{minute % 60:02d}:00"
+            meeting.append([
+                base_id, f"{topic}に関する質疑", f"({ts}) {topic}について議員が現状と課題を質問し、"
+                f"執行部が今後の方針を答弁した。", rng.choice(CATEGORIES), tags,
+                rng.choice(STANCES), f"{ts}〜{ts}",
+            ])
+        yield base_id, meeting
+
+
+def timed(label, fn, repeat=5):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<48} {best * 1000:9.2f} ms   {len(result)} hit(s)")
+    return best
+
+
+def run(rows, limit):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SummaryStore(os.path.join(tmp, "summaries.sqlite"))
+        meetings = list(synthetic_meetings(rows))
+        started = time.perf_counter()
+        for base_id, meeting in meetings:
+            store.ingest_rows(base_id, meeting)
+        elapsed = time.perf_counter() - started
+        print(f"ingest: {rows} row(s) in {len(meetings)} meeting(s), {elapsed:.2f} s "
+              f"({rows / elapsed:.0f} rows/s)")
+
+        base_id, meeting = meetings[0]
+        store.ingest_rows(base_id, meeting)
+        total = len(store.search(limit=rows + 1))
+        if total != rows:
+            raise SystemExit(f"re-ingest changed row count: {total} != {rows}")
+        print("re-ingest is idempotent")
+
+        worst = max(
+            timed("text '子ども食堂'", lambda: store.search("子ども食堂", limit=limit)),
+            timed("text '給食' (2 chars, LIKE)", lambda: store.search("給食", limit=limit)),
+            timed("stance '検討中'", lambda: store.search(stance="検討中", limit=limit)),
+            timed("tag '孤食'", lambda: store.search(tag="孤食", limit=limit)),
+            timed("year 2025", lambda: store.search(year=2025, limit=limit)),
+            timed("'子ども食堂' + 検討中 + 2025", lambda: store.search(
+                "子ども食堂", stance="検討中", year=2025, limit=limit)),
+            timed("category + tag '太陽光'", lambda: store.search(
+                category="環境・エネルギー", tag="太陽光", limit=limit)),
+        )
+        store.close()
+    print(f"slowest query: {worst * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    run(args.rows, args.limit)
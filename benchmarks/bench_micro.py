@@ -0,0 +1,63 @@
+"""
+ホットパスの関数ごとのマイクロベンチマーク。
+
+    python benchmarks/bench_micro.py [--hours 6]
+
+parse_srt_as_subs / chunk_srt_subs_with_timestamp / parse_structured_output /
+normalize_stance の 1 呼び出しあたりの時間を測る。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from sumry import stance, srt, llm  # noqa: E402
+from bench_srt_parse import write_synthetic_srt  # noqa: E402
+
+CSV_REPLY = (
+    "headline,overview,category,tags,stance,timestamp\n"
+    '"子ども食堂への支援拡大案","(00:12:30) 地域の子ども食堂への財政支援の必要性について議論。'
+    '山田議員が孤食問題と経済格差の影響を挙げて支援拡大を提案。","福祉・包摂（高齢・障がい・困窮）",'
+    '"子ども食堂,孤食,貧困対策","前向きに検討","00:12:30〜00:15:00"'
+)
+BRACKET_REPLY = (
+    "【headline】子ども食堂への支援拡大案\n【overview】(00:12:30) 財政支援の必要性について議論。\n"
+    "【category】福祉・包摂（高齢・障がい・困窮）\n【tags】子ども食堂,孤食\n"
+    "【stance】前向き\n【timestamp】00:12:30〜00:15:00"
+)
+
+
+def bench(label, stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=3))
+    per_call = best / number
+    unit, scale = ("ms", 1e3) if per_call >= 1e-3 else ("µs", 1e6)
+    print(f"{label:<42} {per_call * scale:10.2f} {unit}/call")
+
+
+def run(hours, interval):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.srt")
+        write_synthetic_srt(path, hours, interval)
+        subs_list = srt.parse_srt_as_subs(path)
+        print(f"synthetic SRT: {hours} h, {len(subs_list)} subtitle(s)")
+
+        bench("parse_srt_as_subs", lambda: srt.parse_srt_as_subs(path), 3)
+        bench("chunk_srt_subs_with_timestamp (60 min)",
+              lambda: srt.chunk_srt_subs_with_timestamp(subs_list, 60), 3)
+    bench("parse_structured_output (CSV)", lambda: llm.parse_structured_output(CSV_REPLY), 20000)
+    bench("parse_structured_output (【】)", lambda: llm.parse_structured_output(BRACKET_REPLY), 20000)
+    bench("normalize_stance (hit)", lambda: stance.normalize_stance("前向きに検討したい"), 100000)
+    bench("normalize_stance (miss)", lambda: stance.normalize_stance("特に言及はなかった"), 100000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hours", type=float, default=6.0)
+    parser.add_argument("--interval", type=float, default=2.0)
+    args = parser.parse_args()
+    run(args.hours, args.interval)
@@ -0,0 +1,139 @@
+"""
+パイプライン全体（parse → chunk → summarize → unify + id 列 → 移動）のベンチマーク。
+
+合成 SRT を一時ディレクトリに書き出し、fake_llm_server.FakeLLMServer を
+別スレッドで立てて cli.main() をそのまま実行する。
+
+    python benchmarks/bench_pipeline.py --files 20 --hours 3 --latency 0.8 --jitter 0.4 --workers 8
+
+報告する値:
+    files/min、チャンクごとの要約レイテンシ p50 / p95、ピーク RSS、
+    各ステージ（parse+chunk / summarize / unify / finalize）の合計時間
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from sumry import cli, pipeline  # noqa: E402
+from bench_srt_parse import write_synthetic_srt  # noqa: E402
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+
+class StageTimer:
+    """sumry.pipeline が呼ぶ関数を差し替えて、呼び出しごとの所要時間を集める。"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._originals = []
+
+    def wrap(self, module, name, stage):
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.samples.setdefault(stage, []).append(elapsed)
+
+        setattr(module, name, timed)
+        self._originals.append((module, name, original))
+
+    def restore(self):
+        for module, name, original in reversed(self._originals):
+            setattr(module, name, original)
+        self._originals = []
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def peak_rss_mb():
+    # Linux の ru_maxrss は KB 単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run(args):
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    server = FakeLLMServer(latency=args.latency, jitter=args.jitter, error_429=args.error_429,
+                           error_5xx=args.error_5xx, retry_after=args.retry_after, rpm=args.rpm,
+                           seed=0)
+    base_url = server.start()
+
+    timer = StageTimer()
+    timer.wrap(pipeline, "chunk_subs", "parse+chunk")
+    timer.wrap(pipeline, "summarize_chunk", "summarize")
+    timer.wrap(pipeline, "unify_and_save_csv", "unify+id")
+    timer.wrap(pipeline, "finalize_file", "finalize")
+
+    with tempfile.TemporaryDirectory() as api_dir:
+        for i in range(args.files):
+            write_synthetic_srt(os.path.join(api_dir, f"bench_{i:04d}.srt"), args.hours, args.interval)
+
+        # 合成 SRT はどれも同じ内容なので、重複検出を切らないと 2 件目以降が使い回しになる
+        argv = ["--api-dir", api_dir, "--base-url", base_url, "--no-cache", "--no-dedup",
+                "--workers", str(args.workers), "--max-retries", str(args.max_retries),
+                "--chunk-mode", args.chunk_mode] + args.extra
+        started = time.perf_counter()
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                cli.main(argv)
+        finally:
+            elapsed = time.perf_counter() - started
+            timer.restore()
+            server.stop()
+        done = len(os.listdir(os.path.join(api_dir, "done_srt")))
+
+    latencies = timer.samples.get("summarize", [])
+    print(f"files: {done}/{args.files} in {elapsed:.2f} s  ({done * 60.0 / elapsed:.1f} files/min)")
+    print(f"chunks: {len(latencies)}  latency p50 {percentile(latencies, 0.5):.3f} s  "
+          f"p95 {percentile(latencies, 0.95):.3f} s")
+    print(f"peak RSS: {peak_rss_mb():.1f} MB")
+    print(f"server responses: {dict(sorted(server.status_counts.items()))}")
+    print("stage totals (summed over calls; summarize runs concurrently):")
+    for stage in ("parse+chunk", "summarize", "unify+id", "finalize"):
+        values = timer.samples.get(stage, [])
+        print(f"  {stage:<12} {sum(values):9.3f} s  over {len(values)} call(s)")
+    if args.verbose:
+        print(log.getvalue())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--hours", type=float, default=3.0, help="1 ファイルあたりの長さ（時間）")
+    parser.add_argument("--interval", type=float, default=3.0, help="字幕 1 件あたりの秒数（密度）")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--chunk-mode", choices=["time", "tokens", "topics"], default="time")
+    parser.add_argument("--latency", type=float, default=0.5, help="偽サーバーの応答待ち時間（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--verbose", action="store_true", help="sumry の出力も表示する")
+    parser.add_argument("extra", nargs=argparse.REMAINDER,
+                        help="sumry にそのまま渡す追加の引数（-- の後ろに書く）")
+    args = parser.parse_args()
+    if args.extra[:1] == ["--"]:
+        args.extra = args.extra[1:]
+    run(args)
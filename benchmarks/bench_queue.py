@@ -0,0 +1,132 @@
+"""
+複数ワーカー（--queue）の分担の確認とベンチマーク。
+
+合成 SRT を置いた共有 api_dir に対して sumry（python -m sumry）を --procs 個の別プロセスで
+同時に起動し、fake_llm_server.FakeLLMServer を相手に処理させる。
+
+    python benchmarks/bench_queue.py --files 12 --procs 3 --queue files
+    python benchmarks/bench_queue.py --files 2 --hours 6 --procs 3 --queue chunks
+    python benchmarks/bench_queue.py --procs 3 --kill-after 1.5 --lease-seconds 3
+
+--kill-after を付けると最初のワーカーを SIGKILL し、リースの期限切れ後に
+もう 1 つワーカーを走らせて残りを拾わせる（落ちたワーカーの後始末の確認）。
+
+確かめること:
+    * どの SRT も CSV がちょうど 1 つ、"CSV saved to" もちょうど 1 回（確定は 1 回だけ）
+    * 要約リクエスト数がチャンク数と同じ（二重に要約していない。kill した場合は
+      落ちたワーカーが送った分だけ増えうる）
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from sumry import srt  # noqa: E402
+from bench_srt_parse import write_synthetic_srt  # noqa: E402
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+
+def worker_command(api_dir, base_url, args, worker_id):
+    return [sys.executable, "-u", "-m", "sumry", "--api-dir", api_dir,
+            "--base-url", base_url, "--queue", args.queue, "--lease-seconds", str(args.lease_seconds),
+            "--worker-id", worker_id, "--workers", str(args.workers), "--no-cache", "--no-dedup",
+            "--no-prefilter", "--no-index"]
+
+
+def run(args):
+    server = FakeLLMServer(latency=args.latency, jitter=args.jitter, seed=0)
+    base_url = server.start()
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-fake"))
+
+    with tempfile.TemporaryDirectory() as api_dir, tempfile.TemporaryDirectory() as state_dir:
+        # SQLite はワーカーごとのローカルな場所に置かれる（ここでは使わないが ~/.cache を汚さない）
+        env["SUMRY_STATE_DIR"] = state_dir
+        expected_chunks = 0
+        for i in range(args.files):
+            path = os.path.join(api_dir, f"queue_{i:04d}.srt")
+            write_synthetic_srt(path, args.hours, args.interval)
+            expected_chunks += len(srt.chunk_subs(srt.iter_srt_subs(path)))
+
+        logs = []
+        procs = []
+        started = time.perf_counter()
+        for n in range(args.procs):
+            log = open(os.path.join(api_dir, f".worker{n}.log"), "w")
+            logs.append(log)
+            procs.append(subprocess.Popen(worker_command(api_dir, base_url, args, f"worker{n}"),
+                                          stdout=log, stderr=subprocess.STDOUT, env=env, cwd=ROOT))
+        if args.kill_after:
+            time.sleep(args.kill_after)
+            procs[0].send_signal(signal.SIGKILL)
+            print(f"killed worker0 after {args.kill_after:g}s")
+        for proc in procs:
+            proc.wait()
+        if args.kill_after:
+            # 落ちたワーカーのリースが切れてから、後始末のワーカーを走らせる
+            time.sleep(args.lease_seconds + 0.5)
+            log = open(os.path.join(api_dir, ".worker-sweep.log"), "w")
+            logs.append(log)
+            subprocess.run(worker_command(api_dir, base_url, args, "sweeper"),
+                           stdout=log, stderr=subprocess.STDOUT, env=env, cwd=ROOT, check=False)
+        elapsed = time.perf_counter() - started
+        server.stop()
+        for log in logs:
+            log.close()
+
+        saved = {}
+        takeovers = 0
+        for name in sorted(os.listdir(api_dir)):
+            if name.startswith(".worker") and name.endswith(".log"):
+                with open(os.path.join(api_dir, name), encoding="utf-8") as f:
+                    for line in f:
+                        if "expired; taking over" in line:
+                            takeovers += 1
+                        if line.startswith("CSV saved to:"):
+                            base_id = line.rsplit("(id: ", 1)[1].rstrip(")\n")
+                            saved.setdefault(base_id, []).append(name)
+        csvs = [n for n in os.listdir(api_dir) if n.endswith(".csv")]
+        done = os.listdir(os.path.join(api_dir, "done_srt"))
+        left = [n for n in os.listdir(api_dir) if n.endswith(".srt")]
+        requests = server.status_counts.get(200, 0)
+
+        print(f"{args.procs} worker process(es), --queue {args.queue}: {len(done)}/{args.files} file(s) "
+              f"in {elapsed:.2f}s ({len(done) * 60.0 / elapsed:.1f} files/min)")
+        print(f"summary requests: {requests} for {expected_chunks} chunk(s) "
+              f"({requests - expected_chunks} duplicate(s))")
+        print(f"CSV files: {len(csvs)}, finalizations: "
+              f"{sum(len(v) for v in saved.values())}, SRTs left: {len(left)}, "
+              f"expired lease(s) taken over: {takeovers}")
+        twice = {k: v for k, v in saved.items() if len(v) > 1}
+        ok = len(csvs) == args.files and not twice and not left
+        if not args.kill_after:
+            ok = ok and requests == expected_chunks
+        if twice:
+            print(f"finalized more than once: {twice}")
+        print("OK" if ok else "FAILED")
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--hours", type=float, default=2.0, help="1 ファイルあたりの長さ（時間）")
+    parser.add_argument("--interval", type=float, default=3.0, help="字幕 1 件あたりの秒数（密度）")
+    parser.add_argument("--procs", type=int, default=3, help="同時に起動する sumry のプロセス数")
+    parser.add_argument("--workers", type=int, default=4, help="各プロセスの --workers")
+    parser.add_argument("--queue", choices=["files", "chunks"], default="files")
+    parser.add_argument("--lease-seconds", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.3, help="偽サーバーの応答待ち時間（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--kill-after", type=float, default=0.0,
+                        help="この秒数後に最初のワーカーを SIGKILL する（0 = しない）")
+    args = parser.parse_args()
+    run(args)
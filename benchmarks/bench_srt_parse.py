@@ -0,0 +1,115 @@
+"""
+SRT パース + チャンク化のベンチマーク。
+
+合成した 24 時間分の SRT に対して、旧実装（pysrt で全体を読み込み、
+"HH:MM:SS,mmm" 文字列を経由してチャンク化）と、ストリーミング実装
+（iter_srt_subs → iter_srt_chunks）の所要時間とピークメモリを比べる。
+
+    python benchmarks/bench_srt_parse.py [--hours 24] [--interval 2.0]
+
+pysrt が入っていない環境ではストリーミング実装だけを計測する。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sumry import srt  # noqa: E402
+
+
+def write_synthetic_srt(path, hours, interval_sec):
+    """interval_sec ごとに 1 字幕が並ぶ hours 時間分の SRT を書き出す。"""
+    step_ms = int(interval_sec * 1000)
+    total_ms = int(hours * 3600 * 1000)
+    with open(path, "w", encoding="utf-8") as f:
+        for i, start_ms in enumerate(range(0, total_ms, step_ms), 1):
+            end_ms = start_ms + step_ms - 100
+            f.write(f"{i}\n{srt.format_srt_time(start_ms)} --> {srt.format_srt_time(end_ms)}\n")
+            f.write(f"○{i % 7 + 1}番議員　子ども食堂への支援について質問いたします。第{i}項\n\n")
+
+
+def legacy_parse_and_chunk(file_path, max_minutes=60):
+    import pysrt
+
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        srt_content = f.read()
+    subs = pysrt.from_string(srt_content)
+    subs_list = []
+    for sub in subs:
+        start_time_str = f"{sub.start.hours:02}:{sub.start.minutes:02}:{sub.start.seconds:02},{sub.start.milliseconds:03}"
+        subs_list.append((sub.index, start_time_str, sub.text))
+
+    max_duration_sec = max_minutes * 60
+    chunks = []
+    current_text = []
+    first_timestamp_in_chunk = None
+    first_time_sec = None
+    for (_, start_time_str, sub_text) in subs_list:
+        h, m, rest = start_time_str.split(':')
+        s, ms = rest.split(',')
+        current_sec = int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000.0
+        if first_time_sec is None:
+            first_time_sec = current_sec
+            first_timestamp_in_chunk = start_time_str
+        if current_sec - first_time_sec >= max_duration_sec and current_text:
+            chunks.append({'text': ''.join(current_text), 'timestamp': first_timestamp_in_chunk})
+            current_text = []
+            first_time_sec = current_sec
+            first_timestamp_in_chunk = start_time_str
+        current_text.append(f"{start_time_str} {sub_text}\n")
+    if current_text:
+        chunks.append({'text': ''.join(current_text), 'timestamp': first_timestamp_in_chunk})
+    return chunks
+
+
+def streaming_parse_and_chunk(file_path, max_minutes=60):
+    return list(srt.iter_srt_chunks(srt.iter_srt_subs(file_path), max_minutes))
+
+
+def streaming_parse_only(file_path):
+    """チャンク本文も保持しない場合（サブ字幕を数えるだけ）の下限。"""
+    return sum(1 for _ in srt.iter_srt_subs(file_path))
+
+
+def measure(label, fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:8.3f} s   peak {peak / 1e6:8.1f} MB")
+    return result
+
+
+def run(hours, interval_sec):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.srt")
+        write_synthetic_srt(path, hours, interval_sec)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"synthetic SRT: {hours} h, one subtitle every {interval_sec} s, {size_mb:.1f} MB")
+
+        new_chunks = measure("streaming parse + chunk", streaming_parse_and_chunk, path)
+        measure("streaming parse only", streaming_parse_only, path)
+        try:
+            import pysrt  # noqa: F401
+        except ImportError:
+            print("pysrt is not installed; skipping the legacy path")
+            return
+        old_chunks = measure("legacy pysrt parse + chunk", legacy_parse_and_chunk, path)
+        if old_chunks != new_chunks:
+            raise SystemExit("streaming and legacy chunkers disagree")
+        print(f"outputs identical ({len(new_chunks)} chunk(s))")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="字幕 1 件あたりの秒数")
+    args = parser.parse_args()
+    run(args.hours, args.interval)
@@ -0,0 +1,69 @@
+"""
+normalize_stance のマイクロベンチマーク。
+
+過去 CSV の stance 列を模した 1M 行に対して、旧実装（呼び出しごとに
+キーをソートして線形に部分一致）、Aho-Corasick 版の normalize_stance、
+一括 API の normalize_stances の 1 行あたりのコストを比べる。
+
+    python benchmarks/bench_stance.py [--rows 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sumry import stance  # noqa: E402
+
+
+def legacy_normalize_stance(text):
+    if not text or text.upper() == "NULL":
+        return "情報不足・判断不能"
+    for key in sorted(stance.STANCE_CANON.keys(), key=len, reverse=True):
+        if key in text:
+            return stance.STANCE_CANON[key]
+    return text.strip()
+
+
+def synthetic_column(rows, seed=0):
+    """LLM が返しがちな stance 表記（正規ラベル・言い換え・NULL・自由記述）を混ぜた列。"""
+    rng = random.Random(seed)
+    labels = sorted(set(stance.STANCE_CANON.values()))
+    phrasings = [
+        "前向き・推進意向", "検討中・調査中", "導入済み・決定済み", "否定・反対",
+        "判断困難・情報不足", "前向きに検討したい", "国の動向を注視しつつ検討",
+        "慎重に判断", "条例改正で制度化", "NULL", "", "特になし",
+    ]
+    pool = labels + phrasings + list(stance.STANCE_CANON)
+    return [rng.choice(pool) for _ in range(rows)]
+
+
+def timed(label, rows, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed:8.3f} s   {elapsed / rows * 1e9:8.0f} ns/row")
+    return result
+
+
+def run(rows):
+    column = synthetic_column(rows)
+    print(f"{rows} rows, {len(set(column))} distinct value(s)")
+    legacy = timed("legacy (sort + linear scan)", rows,
+                   lambda: [legacy_normalize_stance(v) for v in column])
+    per_row = timed("normalize_stance (automaton)", rows,
+                    lambda: [stance.normalize_stance(v) for v in column])
+    bulk = timed("normalize_stances (bulk)", rows,
+                 lambda: stance.normalize_stances(column))
+    if not (legacy == per_row == bulk):
+        raise SystemExit("normalizers disagree")
+    print("outputs identical")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.rows)
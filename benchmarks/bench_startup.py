@@ -0,0 +1,108 @@
+"""
+起動時間（cold start）の確認とベンチマーク。CI で予算を超えたら失敗する。
+
+    python benchmarks/bench_startup.py [--budget-ms 150] [--runs 5]
+
+別プロセスで `python -X importtime -c "import sumry.cli"` を --runs 回実行し、
+sumry.cli の import にかかった時間（依存を含む累計）の中央値を出す。
+あわせて次を確かめる:
+
+    * import しただけでは重い依存（openai / tiktoken）を読み込まない
+    * 処理する SRT が無い api_dir での実行（cron で毎回起きるケース）でも
+      openai を読み込まず、--budget-ms × 2 以内に終わる
+
+どれかを満たさなければ終了コード 1。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("openai", "tiktoken")
+
+
+def import_times(code, env):
+    """`python -X importtime -c code` の結果を {モジュール名: 累計 µs} で返す。"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative.strip())
+        except ValueError:
+            pass  # 見出し行
+    return times
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def heavy_imports(times):
+    return sorted(name for name in times if name.split(".")[0] in HEAVY_MODULES)
+
+
+def run(args):
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-fake"))
+    # .pyc を書いておく（初回のコンパイル時間は測らない）
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "sumry"], cwd=ROOT, check=True)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    ok = True
+    samples = []
+    heavy = set()
+    for _ in range(args.runs):
+        times = import_times("import sumry.cli", env)
+        samples.append(times["sumry.cli"] / 1000.0)
+        heavy.update(heavy_imports(times))
+    import_ms = median(samples)
+    print(f"import sumry.cli: {import_ms:.1f} ms (median of {args.runs}, budget {args.budget_ms:g} ms)")
+    if import_ms > args.budget_ms:
+        print("  over budget")
+        ok = False
+    if heavy:
+        print(f"  heavy module(s) imported eagerly: {', '.join(sorted(heavy)[:5])}")
+        ok = False
+
+    with tempfile.TemporaryDirectory() as api_dir:
+        argv = ["--api-dir", api_dir, "--no-cache", "--no-index", "--no-dedup"]
+        code = ("import sys, sumry.cli; sumry.cli.main(sys.argv[1:]); "
+                "print('HEAVY', *[m for m in sys.modules if m.split('.')[0] in %r])" % (HEAVY_MODULES,))
+        walls = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", code] + argv, cwd=ROOT, env=env,
+                                  capture_output=True, text=True, check=True)
+            walls.append((time.perf_counter() - started) * 1000.0)
+        loaded = proc.stdout.strip().splitlines()[-1].split()[1:]
+    wall_ms = median(walls)
+    wall_budget = args.budget_ms * 2
+    print(f"no-op run (empty api_dir): {wall_ms:.1f} ms wall (median of {args.runs}, "
+          f"budget {wall_budget:g} ms)")
+    if wall_ms > wall_budget:
+        print("  over budget")
+        ok = False
+    if loaded:
+        print(f"  heavy module(s) imported: {', '.join(sorted(loaded)[:5])}")
+        ok = False
+
+    print("OK" if ok else "FAILED")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="import sumry.cli の予算（ミリ秒）。空実行はこの 2 倍まで")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args)
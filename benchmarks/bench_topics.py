@@ -0,0 +1,172 @@
+"""
+議題ごとの分割（--chunk-mode topics）の確認とベンチマーク。
+
+議題ごとに語彙の違う発言を並べた合成 SRT（議題の変わり目には議長の
+「次に、日程第N …を議題とします」や長い休憩を入れる）を作り、
+iter_topic_segments の区切りが本当の議題の変わり目とどれだけ合うかと、
+time / tokens / topics の各モードのチャンクの大きさ・分割の所要時間を比べる。
+
+    python benchmarks/bench_topics.py [--hours 6] [--agenda-minutes 25]
+
+報告する値:
+    各モードのチャンク数とトークン数の分布、分割の所要時間、
+    区切りの precision / recall（本当の変わり目から ±--tolerance 字幕以内を正解とする）。
+    precision は上限なし（手がかりだけで区切った場合）と --max-segment-tokens
+    ありの両方を出す。上限ありでは長い議題の途中でも切るので precision は下がる。
+    デフォルト（topics では --merge-topics が有効）で CSV に残る行の区切りとして、
+    上限ありのセグメントを merge_adjacent_topic_rows でまとめた後の値も出す。
+    LLM は呼ばず、各セグメントで多く出る議題の語を tags / headline にした行で代用する。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sumry import srt, store  # noqa: E402
+
+AGENDA = [
+    ("子ども食堂", ["子ども食堂", "孤食", "貧困対策", "地域ボランティア", "食材提供", "利用者数"]),
+    ("学校給食", ["学校給食", "給食費", "無償化", "アレルギー対応", "地産地消", "栄養教諭"]),
+    ("防災", ["防災訓練", "避難所", "自主防災組織", "ハザードマップ", "備蓄倉庫", "避難行動要支援者"]),
+    ("公共交通", ["コミュニティバス", "デマンド交通", "路線再編", "運行本数", "乗降客数", "交通空白地"]),
+    ("再エネ", ["太陽光発電", "脱炭素", "省エネ設備", "公共施設", "温室効果ガス", "再生可能エネルギー"]),
+    ("空き家", ["空き家バンク", "移住定住", "老朽危険家屋", "固定資産税", "利活用", "所有者不明"]),
+    ("DX", ["電子申請", "窓口業務", "マイナンバーカード", "システム標準化", "デジタル人材", "オンライン手続"]),
+    ("観光", ["観光客数", "インバウンド", "宿泊税", "観光協会", "周遊ルート", "地域資源"]),
+]
+FILLER = ["について伺います。", "の現状はどうなっているのか。", "の課題をどう認識しているか。",
+          "については今後も検討してまいります。", "の拡充を求めます。", "に関して答弁いたします。",
+          "の予算措置について確認したい。", "は重要な課題と考えております。"]
+SPEAKERS = ["○議長", "○3番議員", "○7番議員", "○市長", "○教育長", "○担当部長"]
+
+
+def write_topical_srt(path, hours, agenda_minutes, interval_sec, seed=0):
+    """
+    agenda_minutes 前後ごとに議題が変わる SRT を書き出し、
+    新しい議題が始まる字幕の位置（0 始まり）の一覧を返す。
+    """
+    rng = random.Random(seed)
+    total_ms = int(hours * 3600 * 1000)
+    step_ms = int(interval_sec * 1000)
+    boundaries = []
+    start_ms, i, topic = 0, 0, -1
+    with open(path, "w", encoding="utf-8") as f:
+        while start_ms < total_ms:
+            topic = (topic + 1 + rng.randrange(len(AGENDA) - 1)) % len(AGENDA)
+            name, terms = AGENDA[topic]
+            length_ms = int(agenda_minutes * 60_000 * rng.uniform(0.5, 1.5))
+            lines = []
+            if i:
+                boundaries.append(i)
+                cue = rng.random()
+                if cue < 0.4:
+                    lines.append(f"○議長　次に、日程第{len(boundaries) + 1}、{name}に関する件を議題とします。")
+                elif cue < 0.7:
+                    # 長い休憩のあとに再開
+                    start_ms += rng.randint(60, 600) * 1000
+                    lines.append(f"○議長　それでは{name}について質問を許します。")
+                # 残りは手がかりなし（語彙の変化だけ）
+            topic_end_ms = min(total_ms, start_ms + length_ms)
+            while start_ms < topic_end_ms:
+                text = lines.pop(0) if lines else (
+                    f"{rng.choice(SPEAKERS)}　{rng.choice(terms)}{rng.choice(FILLER)}"
+                    f"{rng.choice(terms)}{rng.choice(FILLER)}")
+                end_ms = start_ms + step_ms - rng.randint(100, 900)
+                f.write(f"{i + 1}\n{srt.format_srt_time(start_ms)} --> "
+                        f"{srt.format_srt_time(end_ms)}\n{text}\n\n")
+                start_ms += step_ms
+                i += 1
+            if rng.random() < 0.5:
+                lines = []
+                f.write(f"{i + 1}\n{srt.format_srt_time(start_ms)} --> "
+                        f"{srt.format_srt_time(start_ms + 2000)}\n○議長　以上で質疑を終結いたします。\n\n")
+                start_ms += step_ms
+                i += 1
+    # 最後の休憩で total_ms を越えた場合、その後ろに字幕は無い
+    return [b for b in boundaries if b < i]
+
+
+def segment_starts(subs, segments):
+    """セグメントの先頭字幕の位置（0 始まり、最初のセグメントを除く）。"""
+    position = {srt.format_srt_time(sub.start_ms): n for n, sub in enumerate(subs)}
+    return [position[segment['timestamp']] for segment in segments[1:]]
+
+
+def proxy_rows(segments):
+    """
+    LLM の要約の代わりに、セグメントに多く出る議題の語（上位 3 つ）を tags、
+    最も多い語を headline にした行を作る（merge_adjacent_topic_rows に渡す用）。
+    """
+    vocabulary = [term for _, terms in AGENDA for term in terms]
+    rows = []
+    for segment in segments:
+        counts = sorted(((segment['text'].count(term), term) for term in vocabulary), reverse=True)
+        tags = [term for count, term in counts[:3] if count]
+        rows.append([f"{tags[0] if tags else '議事'}について", "", "議会・選挙・ガバナンス",
+                     ",".join(tags), "検討中", f"{segment['timestamp']}〜{segment['timestamp']}"])
+    return rows
+
+
+def merged_starts(subs, segments):
+    """proxy_rows をまとめた後に残る行の先頭字幕の位置（最初の行を除く）。"""
+    position = {srt.format_srt_time(sub.start_ms): n for n, sub in enumerate(subs)}
+    rows = store.merge_adjacent_topic_rows(proxy_rows(segments))
+    return [position[row[5].split("〜", 1)[0]] for row in rows[1:]]
+
+
+def score(found, truth, tolerance):
+    hits = sum(1 for b in found if any(abs(b - t) <= tolerance for t in truth))
+    recalled = sum(1 for t in truth if any(abs(b - t) <= tolerance for b in found))
+    precision = hits / len(found) if found else 0.0
+    recall = recalled / len(truth) if truth else 1.0
+    return precision, recall
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "topical.srt")
+        truth = write_topical_srt(path, args.hours, args.agenda_minutes, args.interval, args.seed)
+        subs = list(srt.iter_srt_subs(path))
+    print(f"synthetic SRT: {args.hours:g} h, {len(subs)} subtitle(s), {len(truth) + 1} agenda item(s)")
+
+    modes = [
+        ("time (60 min)", dict(mode="time", compact=False)),
+        ("tokens", dict(mode="tokens", compact=False)),
+        ("topics", dict(mode="topics", compact=False, min_segment_tokens=args.min_segment_tokens,
+                        max_segment_tokens=args.max_segment_tokens)),
+        ("topics (no max)", dict(mode="topics", compact=False, min_segment_tokens=args.min_segment_tokens,
+                                 max_segment_tokens=10 ** 9)),
+    ]
+    for label, options in modes:
+        started = time.perf_counter()
+        chunks = srt.chunk_subs(subs, **options)
+        elapsed = time.perf_counter() - started
+        stats = srt.chunk_token_stats(chunks)
+        line = f"{label:<16} {elapsed * 1000:8.1f} ms  {srt.format_token_stats(stats)}"
+        if options["mode"] == "topics":
+            precision, recall = score(segment_starts(subs, chunks), truth, args.tolerance)
+            line += f"\n{'':<16} boundaries: precision {precision:.2f}, recall {recall:.2f}"
+            if options["max_segment_tokens"] == args.max_segment_tokens:
+                merged = merged_starts(subs, chunks)
+                precision, recall = score(merged, truth, args.tolerance)
+                line += (f"\n{'':<16} after --merge-topics (default): {len(merged) + 1} row(s), "
+                         f"precision {precision:.2f}, recall {recall:.2f}")
+        print(line)
+    print(f"(boundaries within ±{args.tolerance} subtitle(s) of an agenda change count as correct)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hours", type=float, default=6.0)
+    parser.add_argument("--agenda-minutes", type=float, default=25.0, help="1 議題の平均の長さ（分）")
+    parser.add_argument("--interval", type=float, default=8.0, help="字幕 1 件あたりの秒数（密度）")
+    parser.add_argument("--min-segment-tokens", type=int, default=srt.DEFAULT_MIN_SEGMENT_TOKENS)
+    parser.add_argument("--max-segment-tokens", type=int, default=srt.DEFAULT_MAX_SEGMENT_TOKENS)
+    parser.add_argument("--tolerance", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args)
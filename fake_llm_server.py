@@ -0,0 +1,279 @@
+"""
+OpenAI 互換の chat.completions を返すローカルの偽サーバー。
+
+API キーもネットワークも無い環境で、リトライ・バックオフ・流量制御や
+パイプライン全体の動きを確かめるためのもの。
+
+* latency / jitter 秒だけ待ってから固定の CSV 行を返す
+* error_429 / error_5xx の割合で 429 / 500・503 を返す（retry-after ヘッダー付き）
+* rpm を超えたリクエストには 429 と x-ratelimit-* ヘッダーを返す
+* "stream": true なら SSE で stream_chars 文字ずつ、token_interval 秒おきに返す
+* malformed の割合で、CSV の代わりに散文を返す。trailer_chars > 0 なら CSV 行のあとに
+  その長さの余計な注記を付ける（ストリーミングの早期打ち切りの確認用）
+
+    python fake_llm_server.py --port 8089 --latency 0.5 --error-429 0.1 --error-5xx 0.05
+    python main.py --base-url http://127.0.0.1:8089/v1 --api-dir ...
+
+プログラムからは FakeLLMServer(...).start() で別スレッドで起動できる
+（戻り値は base_url）。
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+MALFORMED_REPLY = (
+    "承知しました。以下に、ご提示いただいた字幕テキストの内容を整理して要約します。"
+    "まず、本会議では複数の議題が取り上げられており、それぞれについて質疑と答弁が行われました。"
+    "主な論点としては予算の執行状況、地域の防災体制、子育て支援の拡充などが挙げられます。" * 4
+)
+
+def canned_reply(messages):
+    """user メッセージの "Timestamp: ..." を使って、それらしい CSV を 1 行返す。"""
+    text = messages[-1].get("content", "") if messages else ""
+    if "'Yes'" in text and "'No'" in text:
+        return "Yes"
+    start = "00:00:00"
+    if "Timestamp: " in text:
+        start = text.split("Timestamp: ", 1)[1].split()[0].split(",")[0]
+    return (
+        "headline,overview,category,tags,stance,timestamp\n"
+        f'"{start} からの議題","({start}) 偽サーバーによる要約。背景、質疑、答弁、今後の方向性。",'
+        f'"議会・選挙・ガバナンス","議会運営,質疑","検討中","{start}〜{start}"'
+    )
+
+
+class FakeLLMServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_429=0.0, error_5xx=0.0, retry_after=1.0, rpm=0,
+                 reply=canned_reply, seed=None, token_interval=0.0, stream_chars=4,
+                 malformed=0.0, trailer_chars=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.retry_after = retry_after
+        self.rpm = rpm
+        self.reply = reply
+        self.token_interval = token_interval
+        self.stream_chars = max(1, stream_chars)
+        self.malformed = malformed
+        self.trailer_chars = trailer_chars
+        self.status_counts = {}
+        self.streams_aborted = 0
+        self._random = random.Random(seed)
+        self._window = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def _count(self, status):
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def _content(self, messages):
+        content = self.reply(messages)
+        if "," not in content:
+            return content
+        with self._lock:
+            malformed = self._random.random() < self.malformed
+        if malformed:
+            return MALFORMED_REPLY
+        if self.trailer_chars:
+            note = "以上の内容は字幕から自動生成したものです。" * (self.trailer_chars // 21 + 1)
+            content += "\n\n※ 補足：" + note[:self.trailer_chars]
+        return content
+
+    def _decide(self):
+        """(status, headers) を決める。200 なら通常応答。"""
+        with self._lock:
+            roll = self._random.random()
+            if self.rpm:
+                now = time.monotonic()
+                self._window = [t for t in self._window if now - t < 60.0]
+                if len(self._window) >= self.rpm:
+                    reset = 60.0 - (now - self._window[0])
+                    return 429, {
+                        "x-ratelimit-limit-requests": str(self.rpm),
+                        "x-ratelimit-remaining-requests": "0",
+                        "x-ratelimit-reset-requests": f"{reset:.3f}s",
+                    }
+                self._window.append(now)
+            headers = {}
+            if self.rpm:
+                remaining = self.rpm - len(self._window)
+                headers = {
+                    "x-ratelimit-limit-requests": str(self.rpm),
+                    "x-ratelimit-remaining-requests": str(remaining),
+                    "x-ratelimit-reset-requests": f"{60.0 - (time.monotonic() - self._window[0]):.3f}s",
+                }
+        if roll < self.error_429:
+            return 429, {"retry-after": f"{self.retry_after:g}"}
+        if roll < self.error_429 + self.error_5xx:
+            return self._random.choice((500, 503)), {"retry-after": f"{self.retry_after:g}"}
+        return 200, headers
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload, headers):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                server._count(status)
+
+            def _send_event(self, payload):
+                data = json.dumps(payload, ensure_ascii=False)
+                self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def _send_stream(self, content, request, headers, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.close_connection = True
+                server._count(200)
+                base = {
+                    "id": f"chatcmpl-fake-{time.time_ns()}",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                }
+                step = server.stream_chars
+                try:
+                    for i in range(0, len(content), step):
+                        if i and server.token_interval:
+                            time.sleep(server.token_interval)
+                        delta = {"content": content[i:i + step]}
+                        if i == 0:
+                            delta["role"] = "assistant"
+                        self._send_event({**base, "choices": [
+                            {"index": 0, "delta": delta, "finish_reason": None}]})
+                    self._send_event({**base, "choices": [
+                        {"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                    if (request.get("stream_options") or {}).get("include_usage"):
+                        self._send_event({**base, "choices": [], "usage": usage})
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # クライアントが途中で切った（早期打ち切り）
+                    with server._lock:
+                        server.streams_aborted += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}"}}, {})
+                    return
+
+                delay = server.latency + server._random.uniform(0, server.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+
+                status, headers = server._decide()
+                if status != 200:
+                    error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+                    self._send_json(status, {"error": {"message": f"injected {status}",
+                                                       "type": error_type}}, headers)
+                    return
+
+                messages = request.get("messages", [])
+                content = server._content(messages)
+                prompt_chars = sum(len(m.get("content", "")) for m in messages)
+                usage = {
+                    "prompt_tokens": prompt_chars,
+                    "completion_tokens": len(content),
+                    "total_tokens": prompt_chars + len(content),
+                }
+                if request.get("stream"):
+                    self._send_stream(content, request, headers, usage)
+                    return
+                if server.token_interval:
+                    # ストリーミングと同じだけ生成に時間がかかることにする
+                    time.sleep(server.token_interval * (len(content) // server.stream_chars))
+                payload = {
+                    "id": f"chatcmpl-fake-{time.time_ns()}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                }
+                self._send_json(200, payload, headers)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI 互換のローカル偽サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答までの基本待ち時間（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency に足すランダムな待ち時間の最大（秒）")
+    parser.add_argument("--error-429", type=float, default=0.0, help="429 を返す割合")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="500/503 を返す割合")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="エラー時の retry-after（秒）")
+    parser.add_argument("--rpm", type=int, default=0, help="requests/min の上限（0 = 無制限）")
+    parser.add_argument("--token-interval", type=float, default=0.0,
+                        help="ストリーミング時、stream-chars 文字ごとの待ち時間（秒）")
+    parser.add_argument("--stream-chars", type=int, default=4, help="ストリーミング 1 イベントあたりの文字数")
+    parser.add_argument("--malformed", type=float, default=0.0, help="CSV ではない散文を返す割合")
+    parser.add_argument("--trailer-chars", type=int, default=0, help="CSV 行のあとに付ける余計な注記の文字数")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.jitter,
+                           args.error_429, args.error_5xx, args.retry_after, args.rpm,
+                           seed=args.seed, token_interval=args.token_interval,
+                           stream_chars=args.stream_chars, malformed=args.malformed,
+                           trailer_chars=args.trailer_chars)
+    print(f"=== Fake LLM server listening on {server.base_url} ===")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+議会の字幕（SRT）を議題ごとに要約して CSV にまとめる。
+
+    sumry --api-dir /path/to/srt            # pip install -e . したとき
+    python -m sumry --api-dir /path/to/srt
+
+    srt       SRT の読み込みとチャンク化（時間 / トークン数 / 議題）
+    llm       OpenAI クライアント・応答キャッシュ・ストリーミング・プロンプト
+    pipeline  複数ファイルのステージ型パイプライン（journal / leases / dedup を使う）
+    store     要約 CSV の書き出しと索引付きストア
+    batch     バッチ投入モード、watch は常駐モード、cli はコマンドライン
+
+import sumry だけでは何も読み込まない。main() は sumry.cli にあり、
+sumry コマンドと python -m sumry（__main__.py）のときだけ読み込まれる
+（openai などの重い依存は、さらに実際に使うときまで読み込まない）。
+"""
+__version__ = "0.1.0"
@@ -0,0 +1,313 @@
+"""オフライン・バッチ投入モード（JSONL リクエストファイル）。"""
+import os
+import shutil
+import time
+import json
+
+from .srt import chunk_subs, iter_srt_subs
+from .llm import build_summary_messages, LLM_MODEL, SUMMARY_MAX_TOKENS
+from .journal import open_chunk_journal
+from .pipeline import FileJob, finalize_file
+
+############################################
+# オフライン・バッチ投入モード（JSONL リクエストファイル）
+############################################
+BATCH_ENDPOINT = "/v1/chat/completions"
+_BATCH_ID_SEP = "::"
+_BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+def make_batch_custom_id(base_id, timestamp):
+    return f"{base_id}{_BATCH_ID_SEP}{timestamp}"
+
+def split_batch_custom_id(custom_id):
+    base_id, timestamp = custom_id.rsplit(_BATCH_ID_SEP, 1)
+    return base_id, timestamp
+
+def _batch_chunks(job, chunk_options, prefilter):
+    """バッチで要約するチャンク。逐次の Yes/No 確認はできないので、ローカル判定の "skip" だけ落とす。"""
+    chunks = chunk_subs(iter_srt_subs(job.file_path), **(chunk_options or {}))
+    return [chunk_data for chunk_data in chunks
+            if prefilter is None or prefilter.classify(chunk_data['text']) != "skip"]
+
+def write_batch_requests(jobs, request_path, chunk_options=None, prefilter=None, api_dir=None,
+                         ready=None):
+    """
+    jobs（FileJob の列）の全チャンク（prefilter で落ちたものを除く）を
+    1 つの JSONL リクエストファイルに書き出す。
+    custom_id は "<base_id>::<チャンク先頭タイムスタンプ>"。
+    api_dir を渡すと、前回のバッチでジャーナルに残った（要約済みの）チャンクは書き出さない。
+    全チャンクがジャーナルにあるファイルの FileJob は ready に追加する。
+    書き出したリクエスト数を返す。
+    """
+    count = 0
+    with open(request_path, "w", encoding="utf-8") as f:
+        for job in jobs:
+            try:
+                chunks = _batch_chunks(job, chunk_options, prefilter)
+            except Exception as e:
+                print(f"=== ERROR parsing {job.filename}: {e}")
+                continue
+            if api_dir is not None:
+                journal = open_chunk_journal(api_dir, job.base_id)
+                if len(journal):
+                    chunks = [chunk_data for chunk_data in chunks if journal.lookup(chunk_data) is None]
+                    print(f"=== Resuming: {job.filename} ({len(journal)} chunk(s) in journal) ===")
+                    if not chunks and ready is not None:
+                        ready.append(job)
+            for chunk_data in chunks:
+                request = {
+                    "custom_id": make_batch_custom_id(job.base_id, chunk_data['timestamp']),
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {
+                        "model": LLM_MODEL,
+                        "messages": build_summary_messages(chunk_data['text'], chunk_data['timestamp']),
+                        "max_tokens": SUMMARY_MAX_TOKENS,
+                        "temperature": 0.0,
+                    },
+                }
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+def submit_batch(client, request_path):
+    """リクエストファイルをアップロードしてバッチを作成する。"""
+    with open(request_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    return client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+
+def wait_for_batch(client, batch_id, poll_interval=60.0):
+    """バッチが終了状態になるまでポーリングし、最終的な batch オブジェクトを返す。"""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        print(f"=== Batch {batch_id}: {batch.status} ===")
+        if batch.status in _BATCH_FINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+def iter_batch_results(result_path):
+    """
+    結果 JSONL を 1 行ずつ読み、(custom_id, content, error) を返す。
+    失敗したリクエストは content が None。
+    """
+    with open(result_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record.get("custom_id", "")
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                yield custom_id, None, record.get("error") or response
+                continue
+            body = response.get("body") or {}
+            content = body["choices"][0]["message"]["content"].strip()
+            yield custom_id, content, None
+
+def _finalize_batch_file(job, outputs, api_dir, done_srt_dir, chunk_options, prefilter,
+                         consolidator, store, merge_topics):
+    """
+    1 ファイル分のバッチ結果（{タイムスタンプ: 出力}）をジャーナルに記録し、
+    全チャンクがそろっていれば finalize_file に流す。確定したら True を返す。
+    足りないチャンク（失敗・結果なし）があれば SRT とジャーナルを残し、次のバッチで
+    その分だけを投入し直す。
+    """
+    chunks = _batch_chunks(job, chunk_options, prefilter)
+    job.journal = open_chunk_journal(api_dir, job.base_id)
+    for chunk_data in chunks:
+        output = outputs.get(chunk_data['timestamp'])
+        if output is not None and job.journal.lookup(chunk_data) is None:
+            job.journal.record(chunk_data, output)
+    all_csv_outputs = [job.journal.lookup(chunk_data) for chunk_data in chunks]
+    missing = all_csv_outputs.count(None)
+    if missing:
+        print(f"=== Leaving {job.filename} for the next batch: {missing} chunk(s) failed ===")
+        return False
+    finalize_file(job, all_csv_outputs, api_dir, done_srt_dir, consolidator, store,
+                  merge_topics=merge_topics)
+    return True
+
+def finalize_batch_results(result_path, api_dir, done_srt_dir, consolidator=None, store=None,
+                           merge_topics=False, chunk_options=None, prefilter=None, ready=()):
+    """
+    バッチ結果をファイル単位にまとめ、チャンクのタイムスタンプ順に並べて
+    finalize_file（unify_and_save_csv で id 列ごと一度に書き出す → 移動）に流す。
+    chunk_options / prefilter は write_batch_requests と同じものを渡す（チャンクを
+    ジャーナルと突き合わせるため）。失敗したチャンクがあるファイルは確定しない。
+    ready（FileJob の列）は、結果が無くても全チャンクがジャーナルにあるファイル。
+    処理したファイル数を返す。
+    """
+    outputs_by_id = {}
+    if result_path is not None:
+        for custom_id, content, error in iter_batch_results(result_path):
+            base_id, timestamp = split_batch_custom_id(custom_id)
+            outputs = outputs_by_id.setdefault(base_id, {})
+            if error is not None:
+                print(f"=== ERROR summarizing chunk at {timestamp} ({base_id}): {error}")
+                continue
+            outputs[timestamp] = content
+
+    jobs = {job.base_id: job for job in ready}
+    for base_id in outputs_by_id:
+        if base_id not in jobs:
+            jobs[base_id] = FileJob(f"{base_id}.srt", os.path.join(api_dir, f"{base_id}.srt"), base_id)
+
+    processed = 0
+    for base_id in sorted(jobs):
+        job = jobs[base_id]
+        if not os.path.isfile(job.file_path):
+            print(f"=== Skipping {job.filename} (no longer in {api_dir}) ===")
+            continue
+        try:
+            if _finalize_batch_file(job, outputs_by_id.get(base_id, {}), api_dir, done_srt_dir,
+                                    chunk_options, prefilter, consolidator, store, merge_topics):
+                processed += 1
+        except Exception as e:
+            print(f"=== ERROR finalizing {job.filename}: {e}")
+    return processed
+
+def run_batch(client, jobs, api_dir, done_srt_dir, batch_id=None, poll_interval=60.0,
+              chunk_options=None, prefilter=None, consolidator=None, store=None, merge_topics=False):
+    """
+    バッチモードの一連の流れ（JSONL 作成 → 投入 → ポーリング → 結果の取り込み）。
+    batch_id を渡すと投入済みバッチの待機から再開する。
+    """
+    batch_dir = os.path.join(api_dir, ".batch")
+    os.makedirs(batch_dir, exist_ok=True)
+
+    ready = []
+    if batch_id is None:
+        request_path = os.path.join(batch_dir, f"requests_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        count = write_batch_requests(jobs, request_path, chunk_options, prefilter, api_dir, ready)
+        if count == 0:
+            print("=== Batch: no pending chunks ===")
+            return finalize_batch_results(None, api_dir, done_srt_dir, consolidator, store,
+                                          merge_topics, chunk_options, prefilter, ready)
+        batch = submit_batch(client, request_path)
+        batch_id = batch.id
+        print(f"=== Batch submitted: {batch_id} ({count} request(s), {request_path}) ===")
+
+    batch = wait_for_batch(client, batch_id, poll_interval)
+    if batch.status != "completed" or not batch.output_file_id:
+        print(f"=== Batch {batch_id} ended with status {batch.status} ===")
+        return 0
+
+    result_path = os.path.join(batch_dir, f"{batch_id}_output.jsonl")
+    client.files.content(batch.output_file_id).write_to_file(result_path)
+    return finalize_batch_results(result_path, api_dir, done_srt_dir, consolidator, store,
+                                  merge_topics, chunk_options, prefilter, ready)
+
+class LocalBatchClient:
+    """
+    バッチ API のローカル代替。オフラインで投入 → ポーリング → 取得の往復を確かめるためのもの。
+
+    files.create / batches.create / batches.retrieve / files.content を
+    openai モジュールと同じ形で提供する。各リクエストの応答は
+    responder(custom_id, body) -> str で作る（デフォルトは固定の CSV 行。例外を投げると
+    そのリクエストは status_code 500 の失敗として結果に入る）。
+    pending_polls 回の retrieve までは "in_progress" を返す。
+    """
+
+    def __init__(self, store_dir, responder=None, pending_polls=1):
+        self.store_dir = store_dir
+        self.responder = responder or self.canned_response
+        self.pending_polls = pending_polls
+        self._batches = {}
+        self._polls = {}
+        self._counter = 0
+        os.makedirs(store_dir, exist_ok=True)
+        self.files = _LocalBatchFiles(self)
+        self.batches = _LocalBatchBatches(self)
+
+    @staticmethod
+    def canned_response(custom_id, body):
+        base_id, timestamp = split_batch_custom_id(custom_id)
+        start = timestamp.split(",")[0]
+        return (
+            "headline,overview,category,tags,stance,timestamp\n"
+            f'"{base_id} {start} の議題","({start}) ローカル代替による要約。",'
+            f'"議会・選挙・ガバナンス","NULL","検討中","{start}〜{start}"'
+        )
+
+    def _next_id(self, prefix):
+        self._counter += 1
+        return f"{prefix}-local-{self._counter}"
+
+    def _path(self, file_id):
+        return os.path.join(self.store_dir, f"{file_id}.jsonl")
+
+    def _run(self, batch):
+        output_id = self._next_id("file")
+        with open(self._path(batch.input_file_id), "r", encoding="utf-8") as src, \
+                open(self._path(output_id), "w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    content = self.responder(request["custom_id"], request["body"])
+                    response = {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                    }
+                except Exception as e:
+                    response = {"status_code": 500, "body": {"error": {"message": str(e)}}}
+                record = {
+                    "id": self._next_id("resp"),
+                    "custom_id": request["custom_id"],
+                    "response": response,
+                    "error": None,
+                }
+                dst.write(json.dumps(record, ensure_ascii=False) + "\n")
+        batch.status = "completed"
+        batch.output_file_id = output_id
+
+class _LocalBatchFiles:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, file, purpose):
+        file_id = self._owner._next_id("file")
+        with open(self._owner._path(file_id), "wb") as dst:
+            shutil.copyfileobj(file, dst)
+        return _LocalObject(id=file_id, purpose=purpose)
+
+    def content(self, file_id):
+        return _LocalFileContent(self._owner._path(file_id))
+
+class _LocalBatchBatches:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, input_file_id, endpoint, completion_window):
+        batch = _LocalObject(id=self._owner._next_id("batch"), status="validating",
+                             input_file_id=input_file_id, endpoint=endpoint,
+                             completion_window=completion_window, output_file_id=None)
+        self._owner._batches[batch.id] = batch
+        self._owner._polls[batch.id] = 0
+        return batch
+
+    def retrieve(self, batch_id):
+        batch = self._owner._batches[batch_id]
+        if batch.status not in _BATCH_FINAL_STATUSES:
+            self._owner._polls[batch_id] += 1
+            if self._owner._polls[batch_id] > self._owner.pending_polls:
+                self._owner._run(batch)
+            else:
+                batch.status = "in_progress"
+        return batch
+
+class _LocalObject:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+class _LocalFileContent:
+    def __init__(self, path):
+        self._path = path
+
+    def write_to_file(self, file):
+        shutil.copyfile(self._path, file)
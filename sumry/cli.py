@@ -0,0 +1,361 @@
+"""コマンドライン（sumry / python -m sumry）の入口。"""
+import os
+import argparse
+import signal
+import threading
+import time
+import hashlib
+
+from . import metrics
+from . import llm
+from .metrics import Metrics
+from .stance import normalize_stance_csv_dir
+from .srt import (DEFAULT_MAX_CHUNK_TOKENS, DEFAULT_MAX_SEGMENT_TOKENS, DEFAULT_MIN_SEGMENT_TOKENS,
+                  DEFAULT_MIN_SILENCE_MS)
+from .llm import (LLMCache, LLMClient, MAX_CONCURRENCY, _openai, RateLimiter, REQUESTS_PER_MINUTE,
+                  SYSTEM_PROMPT, TOKENS_PER_MINUTE)
+from .store import ConsolidatedCsvWriter, SummaryStore
+from .dedup import DEFAULT_DEDUP_THRESHOLD, DuplicateIndex
+from .leases import DEFAULT_LEASE_SECONDS, LeaseQueue
+from .pipeline import ChunkPrefilter, collect_pending_jobs, run_pipeline
+from .batch import LocalBatchClient, run_batch
+from .watch import (DEFAULT_WATCH_MAX_ATTEMPTS, DEFAULT_WATCH_RETRY_DELAY, FileRetryTracker,
+                    watch_pending_jobs)
+
+DEFAULT_API_DIR = "/Users/minkoil/yoyaku"
+
+def run_search(store, args):
+    """--search の結果を表示する。"""
+    started = time.perf_counter()
+    rows = store.search(args.search, args.category, args.stance, args.tag, args.year, args.limit)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for row in rows:
+        overview = row['overview'] or ""
+        print(f"{row['id']}\t{row['meeting_date'] or '-'}\t{row['timestamp']}\t"
+              f"[{row['category']} / {row['stance']}] {row['headline']}")
+        print(f"    {overview[:120]}{'…' if len(overview) > 120 else ''}")
+    print(f"=== {len(rows)} result(s) in {elapsed_ms:.1f} ms ===")
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="sumry", description="SRT 議事録を LLM で要約して CSV にする")
+    parser.add_argument("--api-dir", default=DEFAULT_API_DIR,
+                        help="処理対象の .srt を置くディレクトリ")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENCY,
+                        help="全ファイル共通の LLM 同時リクエスト数")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="ステージ間キューに載せるファイル数の上限")
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE,
+                        help="requests/min の上限（0 = 無制限）")
+    parser.add_argument("--tpm", type=int, default=TOKENS_PER_MINUTE,
+                        help="tokens/min の上限（0 = 無制限）")
+    parser.add_argument("--chunk-mode", choices=["time", "tokens", "topics"], default="time",
+                        help="チャンク分割の方式（時間幅 / トークン予算 / 議題ごと）")
+    parser.add_argument("--max-chunk-minutes", type=int, default=60,
+                        help="--chunk-mode time のチャンク幅（分）")
+    parser.add_argument("--max-chunk-tokens", type=int, default=DEFAULT_MAX_CHUNK_TOKENS,
+                        help="--chunk-mode tokens の 1 チャンクあたりのトークン予算")
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=0,
+                        help="--chunk-mode tokens で前のチャンクと重ねるトークン数")
+    parser.add_argument("--min-silence-ms", type=int, default=DEFAULT_MIN_SILENCE_MS,
+                        help="--chunk-mode tokens でこの長さ以上の無音を優先して切れ目にする")
+    parser.add_argument("--min-segment-tokens", type=int, default=DEFAULT_MIN_SEGMENT_TOKENS,
+                        help="--chunk-mode topics でこのトークン数に満たないうちは区切らない")
+    parser.add_argument("--max-segment-tokens", type=int, default=DEFAULT_MAX_SEGMENT_TOKENS,
+                        help="--chunk-mode topics の 1 セグメントあたりのトークン上限")
+    parser.add_argument("--merge-topics", dest="merge_topics", action="store_const", const=True,
+                        default=None,
+                        help="CSV に書き出す前に、隣り合う同じ議題の行を 1 行にまとめる"
+                             "（--chunk-mode topics ではデフォルトで有効。--max-segment-tokens で"
+                             "長い議題の途中を切った分をここで 1 行に戻す）")
+    parser.add_argument("--no-merge-topics", dest="merge_topics", action="store_const", const=False,
+                        help="--chunk-mode topics でも隣り合う行をまとめない")
+    parser.add_argument("--no-compact", dest="compact", action="store_false",
+                        help="字幕テキストを圧縮せず、全行に HH:MM:SS,mmm を付けたまま送る")
+    parser.add_argument("--no-prefilter", dest="prefilter", action="store_false",
+                        help="中身の無いチャンクをローカルで落とす事前判定を無効にする")
+    parser.add_argument("--prefilter-threshold", type=float, default=0.2,
+                        help="このスコア未満のチャンクは要約しない（0.0〜1.0）")
+    parser.add_argument("--prefilter-margin", type=float, default=0.15,
+                        help="threshold からこの幅までのチャンクは LLM の Yes/No 判定で確認する")
+    parser.add_argument("--no-llm-fallback", dest="llm_fallback", action="store_false",
+                        help="境界付近のチャンクも LLM で確認せずに要約する")
+    parser.add_argument("--consolidate", choices=["day", "municipality"], default=None,
+                        help="確定した行を会議日別（base_id の日付）/ 自治体別（base_id の '_' より前）の"
+                             "集約 CSV にも追記する")
+    parser.add_argument("--consolidated-dir", default=None,
+                        help="集約 CSV の出力先（デフォルト: <api-dir>/consolidated）")
+    parser.add_argument("--watch", action="store_true",
+                        help="終了せずに常駐し、api-dir に置かれた .srt を順次処理する（SIGTERM で停止）")
+    parser.add_argument("--watch-settle-seconds", type=float, default=5.0,
+                        help="この秒数サイズが変わらなくなったファイルを書き込み完了とみなす")
+    parser.add_argument("--watch-poll-interval", type=float, default=10.0,
+                        help="inotify が使えないとき（および取りこぼし対策）の走査間隔（秒）")
+    parser.add_argument("--watch-max-attempts", type=int, default=DEFAULT_WATCH_MAX_ATTEMPTS,
+                        help="watch モードで 1 ファイルを要約し直す回数の上限（超えたら再起動まで止める）")
+    parser.add_argument("--watch-retry-delay", type=float, default=DEFAULT_WATCH_RETRY_DELAY,
+                        help="watch モードで失敗したファイルを再試行するまでの最初の待ち時間（秒、失敗ごとに倍）")
+    parser.add_argument("--index-db", default=None,
+                        help="要約の検索用索引（SQLite）のパス（デフォルト: <api-dir>/summaries.sqlite、"
+                             "--queue ではホストごとのローカルな場所）")
+    parser.add_argument("--no-index", dest="index", action="store_false",
+                        help="確定した行を検索用索引に取り込まない")
+    parser.add_argument("--queue", choices=["files", "chunks"], default=None,
+                        help="共有の api-dir を複数のワーカー（別マシン可）で分担する。files: ファイル単位で"
+                             "リースを取る / chunks: チャンク単位でリースを取り、大きなファイルも分担する。"
+                             "SQLite（キャッシュ・索引・指紋 DB）は共有せず、ホストごとのローカルな場所"
+                             "（SUMRY_STATE_DIR）に置く")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="ハートビートが途絶えてからリースを期限切れとみなすまでの秒数")
+    parser.add_argument("--worker-id", default=None,
+                        help="リースに記録するワーカー名（デフォルト: ホスト名:PID）")
+    parser.add_argument("--dedup-db", default=None,
+                        help="ほぼ同じ字幕を検出するための指紋 DB のパス（デフォルト: <api-dir>/.dedup.sqlite、"
+                             "--queue ではホストごとのローカルな場所）")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false",
+                        help="ほぼ同じ字幕の検出と要約の使い回しをしない")
+    parser.add_argument("--dedup-threshold", type=float, default=DEFAULT_DEDUP_THRESHOLD,
+                        help="同じとみなす MinHash 類似度（Jaccard 係数の推定値）の下限")
+    parser.add_argument("--dedup-chunks", action="store_true",
+                        help="ファイル全体が一致しなくても、ほぼ同じチャンクの要約を使い回す"
+                             "（重なりのある録画は新しい部分だけ要約する）")
+    parser.add_argument("--ingest-dir", default=None, metavar="DIR",
+                        help="要約はせず、DIR 内の既存 CSV を索引に取り込んで終了する（何度実行しても重複しない）")
+    parser.add_argument("--search", nargs="?", const="", default=None, metavar="TEXT",
+                        help="要約はせず、索引を検索して終了する（TEXT は headline / overview の全文検索）")
+    parser.add_argument("--category", default=None, help="--search の絞り込み: category")
+    parser.add_argument("--stance", default=None, help="--search の絞り込み: stance（正規化後のラベル）")
+    parser.add_argument("--tag", default=None, help="--search の絞り込み: tags に含まれるタグ")
+    parser.add_argument("--year", type=int, default=None, help="--search の絞り込み: 会議の年（base_id の日付）")
+    parser.add_argument("--limit", type=int, default=50, help="--search で表示する最大件数")
+    parser.add_argument("--normalize-stance-dir", default=None, metavar="DIR",
+                        help="要約はせず、DIR 内の既存 CSV の stance 列を一括で正規化して終了する")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI 互換 API のベース URL（デフォルト: 環境変数 OPENAI_BASE_URL または公式 API）")
+    parser.add_argument("--stream", action="store_true",
+                        help="要約をストリーミングで受け取り、CSV の 1 行が揃った時点（または書式外と"
+                             "分かった時点）で打ち切る")
+    parser.add_argument("--llm-timeout", type=float, default=120.0,
+                        help="1 リクエストあたりのタイムアウト（秒）")
+    parser.add_argument("--max-retries", type=int, default=6,
+                        help="429 / 5xx / タイムアウト時の最大再試行回数")
+    parser.add_argument("--metrics-jsonl", default=None, metavar="PATH",
+                        help="ステージ時間・トークン数・コストなどを JSON Lines で追記するファイル")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Prometheus 形式の /metrics をこのポートで公開する")
+    parser.add_argument("--cache-path", default=None,
+                        help="LLM 応答キャッシュの SQLite ファイル（デフォルト: <api-dir>/.llm_cache.sqlite、"
+                             "--queue ではホストごとのローカルな場所）")
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument("--no-cache", dest="cache_mode", action="store_const",
+                            const="bypass", help="キャッシュを読み書きしない")
+    cache_mode.add_argument("--refresh-cache", dest="cache_mode", action="store_const",
+                            const="refresh", help="キャッシュを読まずに API を呼び、結果で上書きする")
+    parser.set_defaults(cache_mode="use")
+    parser.add_argument("--cache-max-entries", type=int, default=None,
+                        help="キャッシュに残す最大件数（古い順に削除）")
+    parser.add_argument("--cache-max-age-days", type=float, default=None,
+                        help="これより古いキャッシュを削除する日数")
+    parser.add_argument("--batch", action="store_true",
+                        help="全チャンクを JSONL にまとめてバッチ API に投入し、完了後に CSV 化する")
+    parser.add_argument("--batch-id", default=None,
+                        help="投入済みバッチの完了待ちから再開する（--batch と併用）")
+    parser.add_argument("--batch-local", action="store_true",
+                        help="バッチ API の代わりにローカル代替を使う（オフライン確認用）")
+    parser.add_argument("--batch-poll-interval", type=float, default=60.0,
+                        help="バッチ状態をポーリングする間隔（秒）")
+    return parser
+
+def local_state_dir(api_dir):
+    """
+    --queue のときに SQLite（LLM キャッシュ・索引・指紋 DB）を置くホストごとのローカルな場所。
+    SQLite の WAL は共有メモリを使うので、ネットワーク越しの共有ディレクトリには置けない。
+    環境変数 SUMRY_STATE_DIR（デフォルト: $XDG_CACHE_HOME/sumry または ~/.cache/sumry）の下に、
+    api_dir ごとのディレクトリを作る。
+    """
+    base = os.getenv("SUMRY_STATE_DIR") or os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "sumry")
+    api_dir = os.path.realpath(api_dir)
+    digest = hashlib.sha1(api_dir.encode("utf-8")).hexdigest()[:8]
+    path = os.path.join(base, f"{os.path.basename(api_dir) or 'root'}-{digest}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _is_within(path, directory):
+    path, directory = os.path.realpath(path), os.path.realpath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    api_dir = args.api_dir
+
+    if args.normalize_stance_dir:
+        files, changed = normalize_stance_csv_dir(args.normalize_stance_dir)
+        print(f"=== Normalized stance in {files} CSV file(s): {changed} row(s) changed ===")
+        return
+
+    index_path = args.index_db or os.path.join(api_dir, "summaries.sqlite")
+    if args.search is not None or args.ingest_dir:
+        store = SummaryStore(index_path)
+        try:
+            if args.ingest_dir:
+                files, rows = store.ingest_dir(args.ingest_dir)
+                print(f"=== Indexed {rows} row(s) from {files} CSV file(s) into {index_path} ===")
+            if args.search is not None:
+                run_search(store, args)
+        finally:
+            store.close()
+        return
+
+    if args.queue:
+        # 共有 api_dir に SQLite を置くと、別マシンのワーカーから同時に書かれて壊れうる
+        for flag, path in (("--cache-path", args.cache_path), ("--index-db", args.index_db),
+                           ("--dedup-db", args.dedup_db)):
+            if path and _is_within(path, api_dir):
+                parser.error(f"{flag} {path} is inside the shared --api-dir; with --queue, "
+                             f"SQLite databases must be on a local disk")
+        state_dir = local_state_dir(api_dir)
+        args.cache_path = args.cache_path or os.path.join(state_dir, "llm_cache.sqlite")
+        args.dedup_db = args.dedup_db or os.path.join(state_dir, "dedup.sqlite")
+        index_path = args.index_db or os.path.join(state_dir, "summaries.sqlite")
+        print(f"=== Keeping SQLite databases in {state_dir} (local to this host) ===")
+        if args.index and not args.index_db:
+            print(f"=== Note: this index only holds files finalized on this host; "
+                  f"use --ingest-dir {api_dir} to index every worker's CSVs ===")
+
+    # すでに完成フォルダーにCSVが存在するファイルは処理対象から除外する
+    completed_dir = os.path.join(api_dir, "完成フォルダー")
+    os.makedirs(completed_dir, exist_ok=True)
+    completed_csv_ids = {os.path.splitext(f)[0] for f in os.listdir(completed_dir) if f.endswith(".csv")}
+
+    done_srt_dir = os.path.join(api_dir, "done_srt")
+    os.makedirs(done_srt_dir, exist_ok=True)
+
+    print("=== DEBUG: Checking files in:", api_dir)
+    print(os.listdir(api_dir))
+
+    # 全ファイル共通のレート制限
+    rate_limiter = RateLimiter(args.rpm, args.tpm)
+
+    if args.metrics_jsonl or args.metrics_port:
+        metrics.METRICS = Metrics(enabled=True, jsonl_path=args.metrics_jsonl)
+        if args.metrics_port:
+            metrics.METRICS.serve_prometheus(args.metrics_port)
+            print(f"=== Metrics: http://localhost:{args.metrics_port}/metrics ===")
+    llm.LLM_CLIENT = LLMClient(base_url=args.base_url, timeout=args.llm_timeout,
+                               max_retries=args.max_retries, max_concurrency=max(1, args.workers),
+                               stream_responses=args.stream)
+    if args.cache_mode != "bypass":
+        cache_path = args.cache_path or os.path.join(api_dir, ".llm_cache.sqlite")
+        llm.LLM_CACHE = LLMCache(cache_path, args.cache_mode,
+                                 args.cache_max_entries, args.cache_max_age_days)
+
+    if args.merge_topics is None:
+        args.merge_topics = args.chunk_mode == "topics"
+
+    chunk_options = {
+        "mode": args.chunk_mode,
+        "max_minutes": args.max_chunk_minutes,
+        "max_tokens": args.max_chunk_tokens,
+        "overlap_tokens": args.chunk_overlap_tokens,
+        "min_silence_ms": args.min_silence_ms,
+        "compact": args.compact,
+        "min_segment_tokens": args.min_segment_tokens,
+        "max_segment_tokens": args.max_segment_tokens,
+    }
+
+    prefilter = None
+    if args.prefilter:
+        prefilter = ChunkPrefilter(args.prefilter_threshold, args.prefilter_margin, args.llm_fallback)
+
+    store = None
+    if args.index:
+        store = SummaryStore(index_path)
+
+    lease_queue = None
+    if args.queue:
+        lease_queue = LeaseQueue(os.path.join(api_dir, ".queue"), args.worker_id, args.lease_seconds)
+        print(f"=== Sharing {api_dir} with other workers as {lease_queue.worker_id} "
+              f"({args.queue} leases, {args.lease_seconds:g}s) ===")
+
+    dedup = None
+    if args.dedup:
+        dedup = DuplicateIndex(args.dedup_db or os.path.join(api_dir, ".dedup.sqlite"),
+                               args.dedup_threshold, args.dedup_chunks)
+
+    consolidator = None
+    if args.consolidate:
+        consolidator = ConsolidatedCsvWriter(
+            args.consolidated_dir or os.path.join(api_dir, "consolidated"), args.consolidate)
+
+    started = time.monotonic()
+    if args.batch or args.batch_local:
+        if args.batch_local:
+            client = LocalBatchClient(os.path.join(api_dir, ".batch", "local"), pending_polls=1)
+            poll_interval = 0.0
+        else:
+            client, poll_interval = _openai(), args.batch_poll_interval
+        processed = run_batch(
+            client, collect_pending_jobs(api_dir, completed_csv_ids), api_dir, done_srt_dir,
+            args.batch_id, poll_interval, chunk_options, prefilter, consolidator, store,
+            args.merge_topics)
+    elif args.watch:
+        # SIGTERM / SIGINT で新規受け付けを止め、処理中のファイルを書き出してから終了
+        stop_event = threading.Event()
+
+        def request_stop(signum, frame):
+            print(f"=== Received signal {signum}; finishing in-flight files ===")
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        seen_ids = set(completed_csv_ids)
+        retry = FileRetryTracker(args.watch_max_attempts, args.watch_retry_delay)
+        jobs = watch_pending_jobs(api_dir, seen_ids, stop_event,
+                                  args.watch_settle_seconds, args.watch_poll_interval, retry)
+        processed = run_pipeline(
+            jobs, api_dir, done_srt_dir,
+            SYSTEM_PROMPT, args.workers, rate_limiter, args.queue_size, chunk_options,
+            prefilter, consolidator, seen_ids, store, dedup,
+            lease_queue, args.queue == "chunks", args.merge_topics, retry)
+    else:
+        processed = run_pipeline(
+            collect_pending_jobs(api_dir, completed_csv_ids), api_dir, done_srt_dir,
+            SYSTEM_PROMPT, args.workers, rate_limiter, args.queue_size, chunk_options,
+            prefilter, consolidator, store=store, dedup=dedup,
+            lease_queue=lease_queue, chunk_leases=args.queue == "chunks",
+            merge_topics=args.merge_topics)
+    elapsed = time.monotonic() - started
+    files_per_minute = processed * 60.0 / elapsed if elapsed > 0 else 0.0
+    print(f"=== Done: {processed} file(s) in {elapsed:.1f}s ({files_per_minute:.2f} files/min) ===")
+    client_stats = llm.LLM_CLIENT.stats()
+    print(f"=== LLM client: {client_stats['retries']} retry(ies), {client_stats['throttled']} throttled, "
+          f"circuit opened {client_stats['circuit_opened']} time(s), "
+          f"concurrency limit {client_stats['concurrency_limit']} ===")
+    if llm.LLM_CACHE is not None:
+        stats = llm.LLM_CACHE.stats()
+        print(f"=== LLM cache: {stats['hits']} hit(s), {stats['misses']} miss(es) "
+              f"({stats['hit_rate']:.0%} hit rate) ===")
+        llm.LLM_CACHE.close()
+        llm.LLM_CACHE = None
+    if store is not None:
+        store.close()
+    if dedup is not None:
+        dedup.close()
+    if lease_queue is not None:
+        lease_queue.close()
+    if metrics.METRICS.enabled:
+        print(f"=== Tokens: {metrics.METRICS.counter_total('llm_prompt_tokens')} prompt "
+                      f"({metrics.METRICS.counter_total('llm_cached_prompt_tokens')} cached), "
+                      f"{metrics.METRICS.counter_total('llm_completion_tokens')} completion, "
+                      f"est. ${metrics.METRICS.counter_total('llm_cost_usd'):.4f} ===")
+        if args.stream:
+            ttff = metrics.METRICS.snapshot()["spans"].get("llm_time_to_first_field")
+            mean_ttff = ttff["total_s"] / ttff["count"] if ttff else 0.0
+            print(f"=== Streaming: time to first field {mean_ttff:.2f}s on average, "
+                  f"{metrics.METRICS.counter_total('llm_stream_early_stops')} early stop(s), "
+                  f"{metrics.METRICS.counter_total('llm_format_retries')} format retry(ies) ===")
+        metrics.METRICS.event("run_finished", files=processed, elapsed_s=round(elapsed, 3),
+                              **{f"llm_client_{k}": v for k, v in client_stats.items()})
+        metrics.METRICS.close()
+        metrics.METRICS = Metrics(enabled=False)
@@ -0,0 +1,264 @@
+"""ほぼ同じ字幕の検出（MinHash / LSH）と要約の使い回し。"""
+import re
+import struct
+import threading
+import time
+import hashlib
+import sqlite3
+
+from .srt import format_srt_time, parse_srt_time
+
+############################################
+# ほぼ同じ字幕の検出（MinHash / LSH）
+#   再アップロード・分割 / 結合版・別ソースのミラーを、ファイル名が違っても
+#   見つけて、既存の要約を使い回す
+############################################
+MINHASH_BINS = 64
+MINHASH_BAND_ROWS = 4
+MINHASH_SHINGLE_CHARS = 5
+DEFAULT_DEDUP_THRESHOLD = 0.8
+
+_BIN_SHIFT = 58                       # 64bit ハッシュの上位 6bit でビンを選ぶ
+_BIN_VALUE_MASK = (1 << 52) - 1       # ビンに入れる値は下位 52bit
+_EMPTY_BIN = (1 << 64) - 1
+_SIGNATURE_STRUCT = struct.Struct(f"<{MINHASH_BINS}Q")
+_FINGERPRINT_NOISE_RE = re.compile(r"\[?\d+:\d{2}:\d{2}(?:,\d{3})?\]?|[\s\u3000]+")
+
+def _minhash_bins(text):
+    """
+    One Permutation Hashing: 文字 5-gram をそれぞれ 1 回だけハッシュし、
+    上位ビットで決まるビンごとの最小値を残す（空のビンは _EMPTY_BIN）。
+    時刻と空白は除くので、同じ発言なら時刻がずれていても同じ指紋になる。
+    """
+    bins = [_EMPTY_BIN] * MINHASH_BINS
+    text = _FINGERPRINT_NOISE_RE.sub("", text)
+    n = MINHASH_SHINGLE_CHARS
+    for shingle in {text[i:i + n] for i in range(max(0, len(text) - n + 1))}:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        b = h >> _BIN_SHIFT
+        value = h & _BIN_VALUE_MASK
+        if value < bins[b]:
+            bins[b] = value
+    return bins
+
+def _merge_minhash_bins(bins_list):
+    """複数チャンクのビンを合わせて、連結したテキストのビンにする（ビンごとの最小値）。"""
+    return [min(values) for values in zip(*bins_list)] if bins_list else [_EMPTY_BIN] * MINHASH_BINS
+
+def _densify_minhash(bins):
+    """
+    空のビンを右隣（循環）の空でないビンの値で埋める（rotation densification）。
+    すべて空（テキストが短すぎる）なら None。
+    """
+    if all(value == _EMPTY_BIN for value in bins):
+        return None
+    signature = list(bins)
+    for i, value in enumerate(bins):
+        if value != _EMPTY_BIN:
+            continue
+        distance = 1
+        while bins[(i + distance) % MINHASH_BINS] == _EMPTY_BIN:
+            distance += 1
+        signature[i] = bins[(i + distance) % MINHASH_BINS] + (distance << 52)
+    return tuple(signature)
+
+def minhash_signature(text):
+    """テキストの MinHash 署名（MINHASH_BINS 個の整数のタプル）。短すぎれば None。"""
+    return _densify_minhash(_minhash_bins(text))
+
+def minhash_similarity(a, b):
+    """2 つの署名から Jaccard 係数を見積もる。"""
+    return sum(1 for x, y in zip(a, b) if x == y) / MINHASH_BINS
+
+def _lsh_buckets(signature):
+    """署名を MINHASH_BAND_ROWS 個ずつの帯に分け、(帯番号, バケット) を返す。"""
+    buckets = []
+    for band, start in enumerate(range(0, MINHASH_BINS, MINHASH_BAND_ROWS)):
+        packed = struct.pack(f"<{MINHASH_BAND_ROWS}Q", *signature[start:start + MINHASH_BAND_ROWS])
+        bucket = int.from_bytes(hashlib.blake2b(packed, digest_size=8).digest(), "little") >> 1
+        buckets.append((band, bucket))
+    return buckets
+
+def fingerprint_chunks(chunks):
+    """
+    各チャンクに chunk['minhash'] を付け、ファイル全体の署名を返す。
+    ファイルの署名はチャンクのビンを合わせたものなので、テキストを読み直さない。
+    """
+    bins_list = []
+    for chunk in chunks:
+        bins = _minhash_bins(chunk['text'])
+        chunk['minhash'] = _densify_minhash(bins)
+        bins_list.append(bins)
+    return _densify_minhash(_merge_minhash_bins(bins_list))
+
+_OUTPUT_TIME_RE = re.compile(r"(\d{1,2}):(\d{2}):(\d{2})(,\d{3})?")
+
+def shift_output_timestamps(text, delta_ms):
+    """要約中の "HH:MM:SS(,mmm)" をすべて delta_ms だけずらす（0 未満にはしない）。"""
+    if not delta_ms:
+        return text
+
+    def shift(match):
+        h, m, sec, ms = match.groups()
+        total = max(0, ((int(h) * 60 + int(m)) * 60 + int(sec)) * 1000 + delta_ms)
+        shifted = format_srt_time(total - total % 1000)
+        return shifted if ms else shifted[:-4]
+
+    return _OUTPUT_TIME_RE.sub(shift, text)
+
+class DuplicateIndex:
+    """
+    確定したファイルの MinHash 署名と、チャンクごとの署名・生の LLM 出力を
+    SQLite に残し、LSH で似たファイル / チャンクを引けるようにする。
+
+    * ファイル単位: 署名が threshold 以上似ている確定済みファイルがあれば、
+      そのファイルのチャンク出力をそのまま使い、LLM を呼ばない
+    * チャンク単位（chunk_level=True）: ファイル全体は一致しなくても、
+      似たチャンクがあればその出力を（時刻をずらして）使い、新しい部分だけ要約する
+
+    使い回した場合は dedup_links に (新しい id, 元の id, 類似度) を残す。
+    """
+
+    def __init__(self, path, threshold=DEFAULT_DEDUP_THRESHOLD, chunk_level=False):
+        self.path = path
+        self.threshold = threshold
+        self.chunk_level = chunk_level
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS dedup_files (
+                base_id TEXT PRIMARY KEY,
+                signature BLOB,
+                created_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS dedup_chunks (
+                base_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                signature BLOB,
+                output TEXT NOT NULL,
+                PRIMARY KEY (base_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS dedup_bands (
+                kind TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                base_id TEXT NOT NULL,
+                position INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dedup_bands_lookup ON dedup_bands(kind, band, bucket);
+            CREATE INDEX IF NOT EXISTS dedup_bands_owner ON dedup_bands(base_id);
+            CREATE TABLE IF NOT EXISTS dedup_links (
+                base_id TEXT NOT NULL,
+                source_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                chunks INTEGER NOT NULL,
+                created_at REAL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _candidates(self, kind, signature, exclude_id):
+        found = set()
+        for band, bucket in _lsh_buckets(signature):
+            for base_id, position in self._conn.execute(
+                    "SELECT base_id, position FROM dedup_bands WHERE kind = ? AND band = ? AND bucket = ?",
+                    (kind, band, bucket)):
+                if base_id != exclude_id:
+                    found.add((base_id, position))
+        return found
+
+    def find_file(self, signature, exclude_id=None):
+        """
+        似た確定済みファイルを探す。
+        見つかれば (元の id, 類似度, [(timestamp, signature, output), ...]) を、
+        無ければ None を返す。
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            best = None
+            for base_id, _ in self._candidates("file", signature, exclude_id):
+                row = self._conn.execute(
+                    "SELECT signature FROM dedup_files WHERE base_id = ?", (base_id,)).fetchone()
+                similarity = minhash_similarity(signature, _SIGNATURE_STRUCT.unpack(row[0]))
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (base_id, similarity)
+            if best is None:
+                return None
+            records = [
+                (timestamp, _SIGNATURE_STRUCT.unpack(packed) if packed is not None else None, output)
+                for timestamp, packed, output in self._conn.execute(
+                    "SELECT timestamp, signature, output FROM dedup_chunks"
+                    " WHERE base_id = ? ORDER BY position", (best[0],))
+            ]
+        return best[0], best[1], records
+
+    def find_chunk(self, chunk_data, exclude_id=None):
+        """
+        似た確定済みチャンクを探す。見つかれば、時刻を chunk_data['timestamp'] に
+        合わせた出力と (元の id, 類似度) を返す。無ければ None。
+        """
+        signature = chunk_data.get('minhash')
+        if signature is None:
+            return None
+        with self._lock:
+            best = None
+            for base_id, position in self._candidates("chunk", signature, exclude_id):
+                row = self._conn.execute(
+                    "SELECT signature, timestamp, output FROM dedup_chunks"
+                    " WHERE base_id = ? AND position = ?", (base_id, position)).fetchone()
+                if row is None or row[0] is None:
+                    continue
+                similarity = minhash_similarity(signature, _SIGNATURE_STRUCT.unpack(row[0]))
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (base_id, similarity, row[1], row[2])
+        if best is None:
+            return None
+        base_id, similarity, source_timestamp, output = best
+        delta_ms = parse_srt_time(chunk_data['timestamp']) - parse_srt_time(source_timestamp)
+        return shift_output_timestamps(output, delta_ms), (base_id, similarity)
+
+    def record_file(self, base_id, signature, chunk_records):
+        """
+        確定したファイルを登録する。chunk_records は [(timestamp, signature, output), ...]。
+        同じ id の既存の登録は置き換える。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM dedup_bands WHERE base_id = ?", (base_id,))
+            self._conn.execute("DELETE FROM dedup_chunks WHERE base_id = ?", (base_id,))
+            self._conn.execute("DELETE FROM dedup_files WHERE base_id = ?", (base_id,))
+            if signature is not None:
+                self._conn.execute(
+                    "INSERT INTO dedup_files (base_id, signature, created_at) VALUES (?, ?, ?)",
+                    (base_id, _SIGNATURE_STRUCT.pack(*signature), now))
+                self._conn.executemany(
+                    "INSERT INTO dedup_bands (kind, band, bucket, base_id, position) VALUES ('file', ?, ?, ?, -1)",
+                    [(band, bucket, base_id) for band, bucket in _lsh_buckets(signature)])
+            for position, (timestamp, chunk_signature, output) in enumerate(chunk_records):
+                packed = _SIGNATURE_STRUCT.pack(*chunk_signature) if chunk_signature is not None else None
+                self._conn.execute(
+                    "INSERT INTO dedup_chunks (base_id, position, timestamp, signature, output)"
+                    " VALUES (?, ?, ?, ?, ?)", (base_id, position, timestamp, packed, output))
+                if chunk_signature is not None:
+                    self._conn.executemany(
+                        "INSERT INTO dedup_bands (kind, band, bucket, base_id, position)"
+                        " VALUES ('chunk', ?, ?, ?, ?)",
+                        [(band, bucket, base_id, position)
+                         for band, bucket in _lsh_buckets(chunk_signature)])
+
+    def link(self, base_id, source_id, kind, similarity, chunks):
+        """base_id の要約を source_id から使い回したことを記録する。"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO dedup_links (base_id, source_id, kind, similarity, chunks, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", (base_id, source_id, kind, similarity, chunks, time.time()))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,67 @@
+"""チャンク要約の途中経過を残すジャーナル（中断からの再開用）。"""
+import os
+import threading
+import hashlib
+import json
+
+############################################
+# チャンク単位の途中経過（再開用ジャーナル）
+############################################
+class ChunkJournal:
+    """
+    1 ファイル分のチャンク要約結果を追記していくジャーナル（JSONL）。
+
+    1 チャンク要約するたびに生の LLM 出力を 1 行追記して fsync するので、
+    途中でプロセスが落ちても支払い済みの要約は失われない。再実行時は
+    記録済みのチャンクを飛ばし、足りないチャンクだけを要約し直す。
+    チャンクはタイムスタンプと本文のハッシュで識別する
+    （チャンク分割の設定が変わった場合は別チャンクとして扱われる）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 書き込み途中で落ちた最終行は捨てる
+                        continue
+                    self._entries[(entry["timestamp"], entry["text_sha1"])] = entry["output"]
+
+    @staticmethod
+    def _key(chunk_data):
+        text_sha1 = hashlib.sha1(chunk_data['text'].encode("utf-8")).hexdigest()
+        return chunk_data['timestamp'], text_sha1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, chunk_data):
+        return self._entries.get(self._key(chunk_data))
+
+    def record(self, chunk_data, output):
+        timestamp, text_sha1 = self._key(chunk_data)
+        line = json.dumps(
+            {"timestamp": timestamp, "text_sha1": text_sha1, "output": output},
+            ensure_ascii=False,
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[(timestamp, text_sha1)] = output
+
+    def remove(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+def open_chunk_journal(api_dir, base_id):
+    journal_dir = os.path.join(api_dir, ".journal")
+    os.makedirs(journal_dir, exist_ok=True)
+    return ChunkJournal(os.path.join(journal_dir, f"{base_id}.jsonl"))
@@ -0,0 +1,244 @@
+"""複数ワーカー（複数マシン）での分担（共有ボリューム上のリース）。"""
+import os
+import shutil
+import threading
+import time
+import hashlib
+import json
+
+from . import metrics
+from .journal import ChunkJournal
+
+############################################
+# 複数ワーカー（複数マシン）での分担
+#   共有ボリューム上のファイルでリースを取り、同じ SRT / チャンクを
+#   二重に要約しない。CSV の確定は os.link で 1 回だけにする。
+############################################
+DEFAULT_LEASE_SECONDS = 120.0
+
+class Lease:
+    """LeaseQueue.try_acquire で取ったリース。heartbeat で期限を延ばし、release で手放す。"""
+
+    def __init__(self, queue, name, path, token):
+        self.queue = queue
+        self.name = name
+        self.path = path
+        self.token = token
+        self.lost = False
+        self.released = False
+
+    def _still_ours(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("token") == self.token
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def heartbeat(self):
+        """期限を延ばす。ほかのワーカーに取られていたら False。"""
+        if self.released or self.lost:
+            return False
+        if not self._still_ours():
+            self.lost = True
+            print(f"=== WARNING: lease {self.name} was taken over by another worker ===")
+            metrics.METRICS.incr("leases_lost")
+            return False
+        os.utime(self.path)
+        return True
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.queue._forget(self)
+        if not self.lost and self._still_ours():
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+class LeaseQueue:
+    """
+    共有ディレクトリ（root）の中のファイルで取るリース。
+
+    * 取得は O_CREAT | O_EXCL での作成なので、同時に取れるのは 1 ワーカーだけ
+      （NFS などのネットワークファイルシステムでも原子的。SQLite の WAL は
+      共有メモリを使うので、複数マシンからは使えない）
+    * 取ったリースはバックグラウンドのスレッドが lease_seconds / 4 ごとに
+      mtime を更新する（ハートビート）
+    * mtime が lease_seconds 以上古いリースは落ちたワーカーのものとみなし、
+      rename で 1 ワーカーだけが奪い取る
+
+    最悪でもチャンクが 2 回要約されるだけで、CSV の確定は finalize_file の
+    exclusive=True（os.link）で 1 回に限られる。
+    """
+
+    def __init__(self, root, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 poll_interval=None):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.worker_id = worker_id or f"{os.uname().nodename}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval or max(0.2, lease_seconds / 20)
+        self._held = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._thread.start()
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.lease")
+
+    def try_acquire(self, name):
+        """name のリースを取る。ほかのワーカーが持っていれば None。"""
+        path = self._path(name)
+        token = f"{self.worker_id}:{os.urandom(8).hex()}"
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._break_if_expired(path):
+                    return None
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"owner": self.worker_id, "token": token, "acquired_at": time.time()}, f)
+            lease = Lease(self, name, path, token)
+            with self._lock:
+                self._held[name] = lease
+            metrics.METRICS.incr("leases_acquired")
+            return lease
+        return None
+
+    def owner(self, name):
+        """name のリースを持っているワーカー（無ければ None）。"""
+        try:
+            with open(self._path(name), "r", encoding="utf-8") as f:
+                return json.load(f).get("owner")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _break_if_expired(self, path):
+        try:
+            if time.time() - os.stat(path).st_mtime < self.lease_seconds:
+                return False
+        except FileNotFoundError:
+            return True
+        stale = f"{path}.expired.{os.getpid()}.{time.time_ns()}"
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return True
+        if time.time() - os.stat(stale).st_mtime < self.lease_seconds:
+            # 別のワーカーが取り直した直後のリースだった。元に戻す
+            try:
+                os.link(stale, path)
+            except FileExistsError:
+                pass
+            os.remove(stale)
+            return False
+        try:
+            with open(stale, "r", encoding="utf-8") as f:
+                owner = json.load(f).get("owner")
+        except ValueError:
+            owner = None
+        os.remove(stale)
+        print(f"=== Lease {os.path.basename(path)} held by {owner} expired; taking over ===")
+        metrics.METRICS.incr("leases_expired")
+        return True
+
+    def _forget(self, lease):
+        with self._lock:
+            if self._held.get(lease.name) is lease:
+                del self._held[lease.name]
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease_seconds / 4):
+            with self._lock:
+                leases = list(self._held.values())
+            for lease in leases:
+                try:
+                    lease.heartbeat()
+                except OSError as e:
+                    print(f"=== WARNING: heartbeat for {lease.name} failed: {e} ===")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            leases = list(self._held.values())
+        for lease in leases:
+            lease.release()
+
+class SharedChunkJournal:
+    """
+    ChunkJournal と同じ使い方で、チャンクの要約結果を 1 チャンク 1 ファイルで
+    共有ディレクトリに置く（一時ファイル → rename）。複数のワーカーが同じファイルの
+    別々のチャンクを要約するときに使う。lookup は毎回ディスクを見る。
+    source_path（SRT）が無くなっていれば、ほかのワーカーが確定させたということ。
+    """
+
+    def __init__(self, directory, source_path):
+        self.directory = directory
+        self.source_path = source_path
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def finalized(self):
+        return not os.path.exists(self.source_path)
+
+    @staticmethod
+    def key(chunk_data):
+        timestamp, text_sha1 = ChunkJournal._key(chunk_data)
+        return hashlib.sha1(f"{timestamp}\0{text_sha1}".encode("utf-8")).hexdigest()[:20]
+
+    def _path(self, chunk_data):
+        return os.path.join(self.directory, f"{self.key(chunk_data)}.json")
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def lookup(self, chunk_data):
+        try:
+            with open(self._path(chunk_data), "r", encoding="utf-8") as f:
+                return json.load(f)["output"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def record(self, chunk_data, output):
+        path = self._path(chunk_data)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": chunk_data['timestamp'], "output": output}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def claim_jobs(jobs, lease_queue, api_dir, chunk_level=False, seen_ids=None):
+    """
+    jobs のうち、このワーカーが担当するものだけを返す。
+
+    ファイル単位（chunk_level=False）では、ファイルのリースが取れたものだけを返し、
+    job.lease に持たせる（確定または断念したら run_pipeline が手放す）。
+    チャンク単位ではファイルは全ワーカーで共有し、チャンクごとにリースを取る。
+    どちらも、ほかのワーカーがすでに確定させたファイルは飛ばす。
+    """
+    for job in jobs:
+        if chunk_level:
+            if os.path.exists(job.file_path):
+                yield job
+            continue
+        lease = lease_queue.try_acquire(f"file-{job.base_id}")
+        if lease is None:
+            print(f"=== Skipping {job.filename}: claimed by {lease_queue.owner(f'file-{job.base_id}')} ===")
+            if seen_ids is not None:
+                # 持ち主が落ちたら期限切れ後に拾い直す
+                seen_ids.discard(job.base_id)
+            continue
+        if not os.path.exists(job.file_path) or os.path.exists(os.path.join(api_dir, f"{job.base_id}.csv")):
+            lease.release()
+            continue
+        job.lease = lease
+        yield job
@@ -0,0 +1,939 @@
+"""OpenAI 呼び出しまわり（クライアント・応答キャッシュ・ストリーミング・プロンプト）。"""
+import os
+import re
+import csv
+import io
+import random
+import sys
+import threading
+import time
+import hashlib
+import json
+import sqlite3
+from collections import namedtuple
+
+from . import metrics
+from .srt import count_message_tokens, count_tokens
+
+# ▼ 環境変数 OPENAI_API_KEY に APIキーを設定してください
+#   （openai は import に時間がかかるので、実際に API を呼ぶときに _openai() で読み込む）
+
+def _openai():
+    import openai
+    return openai
+
+# ▼ チャンク要約の並列度とレート制限（環境変数で上書き可能。0 = 無制限）
+MAX_CONCURRENCY = int(os.getenv("SUMRY_MAX_CONCURRENCY", "4"))
+REQUESTS_PER_MINUTE = int(os.getenv("SUMRY_RPM", "0"))
+TOKENS_PER_MINUTE = int(os.getenv("SUMRY_TPM", "0"))
+SUMMARY_MAX_TOKENS = 2000
+LLM_MODEL = "gpt-4.1-nano-2025-04-14"
+
+class CsvRecordParser:
+    """
+    LLM が返す CSV を少しずつ（ストリーミングの差分ごとに）受け取り、
+    最初のデータ行を組み立てる。ヘッダー行（headline,...）・空行・``` の行は読み飛ばす。
+    引用符で囲まれたフィールド中のカンマ・改行・"" にも対応する。
+
+    feed() は、それ以上読む必要がなくなったら True を返す。
+        * レコードが揃った（6 列目が閉じた）           → record が入り、off_format は None
+        * 明らかに書式から外れた（列数が合わない・
+          headline が長すぎる = 散文が返ってきている）  → off_format に理由が入る
+    【headline】形式の応答は書式外とはせず、最後まで読む（bracket が True）。
+    """
+
+    MAX_HEADLINE_CHARS = 200
+
+    def __init__(self, columns=6):
+        self.columns = columns
+        self.record = None
+        self.off_format = None
+        self.bracket = False
+        self.first_field_at = None
+        self._parts = []
+        self._fields = []
+        self._field = []
+        self._state = "start"
+        self._done = False
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    @property
+    def complete(self):
+        return self.record is not None and self.off_format is None
+
+    def _stop(self, reason=None):
+        self.off_format = reason
+        if self.record is None and self._fields:
+            self.record = list(self._fields)
+        self._done = True
+
+    def _end_field(self):
+        self._fields.append("".join(self._field))
+        self._field = []
+        self._state = "start"
+        if self.first_field_at is None and not self._is_skipped_line(self._fields):
+            self.first_field_at = time.perf_counter()
+
+    @staticmethod
+    def _is_skipped_line(fields):
+        first = fields[0].strip()
+        return (first.lower() == "headline" or first.startswith("```")
+                or (len(fields) == 1 and not first))
+
+    def _end_record(self):
+        fields, self._fields = self._fields, []
+        if self._is_skipped_line(fields):
+            return
+        self._fields = fields
+        if len(fields) == 1 and fields[0].lstrip().startswith("【"):
+            self.bracket = True
+            self._fields = []
+            return
+        self._stop(None if len(fields) == self.columns else "too_few_fields")
+
+    def feed(self, delta):
+        """差分を読み込む。これ以上読まなくてよければ True を返す。"""
+        self._parts.append(delta)
+        if self._done:
+            return True
+        if self.bracket:
+            return False
+        for c in delta:
+            if self._state == "quoted":
+                if c == '"':
+                    self._state = "quote"
+                else:
+                    self._field.append(c)
+                    if not self._fields and len(self._field) > self.MAX_HEADLINE_CHARS:
+                        self._stop("headline_too_long")
+                        return True
+                continue
+            if self._state == "quote":
+                if c == '"':
+                    self._field.append(c)
+                    self._state = "quoted"
+                    continue
+                if len(self._fields) == self.columns - 1 and not self._is_skipped_line(self._fields):
+                    # 最後の列の閉じ引用符のあとは読まなくてよい
+                    self._end_field()
+                    self._stop()
+                    return True
+                # "abc"def は abcdef として扱う（csv モジュールと同じ）
+                self._state = "unquoted"
+            if c == ",":
+                self._end_field()
+                if len(self._fields) >= self.columns and not self._is_skipped_line(self._fields):
+                    self._stop("too_many_fields")
+                    return True
+            elif c == "\n":
+                self._end_field()
+                self._end_record()
+                if self._done or self.bracket:
+                    return self._done
+            elif c == "\r":
+                continue
+            elif self._state == "start" and c == '"':
+                self._state = "quoted"
+            else:
+                self._field.append(c)
+                self._state = "unquoted"
+                if not self._fields and len(self._field) > self.MAX_HEADLINE_CHARS:
+                    self._stop("headline_too_long")
+                    return True
+        return False
+
+    def close(self):
+        """応答の終わり。途中の行があればそこで閉じる。"""
+        if self._done or self.bracket:
+            return
+        if self._field or self._fields or self._state != "start":
+            self._end_field()
+            self._end_record()
+        if not self._done:
+            self._stop("incomplete")
+
+_BRACKET_FIELD_RE = re.compile(r"^【(.*?)】(.*)")
+
+def parse_structured_output(text_block):
+    fields = ["headline", "overview", "category", "tags", "stance", "timestamp"]
+    # --- fast‑path: if the block looks like a CSV record (no 【】) -------------
+    if "【" not in text_block and "," in text_block:
+        # take the first data record (skipping blank lines, ``` fences and the
+        # "headline,overview,..." header); quoted fields may span several lines
+        row = next((r for r in csv.reader(io.StringIO(text_block))
+                    if r and not CsvRecordParser._is_skipped_line(r)), None)
+        if row:
+            # pad or trim to exactly 6 columns
+            if len(row) < 6:
+                row += ["NULL"] * (6 - len(row))
+            return row[:6]
+    result = {field: "NULL" for field in fields}
+    for line in text_block.splitlines():
+        match = _BRACKET_FIELD_RE.match(line.strip())
+        if match:
+            key_raw, value = match.groups()
+            key = key_raw.strip().lower()
+            if key in result:
+                result[key] = value.strip()
+    return [result[field] for field in fields]
+
+CSV_HEADER = [
+    "headline",
+    "overview",
+    "category",
+    "tags",
+    "stance",
+    "timestamp"
+]
+
+############################################
+# LLM 応答のディスクキャッシュ（内容アドレス方式）
+############################################
+class LLMCache:
+    """
+    SQLite に LLM の応答を保存するキャッシュ。
+
+    キーは model・messages（プロンプトテンプレート + チャンク本文）・
+    サンプリングパラメータを JSON 化した文字列の SHA-256。
+    同じ入力なら再実行してもネットワークには出ない。
+
+    mode:
+        "use"     読み書きする（デフォルト）
+        "refresh" 読まずに API を呼び、結果で上書きする
+        "bypass"  読み書きしない
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self, path, mode="use", max_entries=None, max_age_days=None):
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(model, messages, **params):
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if self.mode != "use":
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, model, response):
+        if self.mode == "bypass":
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            due = self._puts_since_evict >= self.EVICT_EVERY
+        if due:
+            self.evict()
+
+    def evict(self):
+        """max_age_days より古いもの、max_entries を超えた古い順のものを削除。"""
+        with self._lock:
+            self._puts_since_evict = 0
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# main() から設定される。None ならキャッシュなし。
+LLM_CACHE = None
+
+############################################
+# OpenAI クライアントのラッパー（リトライ・バックオフ・流量制御）
+############################################
+class CircuitOpenError(RuntimeError):
+    """サーキットブレーカーが開いている間の呼び出し。"""
+
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def _parse_reset_duration(value):
+    """ "1s" / "6m0s" / "250ms" のような x-ratelimit-reset-* の値を秒にする。"""
+    parts = _DURATION_PART_RE.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in parts)
+
+def retry_after_seconds(headers):
+    """
+    レスポンスヘッダーから、次に送ってよいまでの秒数を読み取る。
+    retry-after-ms → retry-after（秒または HTTP 日付）→ x-ratelimit-reset-* の順に見る。
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                import email.utils
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [
+        _parse_reset_duration(headers.get(name))
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+def classify_llm_error(error):
+    """
+    例外を "throttle"（429/503: 流量を落として再試行）、
+    "retry"（5xx・タイムアウト・接続エラー: 再試行）、"fatal"（それ以外）に分ける。
+    """
+    status = getattr(error, "status_code", None)
+    # openai の例外なら openai はすでに読み込まれている（読み込まれていなければ比べる必要もない）
+    openai = sys.modules.get("openai")
+    if (openai is not None and isinstance(error, openai.RateLimitError)) or status in (429, 503):
+        return "throttle"
+    if status is not None and status >= 500:
+        return "retry"
+    if openai is not None and isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return "retry"
+    return "fatal"
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD で上限を調整する同時実行数リミッター。
+    成功ごとに上限を 1/上限 ずつ増やし、スロットリングされたら半分にする
+    （半減は decrease_interval 秒に 1 回まで）。
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, decrease_interval=1.0):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.limit = float(max(minimum, min(initial, self.maximum)))
+        self.decrease_interval = decrease_interval
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, outcome):
+        with self._cond:
+            self._in_flight -= 1
+            if outcome == "success":
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            elif outcome == "throttle":
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_interval:
+                    self.limit = max(float(self.minimum), self.limit / 2.0)
+                    self._last_decrease = now
+            self._cond.notify_all()
+
+class CircuitBreaker:
+    """
+    障害（5xx・タイムアウト・接続エラー）が failure_threshold 回続いたら reset_timeout 秒の
+    あいだ開き、その間は呼び出しを待たせる。時間が経ったら半開にして試し、
+    成功すれば閉じ、失敗すればまた開く。429 は流量の問題なので数えない
+    （LLMClient の一時停止と AdaptiveConcurrencyLimit で扱う）。
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.opened = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """呼んでよければ 0、開いていれば半開になるまでの秒数を返す。"""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            self.state = "half_open"
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+class LLMClient:
+    """
+    summarize_chunk と filter_meaningful_content が共有する chat.completions の呼び出し口。
+
+    * OpenAI クライアントを 1 つだけ作り、HTTP 接続を使い回す（リクエストごとの timeout 付き）
+    * 429 / 5xx / タイムアウトはジッター付き指数バックオフで max_retries 回まで再試行
+    * retry-after / x-ratelimit-* ヘッダーがあればその時間は全スレッドで送信を止める
+    * AdaptiveConcurrencyLimit で同時実行数をスロットリングに応じて増減
+    * CircuitBreaker で障害が続くときはしばらく送るのを止める（再試行は止めずに待つ）
+    * stream_responses=True なら、要約は stream_csv_record でストリーミング受信する
+    base_url を指定すればローカルの偽サーバー（fake_llm_server.py）にも向けられる。
+    """
+
+    def __init__(self, base_url=None, api_key=None, timeout=120.0, max_retries=6,
+                 base_backoff=1.0, max_backoff=60.0, max_concurrency=MAX_CONCURRENCY,
+                 failure_threshold=5, reset_timeout=30.0, stream_responses=False):
+        self.base_url = base_url
+        self.stream_responses = stream_responses
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.concurrency = AdaptiveConcurrencyLimit(max_concurrency, maximum=max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retries = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = _openai().OpenAI(
+                    api_key=self.api_key or os.getenv("OPENAI_API_KEY"),
+                    base_url=self.base_url or os.getenv("OPENAI_BASE_URL") or None,
+                    timeout=self.timeout,
+                    max_retries=0,
+                )
+            return self._client
+
+    def _pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_if_paused(self):
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _observe_headers(self, headers):
+        # 残りリクエスト数が 0 ならリセットまで全体で待つ
+        if headers.get("x-ratelimit-remaining-requests") == "0":
+            wait = _parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+            if wait:
+                self._pause(wait)
+
+    def create(self, **params):
+        """chat.completions.create と同じ引数で呼び、パース済みのレスポンスを返す。"""
+        return self._call(params, lambda response: response)
+
+    def stream(self, consume, **params):
+        """
+        stream=True で呼び、受信中のストリームを consume(stream) に渡してその戻り値を返す。
+        consume の実行中も同時実行枠を保持し、受信途中の接続エラーも再試行の対象にする
+        （再試行のたびに consume は最初から呼び直される）。
+        """
+        return self._call(dict(params, stream=True), consume)
+
+    def _call(self, params, handle):
+        attempt = 0
+        while True:
+            circuit_wait = self.breaker.before_call()
+            if circuit_wait > 0:
+                time.sleep(circuit_wait)
+                continue
+            self._wait_if_paused()
+            self.concurrency.acquire()
+            outcome = "fatal"
+            try:
+                raw = self._get_client().chat.completions.with_raw_response.create(**params)
+                self._observe_headers(raw.headers)
+                result = handle(raw.parse())
+                outcome = "success"
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                kind = classify_llm_error(e)
+                if kind == "fatal":
+                    raise
+                outcome = "throttle" if kind == "throttle" else "failure"
+                status = getattr(e, "status_code", None)
+                if kind == "retry" or (status is not None and status >= 500):
+                    self.breaker.record_failure()
+                response = getattr(e, "response", None)
+                retry_after = retry_after_seconds(getattr(response, "headers", None))
+                if kind == "throttle":
+                    self.throttled += 1
+                    if retry_after:
+                        self._pause(retry_after)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                self.retries += 1
+                backoff = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                delay = max(retry_after or 0.0, backoff)
+            finally:
+                self.concurrency.release(outcome)
+            time.sleep(delay)
+
+    def stats(self):
+        return {
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "circuit_opened": self.breaker.opened,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+        }
+
+# main() から設定される。未設定なら最初の呼び出しで既定の設定で作る。
+LLM_CLIENT = None
+
+def get_llm_client():
+    global LLM_CLIENT
+    if LLM_CLIENT is None:
+        LLM_CLIENT = LLMClient()
+    return LLM_CLIENT
+
+# ストリーミングで書式外と判断したときに、取り直す回数
+STREAM_FORMAT_RETRIES = 1
+
+# 途中で切ったストリームには usage が届かないので、文字列から見積もる
+EstimatedUsage = namedtuple("EstimatedUsage", "prompt_tokens completion_tokens")
+
+def stream_csv_record(client, model, messages, max_tokens, temperature, purpose="summary",
+                      format_retries=STREAM_FORMAT_RETRIES):
+    """
+    応答をストリーミングで受け取りながら CsvRecordParser に流し込み、
+    最初のデータ行が揃った時点で接続を切って、そこまでの本文を返す。
+
+    書式から外れたと分かった時点でも切り、format_retries 回まで取り直す。
+    最後の試行では途中で切らずに最後まで読み、そのまま返す
+    （従来どおり parse_structured_output の寛容な解釈に任せる）。
+    """
+    for attempt in range(format_retries + 1):
+        final = attempt == format_retries
+        started = time.perf_counter()
+
+        def consume(stream):
+            parser = CsvRecordParser(len(CSV_HEADER))
+            usage = None
+            stopped = False
+            try:
+                for event in stream:
+                    if getattr(event, "usage", None) is not None:
+                        usage = event.usage
+                    if not event.choices:
+                        continue
+                    delta = event.choices[0].delta.content
+                    if delta and parser.feed(delta) and (parser.complete or not final):
+                        stopped = True
+                        break
+            finally:
+                stream.close()
+            if not stopped:
+                parser.close()
+            return parser, usage, stopped
+
+        with metrics.METRICS.span("llm_request", purpose=purpose, stream=True):
+            parser, usage, stopped = client.stream(
+                consume, model=model, messages=messages, max_tokens=max_tokens,
+                temperature=temperature, stream_options={"include_usage": True})
+        if usage is None and metrics.METRICS.enabled:
+            usage = EstimatedUsage(sum(count_tokens(m["content"]) for m in messages),
+                                   count_tokens(parser.text))
+        metrics.METRICS.record_usage(model, usage, purpose)
+        if parser.first_field_at is not None and metrics.METRICS.enabled:
+            metrics.METRICS.record_span("llm_time_to_first_field", parser.first_field_at - started,
+                                        {"purpose": purpose})
+        if stopped:
+            metrics.METRICS.incr("llm_stream_early_stops", purpose=purpose,
+                                 reason="complete" if parser.complete else parser.off_format)
+        if parser.complete or parser.bracket or final:
+            return parser.text.strip()
+        metrics.METRICS.incr("llm_format_retries", purpose=purpose, reason=parser.off_format)
+        print(f"=== WARNING: off-format reply ({parser.off_format}); retrying ===")
+
+def chat_completion(messages, model=LLM_MODEL, max_tokens=SUMMARY_MAX_TOKENS, temperature=0.0,
+                    purpose="summary", csv_record=False, rate_limiter=None):
+    """
+    chat.completions.create を呼び、応答本文（strip 済み）を返す。
+    LLM_CACHE が設定されていればまずキャッシュを引く。
+    rate_limiter（RateLimiter）はキャッシュに無く、実際に送るときだけ消費する
+    （TPM は入力（system プロンプトを含む）と出力の上限の合計で数えられる）。
+    purpose は計測用のラベル（"summary" / "filter"）。
+    csv_record=True で LLMClient がストリーミング有効なら stream_csv_record を使う。
+    """
+    cache = LLM_CACHE
+    key = None
+    if cache is not None:
+        key = LLMCache.make_key(model, messages, max_tokens=max_tokens, temperature=temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.METRICS.incr("llm_cache_hits", purpose=purpose)
+            return cached
+        metrics.METRICS.incr("llm_cache_misses", purpose=purpose)
+
+    if rate_limiter is not None:
+        rate_limiter.acquire(count_message_tokens(messages) + max_tokens)
+    client = get_llm_client()
+    if csv_record and client.stream_responses:
+        content = stream_csv_record(client, model, messages, max_tokens, temperature, purpose)
+    else:
+        with metrics.METRICS.span("llm_request", purpose=purpose):
+            response = client.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        metrics.METRICS.record_usage(model, getattr(response, "usage", None), purpose)
+        content = response.choices[0].message.content.strip()
+    if cache is not None:
+        cache.put(key, model, content)
+    return content
+
+FILTER_MAX_TOKENS = 5
+
+def build_filter_messages(text_chunk):
+    """filter_meaningful_content が送る messages を組み立てる。"""
+    short_prompt = (
+        "このテキストに少しでも議論や問題提起、発言が含まれているなら 'Yes'、"
+        "全く何も無いなら 'No' と答えてください。\n\n"
+        + text_chunk
+    )
+    return [{"role": "user", "content": short_prompt}]
+
+def filter_meaningful_content(text_chunk, rate_limiter=None):
+    """
+    "このテキストに少しでも発言や文章が含まれていたら 'Yes' と答えてください。"
+    "ほぼ空っぽで何もないなら 'No' と答えてください。\n\n"
+    """
+    return chat_completion(
+        build_filter_messages(text_chunk),
+        max_tokens=FILTER_MAX_TOKENS,
+        rate_limiter=rate_limiter,
+        temperature=0.0,
+        purpose="filter"
+    )
+
+def is_meaningful_answer(answer):
+    return answer.strip().strip("'\"").lower().startswith("yes")
+
+############################################
+# summarize_chunk: "timestamp" を追加
+############################################
+# summarize_chunk の静的な指示部分。
+# 全リクエストで 1 バイトも違わない system メッセージとして送ることで、
+# プロバイダ側のプレフィックスキャッシュが効くようにしている。
+# （動的な値を埋め込まないこと）
+SUMMARY_INSTRUCTIONS = """あなたは議事録の要約に特化したAIアシスタントです。以下の指示を厳守し、与えられた字幕テキスト（議事録）を分類・要約してください。
+
+━━━━━━━━━━━━━━
+【目的】
+自治体関係者および民間事業者が、ヘッドラインと要約だけで「自分たちに関係のある議題かどうか」を瞬時に判別できるようにする。
+
+━━━━━━━━━━━━━━
+【出力フォーマット（CSV形式）】
+ヘッダーを含む 6 列で 1 行出力してください。カンマ区切り、改行コードは "\n"。
+
+headline,overview,category,tags,stance,timestamp
+
+## 各列の要件
+
+◆ headline（60文字以内）
+
+* テーマの概要が一目でわかる短いタイトル。
+
+◆ overview（700文字以上）
+
+* 背景（問題意識・経緯）
+* 「誰が何を提案・指摘・質問し、誰がどう答えたか」
+* 今後の方向性（導入済みか・検討中か・否定されたか等）
+* 議論の要点や結論が語られた時間を本文中に必ず "(HH\\:MM\\:SS)" 形式で挿入
+* 冗長な挨拶・定型句は除く
+
+◆ category（1 つ）
+次の 20 分類から最も適切な 1 つを記入。
+子育て・保育 / 学校教育・生涯学習 / 福祉・包摂（高齢・障がい・困窮） / 医療・公衆衛生 / 防災・危機管理・安全安心 / 環境・エネルギー / 経済・雇用・産業振興 / 農林水産業 / 都市整備・土地利用（ハード） / インフラ・公共施設 / 交通・モビリティ / デジタル・ICT推進 / 行政手続・窓口サービス / 財政・税務 / 総務・人事・組織運営 / 政策立案・企画・計画 / 議会・選挙・ガバナンス / 地域活性・コミュニティ（ソフト） / 市民協働・広報 / 人権・男女共同参画（ダイバーシティ）
+
+◆ tags（最大 3 つ）
+
+* 議論が活発だった主要キーワードをカンマ区切りで最大 3 つ。
+* 該当しない場合は NULL。
+
+◆ stance（1 つ）
+
+* 次の 6 つのいずれかを記入（日本語）。
+
+  1. 導入済み・決定済み
+  2. 前向き・推進意向
+  3. 検討中・調査中
+  4. 慎重・消極的
+  5. 否定・反対
+  6. 判断困難・情報不足
+
+◆ timestamp
+
+* 議論の結論や方向性が示された時間帯を "HH\\:MM\\:SS〜HH\\:MM\\:SS" 形式で記入。
+
+━━━━━━━━━━━━━━
+【スタンス判定に関する注意事項】
+
+* 数値（利用者数・予算額など）が登場しても、それ自体は導入状況を示す根拠にはなりません。発言者の意図・態度に着目してください。
+* 具体的に「導入済み」「制度化が決定」「今後導入する方針」などが示されているかどうかを優先判断します。
+
+━━━━━━━━━━━━━━
+【入力テンプレート】
+▼ 以下の <<TEXT>> を置き換えて実行
+
+＜入力例＞
+
+```
+【TEXT】
+<<ここに字幕テキスト（原文チャンク）をそのまま貼り付ける>>
+```
+
+━━━━━━━━━━━━━━
+【出力例】
+headline,overview,category,tags,stance,timestamp
+"子ども食堂への支援拡大案","(00:12:30) 地域の子ども食堂への財政支援の必要性について議論。山田議員が孤食問題と経済格差の影響を挙げて支援拡大を提案。市側は現状の支援策を説明しつつ、他自治体の事例も参考に柔軟に対応していきたいと回答。(00:14:50) 市長は『予算調整が必要だが、前向きに検討したい』と発言。複数議員から利用者数の把握と事後評価の必要性が指摘され、今後、令和7年度予算編成の中で具体化を目指す。","福祉・包摂（高齢・障がい・困窮）","子ども食堂,孤食,貧困対策","前向き・推進意向","00:12:30〜00:15:00"
+
+━━━━━━━━━━━━━━
+【字幕テキストの形式】
+
+* 各行の先頭の "[HH:MM:SS]" または "HH:MM:SS,mmm" は、その行（とそれに続く時刻なしの行）の発言時刻です。
+* 時刻なしの行は直前の時刻の行の続きです。本文中の "(HH:MM:SS)" はこれらの時刻から記入してください。
+
+━━━━━━━━━━━━━━
+【禁止事項】
+
+* 空行やヘッダー以外の複数行出力
+* 推測や脚色、主観的評価
+* 挨拶・形式的な文言（例:「よろしくお願いします」「賛成多数で可決」）
+
+以上。"""
+
+def build_summary_messages(text_chunk, timestamp):
+    """
+    summarize_chunk が送る messages を組み立てる（バッチ投入でも同じものを使う）。
+    静的な指示は system、チャンクごとに変わる部分は user に分ける。
+    """
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": f"以下が対象テキストです：\nTimestamp: {timestamp}\n\n{text_chunk}"},
+    ]
+
+def summarize_chunk(text_chunk, system_prompt, timestamp, rate_limiter=None):
+    """
+    - text_chunk: このチャンク内の字幕テキスト
+    - system_prompt: ユーザー独自の長い議事録要約プロンプト (下記参照)
+    - timestamp: チャンク内で最初に登場した字幕のインデックス
+    - rate_limiter: 送信前に枠を取る RateLimiter（キャッシュヒットなら消費しない）
+    """
+    with metrics.METRICS.span("summarize_chunk"):
+        return chat_completion(
+            build_summary_messages(text_chunk, timestamp),
+            max_tokens=SUMMARY_MAX_TOKENS,
+            temperature=0.0,
+            csv_record=True,
+            rate_limiter=rate_limiter,
+        )
+
+############################################
+# レート制限（1 分あたりのリクエスト数 / トークン数）
+############################################
+class RateLimiter:
+    """
+    requests/min と tokens/min を同時に制限するトークンバケット。
+    どちらも 0 ならその制限は無効。複数スレッドから共有して使う。
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0,
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0,
+            )
+
+    def acquire(self, tokens=0):
+        """1 リクエスト分（tokens 消費）の枠が空くまでブロックする。"""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+        # バケット容量を超えるリクエストは永遠に待たないよう容量で頭打ち
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = 0.0
+                if self.requests_per_minute and self._request_allowance < 1:
+                    wait = (1 - self._request_allowance) * 60.0 / self.requests_per_minute
+                if self.tokens_per_minute and self._token_allowance < tokens:
+                    wait = max(wait, (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+            time.sleep(wait)
+
+##########################
+# 以下、ユーザーのオリジナルプロンプトをそのまま
+##########################
+SYSTEM_PROMPT = """
+あなたは議事録の要約に特化したAIです。次の要件を厳守してください。
+
+【目的】
+自治体関係者・民間事業者が「自分たちに関係ある話題かどうか」をヘッドラインと要約だけで判断できるようにすること。
+
+【出力形式（CSV形式）】
+1. ヘッダーは以下の6列：
+   headline,overview,category,tags,stance,timestamp
+
+2. 各列の内容：
+- headline（60文字以内）:
+  テーマの概要がすぐ分かるように簡潔に。
+
+- overview（700文字以上）:
+  以下を網羅：
+  ・背景（どんな問題意識があるのか）
+  ・誰が何を提案・指摘・質問し、誰がどう答えたか
+  ・今後の方向性（導入するのか、検討中なのか、否定されたのか）
+  ・議論の中心や結論が述べられた時間帯（例: (00:23:45)）を文中に挿入
+
+- category:
+  以下の20分類から該当するものを1つ記入
+子育て・保育
+学校教育・生涯学習
+福祉・包摂（高齢・障がい・困窮）
+医療・公衆衛生
+防災・危機管理・安全安心
+環境・エネルギー
+経済・雇用・産業振興
+農林水産業
+都市整備・土地利用（ハード）
+インフラ・公共施設
+交通・モビリティ
+デジタル・ICT推進
+行政手続・窓口サービス
+財政・税務
+総務・人事・組織運営
+政策立案・企画・計画
+議会・選挙・ガバナンス
+地域活性・コミュニティ（ソフト）
+市民協働・広報
+人権・男女共同参画（ダイバーシティ）
+- tags:
+  議論が活発だったものだけ、最大3つまでの重要キーワード（例: 高齢化,こども食堂）。
+  特に頻出していないテーマは「NULL」とする。
+
+- stance:
+  以下のいずれかを記入（日本語）
+    導入決定 / 導入済み / 内部決定・制度化 / 前向き / 検討中 / 調査・情報収集段階 / 慎重・消極的 / 反対・否定 / 情報不足・判断不能 / 実証・試行段階 / 要望・提案段階
+
+【禁止事項】
+・冗長なあいさつ、定型表現（例：「よろしくお願いします」「賛成多数で可決」など）は含めない。
+・推測、個人的な解釈は禁止。テキストに明記された事実だけをもとにする。
+・文字数が不足する場合は、もっと具体的なやり取り・発言内容を補足すること。
+
+【出力例】
+headline,overview,category,tags,stance,timestamp
+"子ども食堂への支援拡大案",
+"(00:12:30) 地域の子ども食堂への財政支援の必要性について議論。山田議員が孤食問題と経済格差の影響を挙げて支援拡大を提案。市側は現状の支援策を説明しつつ、他自治体の事例も参考にして柔軟に対応していきたいと回答。(00:14:50) 市長は『予算調整が必要だが、前向きに検討したい』と発言。複数議員から利用者数の把握と事後評価の必要性が指摘された。今後、令和7年度予算編成の中で具体化を目指す。",
+"社会保障・福祉",
+"子ども食堂,孤食,貧困対策",
+"前向き",
+"00:12:30〜00:15:00"
+    """
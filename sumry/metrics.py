@@ -0,0 +1,178 @@
+"""計測（ステージごとの時間・トークン数・コスト・カウンター）。"""
+import threading
+import time
+import json
+
+############################################
+# 計測（ステージごとの時間・トークン数・コスト・カウンター）
+############################################
+# 100 万トークンあたりの USD（入力 / キャッシュされた入力 / 出力）
+MODEL_PRICES = {
+    "gpt-4.1-nano-2025-04-14": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini-2025-04-14": (0.40, 0.10, 1.60),
+    "gpt-4.1-2025-04-14": (2.00, 0.50, 8.00),
+}
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("_metrics", "_name", "_labels", "_started")
+
+    def __init__(self, metrics, name, labels):
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.record_span(self._name, time.perf_counter() - self._started,
+                                  self._labels, error=exc_type is not None)
+        return False
+
+class Metrics:
+    """
+    ステージごとの所要時間（span）、カウンター、トークン使用量と推定コストを集める。
+
+    * jsonl_path を渡すと、span やイベントを 1 行 1 JSON で追記する
+    * render_prometheus() で Prometheus のテキスト形式を返す
+      （serve_prometheus(port) で /metrics として公開できる）
+    * enabled=False のときは span() が共有の no-op を返すだけなので、ほぼコストが無い
+    """
+
+    def __init__(self, enabled=False, jsonl_path=None):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self._counters = {}
+        self._span_totals = {}
+        self._lock = threading.Lock()
+        self._jsonl = open(jsonl_path, "a", encoding="utf-8") if enabled and jsonl_path else None
+        self._httpd = None
+
+    def span(self, name, **labels):
+        """with metrics.span("summarize_chunk", file=...): のように使う。"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def _write(self, record):
+        if self._jsonl is None:
+            return
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._jsonl.write(line + "\n")
+            self._jsonl.flush()
+
+    def record_span(self, name, seconds, labels, error=False):
+        with self._lock:
+            total = self._span_totals.setdefault(name, [0, 0.0, 0])
+            total[0] += 1
+            total[1] += seconds
+            total[2] += int(error)
+        self._write({"ts": time.time(), "type": "span", "name": name,
+                     "duration_ms": round(seconds * 1000, 3), "error": error, "labels": labels})
+
+    def incr(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def event(self, name, **fields):
+        if not self.enabled:
+            return
+        self._write({"ts": time.time(), "type": "event", "name": name, **fields})
+
+    def record_usage(self, model, usage, purpose):
+        """response.usage からトークン数と推定コストを記録する。"""
+        if not self.enabled or usage is None:
+            return
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+        price_in, price_cached, price_out = MODEL_PRICES.get(model, (0.0, 0.0, 0.0))
+        cost = ((prompt - cached) * price_in + cached * price_cached + completion * price_out) / 1e6
+        self.incr("llm_prompt_tokens", prompt, purpose=purpose)
+        self.incr("llm_cached_prompt_tokens", cached, purpose=purpose)
+        self.incr("llm_completion_tokens", completion, purpose=purpose)
+        self.incr("llm_cost_usd", cost, purpose=purpose)
+        self._write({"ts": time.time(), "type": "usage", "model": model, "purpose": purpose,
+                     "prompt_tokens": prompt, "cached_prompt_tokens": cached,
+                     "completion_tokens": completion, "cost_usd": round(cost, 8)})
+
+    def counter_total(self, name):
+        with self._lock:
+            return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    def snapshot(self):
+        with self._lock:
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                label = ",".join(f"{k}={v}" for k, v in labels)
+                counters[f"{name}{{{label}}}" if label else name] = value
+            spans = {
+                name: {"count": count, "total_s": round(total, 6), "errors": errors}
+                for name, (count, total, errors) in self._span_totals.items()
+            }
+        return {"counters": counters, "spans": spans}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                label = ",".join(f'{k}="{v}"' for k, v in labels)
+                metric = f"sumry_{name}_total"
+                lines.append(f"{metric}{{{label}}} {value}" if label else f"{metric} {value}")
+            for name, (count, total, errors) in sorted(self._span_totals.items()):
+                lines.append(f'sumry_span_seconds_sum{{span="{name}"}} {total:.6f}')
+                lines.append(f'sumry_span_seconds_count{{span="{name}"}} {count}')
+                lines.append(f'sumry_span_errors_total{{span="{name}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port, host="0.0.0.0"):
+        """/metrics を返す HTTP サーバーを別スレッドで起動する。"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._jsonl is not None:
+            self._write({"ts": time.time(), "type": "summary", **self.snapshot()})
+            self._jsonl.close()
+            self._jsonl = None
+
+# main() で有効化される。デフォルトは無効（no-op）。
+METRICS = Metrics(enabled=False)
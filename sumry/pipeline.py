@@ -0,0 +1,642 @@
+"""複数ファイルのステージ型パイプライン（parse/chunk → LLM → CSV 書き出し）。"""
+import os
+import re
+import shutil
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import metrics
+from .srt import (chunk_subs, chunk_token_stats, compaction_report, format_srt_time,
+                  format_token_stats, iter_srt_subs, parse_srt_time)
+from .llm import (filter_meaningful_content, is_meaningful_answer, MAX_CONCURRENCY, summarize_chunk,
+                  SYSTEM_PROMPT)
+from .store import unify_and_save_csv
+from .dedup import fingerprint_chunks, shift_output_timestamps
+from .journal import open_chunk_journal
+from .leases import claim_jobs, SharedChunkJournal
+
+############################################
+# API を使わない事前判定（休憩・無音・点呼だけのチャンクを落とす）
+############################################
+# 要約チャンクの代わりに返す「中身なし」の出力
+SKIPPED_CHUNK_OUTPUT = ""
+
+PROCEDURAL_PHRASES = (
+    "休憩", "開会", "閉会", "散会", "休会", "再開", "起立", "着席", "礼",
+    "暫時", "異議なし", "異議ありませんか", "御異議", "出席", "点呼", "定足数",
+    "日程第", "会議録署名", "黙祷", "拍手", "音楽", "無音", "沈黙",
+)
+_PROCEDURAL_LINE_MAX_CHARS = 40
+_SPEAKER_MARKERS = ("○", "◯", "◎")
+_CHUNK_LINE_TIMESTAMP_RE = re.compile(r"^(?:\d+:\d{2}:\d{2},\d{3}|\[\d+:\d{2}:\d{2}\])\s*")
+
+def score_chunk_content(text_chunk):
+    """
+    チャンクに議論らしい中身がどれだけあるかを 0.0〜1.0 で返す。
+
+    * 定型句（「休憩」「開会」「起立」…）だけの短い行は中身に数えない
+    * 中身のある文字数が多いほど高い（600 文字で頭打ち）
+    * 発言者 1 人あたり（話者マーカーが無ければ 1 行あたり）の文字数が
+      少ない（点呼や「はい」の連続）ほど低い
+    """
+    lines = 0
+    procedural = 0
+    substantive_chars = 0
+    substantive_lines = 0
+    speaker_turns = 0
+    for raw in text_chunk.splitlines():
+        line = "".join(_CHUNK_LINE_TIMESTAMP_RE.sub("", raw).split())
+        if not line:
+            continue
+        lines += 1
+        if line.startswith(_SPEAKER_MARKERS):
+            speaker_turns += 1
+        if len(line) <= _PROCEDURAL_LINE_MAX_CHARS and any(p in line for p in PROCEDURAL_PHRASES):
+            procedural += 1
+            continue
+        substantive_chars += len(line)
+        substantive_lines += 1
+    if not lines or not substantive_chars:
+        return 0.0
+
+    volume = min(1.0, substantive_chars / 600.0)
+    procedural_ratio = procedural / lines
+    per_turn = substantive_chars / (speaker_turns or substantive_lines)
+    richness = min(1.0, per_turn / 25.0)
+    return volume * (1.0 - procedural_ratio) ** 0.5 * (0.4 + 0.6 * richness)
+
+class ChunkPrefilter:
+    """
+    score_chunk_content によるローカル判定。
+
+        score <  threshold            → "skip"  （要約しない）
+        score <  threshold + margin   → "check" （filter_meaningful_content で確認）
+        それ以外                       → "keep"  （そのまま要約）
+
+    use_llm_fallback=False なら境界付近も "keep" 扱いにする。
+    """
+
+    def __init__(self, threshold=0.2, margin=0.15, use_llm_fallback=True):
+        self.threshold = threshold
+        self.margin = margin
+        self.use_llm_fallback = use_llm_fallback
+
+    def classify(self, text_chunk):
+        score = score_chunk_content(text_chunk)
+        if score < self.threshold:
+            return "skip"
+        if score < self.threshold + self.margin and self.use_llm_fallback:
+            return "check"
+        return "keep"
+
+############################################
+# チャンク要約の並列実行
+############################################
+def _summarize_chunk_task(chunk_data, system_prompt, rate_limiter, journal, check_first):
+    if check_first:
+        # 境界付近のチャンクだけ、要約の前に安い Yes/No 判定を挟む
+        if is_meaningful_answer(filter_meaningful_content(chunk_data['text'], rate_limiter)):
+            result = summarize_chunk(chunk_data['text'], system_prompt, chunk_data['timestamp'],
+                                     rate_limiter)
+        else:
+            result = SKIPPED_CHUNK_OUTPUT
+    else:
+        result = summarize_chunk(chunk_data['text'], system_prompt, chunk_data['timestamp'],
+                                 rate_limiter)
+    if journal is not None:
+        journal.record(chunk_data, result)
+    return result
+
+class _ChunkClaimPool:
+    """
+    チャンク単位の分担（--queue chunks）で、1 ファイル分の未要約チャンクを
+    このプロセスのスレッドで取り合う。
+
+    executor のスレッド（work）は、まだ誰もリースを持っていないチャンクを先頭から
+    探して要約し、空いているチャンクが無くなったらすぐ executor を空ける。
+    ほかのワーカーが持っているチャンクは、executor の外の見張りスレッド（watch）が
+    結果が journal（SharedChunkJournal）に現れるのを待ち、リースが切れたチャンクが
+    あれば取って executor に回す。
+    """
+
+    def __init__(self, executor, chunks, futures, system_prompt, rate_limiter, journal,
+                 lease_queue, base_id):
+        self.executor = executor
+        self.chunks = chunks
+        self.futures = futures
+        self.system_prompt = system_prompt
+        self.rate_limiter = rate_limiter
+        self.journal = journal
+        self.lease_queue = lease_queue
+        self.base_id = base_id
+        self._claimed = set()  # このプロセスが要約中のチャンクの位置
+        self._lock = threading.Lock()
+
+    def _unresolved(self):
+        return [i for i, future in enumerate(self.futures) if not future.done()]
+
+    def _claim_next(self):
+        """空いているチャンクを 1 つ取って (位置, Lease) を返す。無ければ None。"""
+        for i in self._unresolved():
+            with self._lock:
+                if i in self._claimed:
+                    continue
+            chunk_data = self.chunks[i]
+            recorded = self.journal.lookup(chunk_data)
+            if recorded is not None:
+                self._resolve(i, recorded)
+                continue
+            lease = self.lease_queue.try_acquire(
+                f"chunk-{self.base_id}-{SharedChunkJournal.key(chunk_data)}")
+            if lease is None:
+                continue
+            with self._lock:
+                if i in self._claimed or self.futures[i].done():
+                    lease.release()
+                    continue
+                self._claimed.add(i)
+            return i, lease
+        return None
+
+    def _resolve(self, i, result=None, error=None):
+        with self._lock:
+            future = self.futures[i]
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _summarize(self, i, lease):
+        chunk_data = self.chunks[i]
+        try:
+            # リースを取る直前に書き込まれていないか確かめる
+            recorded = self.journal.lookup(chunk_data)
+            if recorded is None:
+                recorded = _summarize_chunk_task(
+                    chunk_data, self.system_prompt, self.rate_limiter, self.journal,
+                    chunk_data.get('prefilter') == "check")
+            self._resolve(i, recorded)
+        except Exception as e:
+            self._resolve(i, error=e)
+        finally:
+            lease.release()
+            with self._lock:
+                self._claimed.discard(i)
+
+    def start(self):
+        for _ in self.futures:
+            self.executor.submit(self.work)
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def work(self):
+        while True:
+            claimed = self._claim_next()
+            if claimed is None:
+                return
+            self._summarize(*claimed)
+
+    def watch(self):
+        while self._unresolved():
+            time.sleep(self.lease_queue.poll_interval)
+            if self.journal.finalized:
+                for i in self._unresolved():
+                    self._resolve(i, error=RuntimeError("already finalized by another worker"))
+                return
+            claimed = self._claim_next()
+            while claimed is not None:
+                self.executor.submit(self._summarize, *claimed)
+                claimed = self._claim_next()
+
+def _completed_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+def submit_chunk_summaries(executor, chunks, system_prompt, rate_limiter=None, journal=None,
+                           prefilter=None, dedup=None, base_id=None, lease_queue=None):
+    """
+    chunks の各要素を executor に投入し、同じ順序の Future のリストを返す。
+    journal（ChunkJournal）を渡すと、記録済みのチャンクは API を呼ばずに
+    journal の内容で完了済み Future を返し、新たに要約したものは journal に追記する。
+    prefilter（ChunkPrefilter）を渡すと、中身の無いチャンクは要約せずに
+    SKIPPED_CHUNK_OUTPUT を返す。判定結果は chunk_data['prefilter'] に残る。
+    dedup（chunk_level の DuplicateIndex）を渡すと、base_id 以外の確定済みファイルに
+    ほぼ同じチャンクがあればその出力を使い、chunk_data['reused_from'] に
+    (元の id, 類似度) を残す。
+    lease_queue（LeaseQueue）を渡すと、チャンクごとにリースを取って要約し、
+    ほかのワーカーが持っているチャンクはその結果が journal
+    （SharedChunkJournal）に現れるのを待つ（_ChunkClaimPool）。
+    """
+    futures = []
+    leased = []  # lease_queue ありで、要約が必要なチャンクの位置
+    for chunk_data in chunks:
+        decision = prefilter.classify(chunk_data['text']) if prefilter is not None else "keep"
+        chunk_data['prefilter'] = decision
+        if decision == "skip":
+            futures.append(_completed_future(SKIPPED_CHUNK_OUTPUT))
+            continue
+        if journal is not None:
+            recorded = journal.lookup(chunk_data)
+            if recorded is not None:
+                futures.append(_completed_future(recorded))
+                continue
+        if dedup is not None and dedup.chunk_level:
+            match = dedup.find_chunk(chunk_data, base_id)
+            if match is not None:
+                output, chunk_data['reused_from'] = match
+                futures.append(_completed_future(output))
+                continue
+        if lease_queue is not None:
+            leased.append(len(futures))
+            futures.append(Future())
+            continue
+        futures.append(executor.submit(
+            _summarize_chunk_task, chunk_data, system_prompt, rate_limiter, journal,
+            decision == "check"))
+    if leased:
+        _ChunkClaimPool(executor, [chunks[i] for i in leased], [futures[i] for i in leased],
+                        system_prompt, rate_limiter, journal, lease_queue, base_id).start()
+    return futures
+
+def prefilter_report(chunks, results):
+    """
+    submit_chunk_summaries 後のチャンクと結果から、事前判定で省けた呼び出し数を集計する。
+    """
+    local_skips = sum(1 for c in chunks if c.get('prefilter') == "skip")
+    llm_checks = sum(1 for c in chunks if c.get('prefilter') == "check")
+    llm_rejects = sum(
+        1 for c, r in zip(chunks, results)
+        if c.get('prefilter') == "check" and r == SKIPPED_CHUNK_OUTPUT
+    )
+    return {
+        "chunks": len(chunks),
+        "local_skips": local_skips,
+        "llm_checks": llm_checks,
+        "llm_rejects": llm_rejects,
+        # 事前判定なしなら 1 チャンク 1 回（要約）。ローカルで落とせば 1 回減り、Yes/No 判定は
+        # 1 回増え、判定で落とせば要約の 1 回が減る（差し引きなので負にもなりうる）
+        "calls_avoided": local_skips + llm_rejects - llm_checks,
+    }
+
+############################################
+# 複数ファイルのステージ型パイプライン
+#   parse/chunk → LLM（全ファイル共通の並列度） → CSV書き出し/移動
+############################################
+class FileJob:
+    """パイプライン上を流れる 1 ファイル分の作業単位。"""
+
+    def __init__(self, filename, file_path, base_id):
+        self.filename = filename
+        self.file_path = file_path
+        self.base_id = base_id
+        self.chunks = []
+        self.futures = []
+        self.journal = None
+        self.minhash = None
+        self.lease = None
+        # LLM ステージでチャンクを投入できなかったときの例外（書き出しステージで失敗として扱う）
+        self.error = None
+
+_PIPELINE_DONE = object()
+
+def _move_srt_to_done(job, done_srt_dir, exclusive):
+    try:
+        shutil.move(job.file_path, os.path.join(done_srt_dir, job.filename))
+    except FileNotFoundError:
+        # 複数ワーカーのときは、ほかのワーカーがすでに移動していることがある
+        if not exclusive:
+            raise
+
+def finalize_file(job, all_csv_outputs, api_dir, done_srt_dir, consolidator=None, store=None,
+                  exclusive=False, merge_topics=False):
+    """
+    要約結果を CSV にまとめて保存し、SRT を done_srt に移動する。
+    consolidator（ConsolidatedCsvWriter）を渡すと、同じ行を集約 CSV にも追記する。
+    store（SummaryStore）を渡すと、同じ行を検索用の索引にも取り込む。
+    exclusive=True（複数ワーカー）では CSV を os.link で作り、すでにあれば
+    ほかのワーカーが確定させたものとして何もしない（確定は 1 回だけ）。
+    merge_topics=True なら隣り合う同じ議題の行をまとめてから書き出す。
+    CSV を書き出した場合はそのパスを、スキップした場合は None を返す。
+    """
+    # チャンク全体で中身が4行未満ならスキップ
+    combined_text = "\n".join(all_csv_outputs).strip()
+    line_count = len([line for line in combined_text.splitlines() if line.strip()])
+    if line_count < 4:
+        print(f"=== Skipping {job.base_id}: only {line_count} line(s) of output ===")
+        # 再処理防止のため .srt ファイルも done_srt に移動
+        _move_srt_to_done(job, done_srt_dir, exclusive)
+        if job.journal is not None:
+            job.journal.remove()
+        return None
+
+    # すべてのチャンクのCSVを一時ファイルにまとめ、完成してから rename で置き換える
+    # （途中で落ちても中途半端な CSV が残らない）
+    csv_path = os.path.join(api_dir, f"{job.base_id}.csv")
+    tmp_path = csv_path + (f".{os.getpid()}.tmp" if exclusive else ".tmp")
+    rows = unify_and_save_csv(all_csv_outputs, tmp_path, job.base_id, merge_topics)
+    if exclusive:
+        try:
+            os.link(tmp_path, csv_path)
+        except FileExistsError:
+            print(f"=== {job.base_id} was already finalized by another worker ===")
+            metrics.METRICS.incr("finalize_lost_races")
+            return None
+        finally:
+            os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, csv_path)
+    print(f"CSV saved to: {csv_path} (id: {job.base_id})")
+    if consolidator is not None:
+        consolidated_path = consolidator.append(job.base_id, rows)
+        print(f"=== Appended {len(rows)} row(s) to {consolidated_path} ===")
+    if store is not None:
+        with metrics.METRICS.span("index_rows"):
+            store.ingest_rows(job.base_id, rows, csv_path)
+
+    # 元のSRTファイルも done_srt ディレクトリに移動（再処理防止のため）
+    _move_srt_to_done(job, done_srt_dir, exclusive)
+    if job.journal is not None:
+        job.journal.remove()
+    return csv_path
+
+def _parse_stage(jobs, out_queue, chunk_options, fingerprint=False, failures=None):
+    """
+    ステージのスレッドが例外で止まっても、次のステージが待ち続けないよう
+    必ず _PIPELINE_DONE を送る。止まった原因の例外は failures に入れる。
+    """
+    try:
+        for job in jobs:
+            try:
+                # SRTファイルを逐次読みしながらチャンク化（先頭字幕のtimestampを保持）
+                with metrics.METRICS.span("parse_and_chunk", file=job.filename):
+                    job.chunks = chunk_subs(iter_srt_subs(job.file_path), **chunk_options)
+                if fingerprint:
+                    with metrics.METRICS.span("fingerprint", file=job.filename):
+                        job.minhash = fingerprint_chunks(job.chunks)
+            except Exception as e:
+                print(f"=== ERROR parsing {job.filename}: {e}")
+                continue
+            print(f"=== Chunked {job.filename}: {format_token_stats(chunk_token_stats(job.chunks))} ===")
+            if chunk_options.get("compact"):
+                report = compaction_report(job.chunks)
+                print(f"=== Compacted {job.filename}: {report['raw_tokens']} → {report['tokens']} tokens "
+                      f"({report['saved']} saved, {report['saved_ratio']:.0%}) ===")
+            out_queue.put(job)
+    except Exception as e:
+        print(f"=== ERROR listing files: {e}")
+        if failures is not None:
+            failures.append(e)
+    finally:
+        out_queue.put(_PIPELINE_DONE)
+
+def _reuse_duplicate_file(job, dedup):
+    """
+    確定済みのほぼ同じファイルがあれば、その要約を job のチャンクとして使う。
+    使い回した場合は True を返す。
+    """
+    match = dedup.find_file(job.minhash, job.base_id)
+    if match is None:
+        return False
+    source_id, similarity, records = match
+    # 署名は時刻を見ないので、開始位置のずれた録画も一致する。出力の時刻を新しいファイルに合わせる
+    delta_ms = 0
+    if job.chunks and records:
+        delta_ms = parse_srt_time(job.chunks[0]['timestamp']) - parse_srt_time(records[0][0])
+    print(f"=== Duplicate: {job.filename} matches {source_id} (similarity {similarity:.2f}); "
+          f"reusing {len(records)} chunk summary(ies) ===")
+    job.chunks = [
+        {'timestamp': format_srt_time(max(0, parse_srt_time(timestamp) + delta_ms)), 'text': "",
+         'minhash': signature, 'reused_from': (source_id, similarity)}
+        for timestamp, signature, _ in records
+    ]
+    job.futures = [_completed_future(shift_output_timestamps(output, delta_ms))
+                   for _, _, output in records]
+    dedup.link(job.base_id, source_id, "file", similarity, len(records))
+    metrics.METRICS.incr("dedup_files_reused")
+    metrics.METRICS.incr("dedup_chunks_reused", len(records))
+    return True
+
+def _link_reused_chunks(job, dedup):
+    """チャンク単位で使い回した分を、元のファイルごとにまとめて記録する。"""
+    by_source = {}
+    for chunk_data in job.chunks:
+        if 'reused_from' in chunk_data:
+            source_id, similarity = chunk_data['reused_from']
+            by_source.setdefault(source_id, []).append(similarity)
+    for source_id, similarities in by_source.items():
+        dedup.link(job.base_id, source_id, "chunk", sum(similarities) / len(similarities),
+                   len(similarities))
+    reused = sum(len(similarities) for similarities in by_source.values())
+    if reused:
+        print(f"=== Reusing {reused} of {len(job.chunks)} chunk summary(ies) for {job.filename} "
+              f"from {', '.join(sorted(by_source))} ===")
+        metrics.METRICS.incr("dedup_chunks_reused", reused)
+
+def _submit_job(job, executor, api_dir, system_prompt, rate_limiter, prefilter, dedup, chunk_queue):
+    """job のチャンクを要約に投入する。書き出しステージに渡さなくてよければ False を返す。"""
+    if chunk_queue is not None:
+        if not os.path.exists(job.file_path):
+            print(f"=== {job.filename} was finalized by another worker ===")
+            return False
+        job.journal = SharedChunkJournal(os.path.join(chunk_queue.root, "chunks", job.base_id),
+                                         job.file_path)
+    else:
+        job.journal = open_chunk_journal(api_dir, job.base_id)
+    if dedup is not None and _reuse_duplicate_file(job, dedup):
+        return True
+    if len(job.journal):
+        print(f"=== Resuming: {job.filename} ({len(job.journal)} chunk(s) in journal) ===")
+        metrics.METRICS.incr("journal_resumed_files")
+    print(f"=== Processing: {job.filename} ({len(job.chunks)} chunk(s)) ===")
+    job.futures = submit_chunk_summaries(
+        executor, job.chunks, system_prompt, rate_limiter, job.journal, prefilter,
+        dedup, job.base_id, chunk_queue)
+    if dedup is not None:
+        _link_reused_chunks(job, dedup)
+    return True
+
+def _llm_stage(in_queue, out_queue, executor, api_dir, system_prompt, rate_limiter, prefilter,
+               dedup=None, chunk_queue=None, failures=None):
+    """
+    投入に失敗したファイルは job.error を付けて書き出しステージに渡す
+    （チャンクの要約に失敗したときと同じく、確定させずに再試行へ回す）。
+    """
+    try:
+        while True:
+            job = in_queue.get()
+            if job is _PIPELINE_DONE:
+                return
+            try:
+                if not _submit_job(job, executor, api_dir, system_prompt, rate_limiter, prefilter,
+                                   dedup, chunk_queue):
+                    continue
+            except Exception as e:
+                print(f"=== ERROR submitting {job.filename}: {e}")
+                job.error = e
+                job.chunks, job.futures = [], []
+            out_queue.put(job)
+    except Exception as e:
+        if failures is not None:
+            failures.append(e)
+    finally:
+        out_queue.put(_PIPELINE_DONE)
+
+def _leave_for_retry(job, errors, what, retry=None, seen_ids=None):
+    """
+    確定できなかったファイルを残し、retry（FileRetryTracker）があればその再試行の時期に、
+    無ければ seen_ids から外して次の走査で拾い直されるようにする。
+    """
+    if retry is not None:
+        retry.failed(job, errors)
+        return
+    print(f"=== Leaving {job.filename} for retry: {len(errors)} {what} ===")
+    if seen_ids is not None:
+        seen_ids.discard(job.base_id)
+
+def run_pipeline(jobs, api_dir, done_srt_dir, system_prompt=SYSTEM_PROMPT,
+                 workers=MAX_CONCURRENCY, rate_limiter=None, queue_size=4,
+                 chunk_options=None, prefilter=None, consolidator=None, seen_ids=None,
+                 store=None, dedup=None, lease_queue=None, chunk_leases=False,
+                 merge_topics=False, retry=None):
+    """
+    jobs（FileJob の列）を 3 ステージで処理する。
+
+    * parse/chunk ステージ: SRT を読み込みチャンク化
+    * LLM ステージ: 全ファイルで共有する workers 本のスレッドで要約
+    * 書き出しステージ: 結果をタイムスタンプ順に集めて CSV 保存・SRT 移動
+
+    ステージ間は maxsize=queue_size のキューでつなぐので、同時にメモリ上に
+    載るファイル数は一定に保たれる。処理したファイル数を返す。
+
+    再試行しても要約できなかったチャンクがあるファイルは確定させず、SRT を
+    残したままにする（要約済みのチャンクは journal に残るので、次回はその分だけ
+    やり直す）。seen_ids（watch モードの処理済み集合）を渡すと、そこからも外す。
+    retry（FileRetryTracker）を渡した場合は seen_ids から外さず、再試行の時期を
+    retry に任せる（致命的なエラーや回数超過のファイルは再試行しない）。
+
+    dedup（DuplicateIndex）を渡すと、チャンク化のついでに MinHash 署名を計算し、
+    ほぼ同じ確定済みファイル（chunk_level ならチャンク）の要約を使い回す。
+    確定したファイルは署名と出力を dedup に登録する。
+
+    lease_queue（LeaseQueue）を渡すと、共有 api_dir で複数のワーカーと分担する。
+    ファイル単位（デフォルト）ではリースを取れたファイルだけを処理し、
+    chunk_leases=True ではチャンクごとにリースを取る。どちらも CSV の確定は 1 回だけ。
+
+    merge_topics=True なら確定時に隣り合う同じ議題の行をまとめる（merge_adjacent_topic_rows）。
+    """
+    parsed_queue = queue.Queue(maxsize=queue_size)
+    submitted_queue = queue.Queue(maxsize=queue_size)
+    processed = 0
+    failures = []
+    chunk_queue = lease_queue if chunk_leases else None
+    if lease_queue is not None:
+        jobs = claim_jobs(jobs, lease_queue, api_dir, chunk_leases, seen_ids)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        parse_thread = threading.Thread(
+            target=_parse_stage,
+            args=(jobs, parsed_queue, chunk_options or {}, dedup is not None, failures),
+            daemon=True)
+        llm_thread = threading.Thread(
+            target=_llm_stage,
+            args=(parsed_queue, submitted_queue, executor, api_dir, system_prompt, rate_limiter,
+                  prefilter, dedup, chunk_queue, failures),
+            daemon=True)
+        parse_thread.start()
+        llm_thread.start()
+
+        while True:
+            job = submitted_queue.get()
+            if job is _PIPELINE_DONE:
+                break
+            all_csv_outputs = []
+            results = []
+            errors = [job.error] if job.error is not None else []
+            for chunk_data, future in zip(job.chunks, job.futures):
+                timestamp = chunk_data['timestamp']
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"=== ERROR summarizing chunk at {timestamp}: {e}")
+                    results.append(None)
+                    errors.append(e)
+                    continue
+                results.append(result)
+                if result == SKIPPED_CHUNK_OUTPUT:
+                    print("== Skipped empty chunk at", timestamp)
+                    continue
+                all_csv_outputs.append(result)
+                print("== Summarized chunk at", timestamp)
+                print(result)
+                print()
+            metrics.METRICS.incr("chunks_total", len(job.chunks))
+            metrics.METRICS.incr("chunks_failed", len(errors))
+            if prefilter is not None:
+                report = prefilter_report(job.chunks, results)
+                metrics.METRICS.incr("prefilter_local_skips", report['local_skips'])
+                metrics.METRICS.incr("prefilter_llm_checks", report['llm_checks'])
+                metrics.METRICS.incr("prefilter_llm_rejects", report['llm_rejects'])
+                metrics.METRICS.incr("llm_calls_avoided", report['calls_avoided'])
+                print(f"=== Prefilter {job.filename}: {report['local_skips']} local skip(s), "
+                      f"{report['llm_checks']} LLM check(s) ({report['llm_rejects']} rejected), "
+                      f"net {report['calls_avoided']} call(s) avoided ===")
+            chunk_records = [
+                (chunk_data['timestamp'], chunk_data.get('minhash'), result)
+                for chunk_data, result in zip(job.chunks, results)
+            ]
+            # 結果を書き出したら参照を切ってメモリを解放
+            job.chunks, job.futures = [], []
+            if lease_queue is not None and not os.path.exists(job.file_path):
+                print(f"=== {job.filename} was finalized by another worker ===")
+                if job.lease is not None:
+                    job.lease.release()
+                continue
+            if errors:
+                _leave_for_retry(job, errors, "chunk(s) failed", retry, seen_ids)
+                if job.lease is not None:
+                    job.lease.release()
+                continue
+            try:
+                with metrics.METRICS.span("finalize_file", file=job.filename):
+                    finalize_file(job, all_csv_outputs, api_dir, done_srt_dir, consolidator, store,
+                                  exclusive=lease_queue is not None, merge_topics=merge_topics)
+            except Exception as e:
+                print(f"=== ERROR finalizing {job.filename}: {e}")
+                # 要約はジャーナルに残っているので、次回は書き出しだけをやり直す
+                _leave_for_retry(job, [e], "finalize failed", retry, seen_ids)
+                continue
+            finally:
+                if job.lease is not None:
+                    job.lease.release()
+            if dedup is not None:
+                dedup.record_file(job.base_id, job.minhash, chunk_records)
+            if retry is not None:
+                retry.succeeded(job.base_id)
+            processed += 1
+            metrics.METRICS.incr("files_processed")
+
+        parse_thread.join()
+        llm_thread.join()
+    if failures:
+        # 書き出せたファイルは書き出したうえで、ステージを止めた例外を呼び出し元に返す
+        raise failures[0]
+    return processed
+
+def collect_pending_jobs(api_dir, completed_csv_ids):
+    """api_dir 内の未処理 .srt を FileJob として順に返すジェネレーター。"""
+    for filename in sorted(os.listdir(api_dir)):
+        if not filename.endswith(".srt"):
+            continue
+        # 拡張子を除いたファイル名をIDとして活用（例: "abc.srt" → "abc"）
+        base_id = os.path.splitext(filename)[0]
+        if base_id in completed_csv_ids:
+            print(f"=== Skipping {filename} (already summarized) ===")
+            continue
+        file_path = os.path.join(api_dir, filename)
+        if not os.path.isfile(file_path):
+            continue
+        yield FileJob(filename, file_path, base_id)
@@ -0,0 +1,531 @@
+"""SRT の読み込みと、時間・トークン数・議題ごとのチャンク化。"""
+import re
+from collections import namedtuple
+
+from . import metrics
+
+############################################
+# SRT のストリーミング・パーサー
+############################################
+# 1 字幕 = (連番, 開始ミリ秒, 終了ミリ秒, 本文)
+SrtSub = namedtuple("SrtSub", "index start_ms end_ms text")
+
+_SRT_TIMING_RE = re.compile(
+    r"(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+)
+
+def format_srt_time(ms):
+    """ミリ秒を "HH:MM:SS,mmm" にする。"""
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{ms:03}"
+
+def parse_srt_time(time_str):
+    """ "HH:MM:SS,mmm" をミリ秒にする。"""
+    h, m, rest = time_str.split(':')
+    s, ms = rest.split(',')
+    return ((int(h) * 60 + int(m)) * 60 + int(s)) * 1000 + int(ms)
+
+def _srt_block_to_sub(block, fallback_index):
+    for i, line in enumerate(block):
+        if "-->" not in line:
+            continue
+        match = _SRT_TIMING_RE.search(line)
+        if match is None:
+            continue
+        h1, m1, s1, ms1, h2, m2, s2, ms2 = map(int, match.groups())
+        index = fallback_index
+        if i > 0 and block[i - 1].strip().isdigit():
+            index = int(block[i - 1].strip())
+        return SrtSub(
+            index,
+            ((h1 * 60 + m1) * 60 + s1) * 1000 + ms1,
+            ((h2 * 60 + m2) * 60 + s2) * 1000 + ms2,
+            "\n".join(block[i + 1:]),
+        )
+    return None
+
+def iter_srt_subs(file_path):
+    """
+    SRT ファイルを 1 行ずつ読み、字幕ごとに SrtSub を yield するジェネレーター。
+    ファイル全体をメモリに載せないので、巨大なアーカイブでもメモリ使用量は一定。
+    タイミング行の無いブロックは読み飛ばす。
+    """
+    block = []
+    count = 0
+    with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.strip():
+                block.append(line)
+                continue
+            if block:
+                sub = _srt_block_to_sub(block, count + 1)
+                block = []
+                if sub is not None:
+                    count += 1
+                    yield sub
+    if block:
+        sub = _srt_block_to_sub(block, count + 1)
+        if sub is not None:
+            yield sub
+
+############################################
+# SRTの字幕を (index, text) のリストにする関数
+############################################
+def parse_srt_as_subs(file_path: str):
+    """
+    SRTファイルを読み込み、
+    (字幕インデックス, 開始時刻 "HH:MM:SS,mmm", 字幕テキスト) のタプルをまとめたリストを返す。
+    大きなファイルを順に処理するだけなら iter_srt_subs を直接使う方が省メモリ。
+    """
+    with metrics.METRICS.span("parse_srt_as_subs"):
+        return [(sub.index, format_srt_time(sub.start_ms), sub.text) for sub in iter_srt_subs(file_path)]
+
+############################################
+# 字幕を 60分単位でチャンク化しつつ、
+# 先頭のインデックスを "timestamp" として保持
+############################################
+def _sub_start_ms(sub):
+    start = sub[1]
+    return parse_srt_time(start) if isinstance(start, str) else start
+
+def iter_srt_chunks(subs, max_minutes=60):
+    """
+    字幕の列（SrtSub もしくは parse_srt_as_subs のタプル）を逐次読み、
+    先頭からの経過が *max_minutes* に達するごとにチャンクを yield する。
+    入力はジェネレーターでよく、1 チャンク分しか保持しない。
+    """
+    max_duration_ms = max_minutes * 60 * 1000
+
+    current_text = []
+    first_ms = None
+    first_timestamp_in_chunk = None
+
+    for sub in subs:
+        current_ms = _sub_start_ms(sub)
+        start_time_str = format_srt_time(current_ms)
+
+        # Initialise the first timestamp of a new chunk
+        if first_ms is None:
+            first_ms = current_ms
+            first_timestamp_in_chunk = start_time_str
+
+        # If adding this subtitle would exceed the chunk duration limit,
+        # close the current chunk and start a new one.
+        if current_ms - first_ms >= max_duration_ms and current_text:
+            yield {
+                'text': ''.join(current_text),
+                'timestamp': first_timestamp_in_chunk
+            }
+            current_text = []
+            first_ms = current_ms
+            first_timestamp_in_chunk = start_time_str
+
+        # Append current subtitle block
+        current_text.append(f"{start_time_str} {sub[-1]}\n")
+
+    # Flush the final chunk
+    if current_text:
+        yield {
+            'text': ''.join(current_text),
+            'timestamp': first_timestamp_in_chunk
+        }
+
+def chunk_srt_subs_with_timestamp(subs_list, max_minutes=60):
+    """
+    Break subtitles into chunks whose total duration does not exceed *max_minutes*.
+    Each chunk keeps the timestamp of its first subtitle as `timestamp`.
+
+    Parameters
+    ----------
+    subs_list : iterable
+        Either tuples (index, start_time_str, sub_text) where *start_time_str*
+        is `"HH:MM:SS,mmm"`, or `SrtSub` records from `iter_srt_subs`.
+    max_minutes : int, optional
+        Maximum duration of one chunk, in minutes.  Default is 60 (≈1 hour).
+
+    Returns
+    -------
+    list[dict]
+        `[{'text': str, 'timestamp': str}, ...]`
+        *text*  – concatenated subtitle blocks in this chunk  
+        *timestamp* – start time of the first subtitle in the chunk
+    """
+    with metrics.METRICS.span("chunk_srt_subs_with_timestamp"):
+        return list(iter_srt_chunks(subs_list, max_minutes))
+
+############################################
+# トークン数の予算でチャンク化
+############################################
+DEFAULT_MAX_CHUNK_TOKENS = 8000
+DEFAULT_MIN_SILENCE_MS = 3000
+
+_CJK_RE = re.compile(r"[\u3000-\u30ff\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_tiktoken_encoding = None
+
+def count_tokens(text):
+    """
+    text のトークン数をローカルで数える。
+    tiktoken が入っていればそれを使い、無ければ
+    「CJK 文字は 1 文字 1 トークン、それ以外は 4 文字 1 トークン」で近似する。
+    """
+    global _tiktoken_encoding
+    if _tiktoken_encoding is None:
+        try:
+            import tiktoken
+            _tiktoken_encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tiktoken_encoding = False
+    if _tiktoken_encoding:
+        return len(_tiktoken_encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def count_message_tokens(messages):
+    """
+    chat 形式の messages を送ったときの入力トークン数（system プロンプトを含む）。
+    メッセージ 1 件ごとの区切り（数トークン）も足しておく。
+    """
+    return sum(count_tokens(message["content"]) + 4 for message in messages) + 3
+
+def _pick_cut(buffered, lookback_tokens, min_silence_ms):
+    """
+    buffered（(sub, line, tokens) のリスト）をどこで切るかを返す。
+    末尾 lookback_tokens 分の範囲で字幕間の無音が最も長い位置を探し、
+    min_silence_ms 以上ならそこで、無ければ末尾で切る。
+    """
+    best_cut, best_gap = len(buffered), -1
+    seen_tokens = 0
+    for i in range(len(buffered) - 1, 0, -1):
+        seen_tokens += buffered[i][2]
+        if seen_tokens > lookback_tokens:
+            break
+        gap = buffered[i][0].start_ms - buffered[i - 1][0].end_ms
+        if gap > best_gap:
+            best_cut, best_gap = i, gap
+    if best_gap >= min_silence_ms:
+        return best_cut
+    return len(buffered)
+
+def iter_token_chunks(subs, max_tokens=DEFAULT_MAX_CHUNK_TOKENS, overlap_tokens=0,
+                      min_silence_ms=DEFAULT_MIN_SILENCE_MS):
+    """
+    SrtSub の列をトークン数 max_tokens 以内に詰めてチャンクを yield する。
+
+    * 予算を超えそうになったら、チャンク末尾 1/4 の範囲で最も長い無音
+      （min_silence_ms 以上）の位置を優先して切る
+    * overlap_tokens > 0 なら、前のチャンクの末尾をその分だけ次のチャンクの先頭に重ねる
+    * 1 字幕だけで予算を超える場合はその字幕だけで 1 チャンクにする（切り詰めはしない）
+
+    Returns (yield)
+    ---------------
+    dict
+        `{'text': str, 'timestamp': str, 'tokens': int}`
+    """
+    buffered = []
+    buffered_tokens = 0
+    lookback_tokens = max_tokens // 4
+
+    def emit(part):
+        return {
+            'text': ''.join(line for _, line, _ in part),
+            'timestamp': format_srt_time(part[0][0].start_ms),
+            'tokens': sum(tokens for _, _, tokens in part),
+        }
+
+    for sub in subs:
+        line = f"{format_srt_time(sub.start_ms)} {sub.text}\n"
+        tokens = count_tokens(line)
+        if buffered and buffered_tokens + tokens > max_tokens:
+            cut = _pick_cut(buffered, lookback_tokens, min_silence_ms)
+            yield emit(buffered[:cut])
+
+            carried = buffered[cut:]
+            overlap = []
+            if overlap_tokens > 0:
+                budget = overlap_tokens
+                for item in reversed(buffered[:cut]):
+                    if item[2] > budget:
+                        break
+                    overlap.insert(0, item)
+                    budget -= item[2]
+            buffered = overlap + carried
+            buffered_tokens = sum(item[2] for item in buffered)
+            # 重ねた分で予算を超えるなら重ねない
+            if buffered_tokens + tokens > max_tokens:
+                buffered = carried
+                buffered_tokens = sum(item[2] for item in buffered)
+        buffered.append((sub, line, tokens))
+        buffered_tokens += tokens
+
+    if buffered:
+        yield emit(buffered)
+
+############################################
+# 議題（トピック）ごとの分割
+############################################
+DEFAULT_MIN_SEGMENT_TOKENS = 800
+# 上限で切るのは長い議題の途中なので、tokens モードと同じ予算にして無駄な区切りを減らす
+DEFAULT_MAX_SEGMENT_TOKENS = DEFAULT_MAX_CHUNK_TOKENS
+TOPIC_WINDOW_SUBS = 20
+TOPIC_LONG_PAUSE_MS = 20000
+TOPIC_DEPTH_DEVIATIONS = 2.0
+# 議長の進行の言い回し。START はその字幕の前で、END はその字幕の後で区切る
+TOPIC_START_PHRASES = ("次に", "日程第", "続いて", "を議題と", "に移ります", "再開します", "再開いたします")
+TOPIC_END_PHRASES = ("質疑を終結", "討論を終結", "質疑を終わ", "休憩します", "休憩いたします",
+                     "散会します", "以上で質問を終わ", "以上で終わります")
+_TOPIC_START_HEAD_CHARS = 20
+_TOPIC_TERM_RE = re.compile(r"[\u4e00-\u9fff々〆ヶ\u30a0-\u30ff]{2,}|[A-Za-z0-9\uff10-\uff19\uff21-\uff3a\uff41-\uff5a]{2,}")
+_TOPIC_SPEAKER_PREFIX = "○◯◎ 　"
+
+def topic_terms(text):
+    """漢字・カタカナ・英数字の連なりの 2-gram（分かち書きなしで語彙の重なりを見るため）。"""
+    terms = []
+    for run in _TOPIC_TERM_RE.findall(text):
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+def _cohesion_scores(term_lists, window=TOPIC_WINDOW_SUBS):
+    """
+    字幕 i-1 と i の間（i = 1..n-1）について、前後 window 字幕の語彙の
+    cosine 類似度を返す（scores[0] は使わない）。窓は 1 字幕ずつずらしながら
+    内積とノルムを差分で更新するので、全体で O(語数)。
+    """
+    n = len(term_lists)
+    left, right = {}, {}
+    state = [0, 0, 0]  # 内積, |left|^2, |right|^2
+
+    def update(vec, other, norm_index, terms, sign):
+        for term in terms:
+            old = vec.get(term, 0)
+            vec[term] = old + sign
+            state[0] += sign * other.get(term, 0)
+            state[norm_index] += 2 * old * sign + 1
+
+    for i in range(min(window, n)):
+        update(right, left, 2, term_lists[i], 1)
+    scores = [0.0] * n
+    for i in range(1, n):
+        update(right, left, 2, term_lists[i - 1], -1)
+        update(left, right, 1, term_lists[i - 1], 1)
+        if i - 1 - window >= 0:
+            update(left, right, 1, term_lists[i - 1 - window], -1)
+        if i - 1 + window < n:
+            update(right, left, 2, term_lists[i - 1 + window], 1)
+        dot, left_norm, right_norm = state
+        scores[i] = dot / (left_norm * right_norm) ** 0.5 if left_norm and right_norm else 0.0
+    return scores
+
+def _depth_scores(scores):
+    """
+    TextTiling の depth: 谷（scores の極小）ごとに、両側の山の高さと谷の深さの差の和
+    （大きいほど話題の切れ目）。谷でない位置は 0。
+    """
+    n = len(scores)
+    depths = [0.0] * n
+    for i in range(1, n):
+        if scores[i] > scores[i - 1] or (i + 1 < n and scores[i] > scores[i + 1]):
+            continue
+        left_peak = scores[i]
+        j = i - 1
+        while j >= 1 and scores[j] >= left_peak:
+            left_peak = scores[j]
+            j -= 1
+        right_peak = scores[i]
+        j = i + 1
+        while j < n and scores[j] >= right_peak:
+            right_peak = scores[j]
+            j += 1
+        depths[i] = (left_peak - scores[i]) + (right_peak - scores[i])
+    return depths
+
+def _cohesion_boundaries(depths, window=TOPIC_WINDOW_SUBS, deviations=TOPIC_DEPTH_DEVIATIONS):
+    """
+    語彙のまとまりの切れ目とみなす位置の集合。谷の depth がファイル全体の
+    谷の平均 + deviations × 標準偏差以上で、前後 window // 2 の中で最も深いもの。
+    """
+    valleys = [d for d in depths[1:] if d > 0]
+    if len(valleys) < 2:
+        return set()
+    mean = sum(valleys) / len(valleys)
+    std = (sum((d - mean) ** 2 for d in valleys) / len(valleys)) ** 0.5
+    cutoff = mean + deviations * std
+    half = window // 2
+    return {i for i, d in enumerate(depths)
+            if i > 0 and d > 0 and d >= cutoff and d == max(depths[max(1, i - half):i + half + 1])}
+
+def _topic_cue(prev_text, text):
+    """議長の進行の言い回しで区切りが示されていれば True。"""
+    head = text.lstrip(_TOPIC_SPEAKER_PREFIX)[:_TOPIC_START_HEAD_CHARS]
+    return (any(phrase in head for phrase in TOPIC_START_PHRASES)
+            or any(phrase in prev_text for phrase in TOPIC_END_PHRASES))
+
+def iter_topic_segments(subs, min_tokens=DEFAULT_MIN_SEGMENT_TOKENS,
+                        max_tokens=DEFAULT_MAX_SEGMENT_TOKENS, long_pause_ms=TOPIC_LONG_PAUSE_MS):
+    """
+    SrtSub の列を議題（トピック）ごとのセグメントに分けて yield する。
+
+    字幕の間ごとに次の手がかりを見て、min_tokens 以上たまっていれば区切る。
+        * 議長の進行の言い回し（「次に」「日程第」/「質疑を終結」「休憩します」など）
+        * long_pause_ms 以上の無音
+        * 語彙のまとまりの谷（前後の窓の cosine 類似度の depth、_cohesion_boundaries）
+    max_tokens を超えそうになったら、そのセグメント内で手がかりが最も強い位置で切る。
+    最後に残ったセグメントが min_tokens に満たなければ、1 つ前のセグメントにつなげる。
+
+    Returns (yield)
+    ---------------
+    dict
+        `{'text': str, 'timestamp': str, 'tokens': int}`（iter_token_chunks と同じ形）
+    """
+    subs = list(subs)
+    if not subs:
+        return
+    lines = [f"{format_srt_time(sub.start_ms)} {sub.text}\n" for sub in subs]
+    tokens = [count_tokens(line) for line in lines]
+    depths = _depth_scores(_cohesion_scores([topic_terms(sub.text) for sub in subs]))
+    boundaries = _cohesion_boundaries(depths)
+
+    cuts = [0]
+    segment_tokens = 0
+    best = None  # (字幕の位置, 強さ)
+    for i, sub in enumerate(subs):
+        if i > cuts[-1]:
+            gap_ms = sub.start_ms - subs[i - 1].end_ms
+            if segment_tokens >= min_tokens:
+                if _topic_cue(subs[i - 1].text, sub.text) or gap_ms >= long_pause_ms or i in boundaries:
+                    cuts.append(i)
+                    segment_tokens, best = 0, None
+                else:
+                    strength = depths[i] + min(1.0, gap_ms / long_pause_ms)
+                    if best is None or strength > best[1]:
+                        best = (i, strength)
+            if segment_tokens + tokens[i] > max_tokens and i > cuts[-1]:
+                cut = best[0] if best is not None else i
+                cuts.append(cut)
+                best = None
+                segment_tokens = sum(tokens[cut:i])
+        segment_tokens += tokens[i]
+    if len(cuts) > 1 and segment_tokens < min_tokens:
+        cuts.pop()
+    cuts.append(len(subs))
+
+    for begin, end in zip(cuts, cuts[1:]):
+        yield {
+            'text': ''.join(lines[begin:end]),
+            'timestamp': format_srt_time(subs[begin].start_ms),
+            'tokens': sum(tokens[begin:end]),
+        }
+
+def chunk_subs(subs, mode="time", max_minutes=60, max_tokens=DEFAULT_MAX_CHUNK_TOKENS,
+               overlap_tokens=0, min_silence_ms=DEFAULT_MIN_SILENCE_MS, compact=False,
+               min_segment_tokens=DEFAULT_MIN_SEGMENT_TOKENS,
+               max_segment_tokens=DEFAULT_MAX_SEGMENT_TOKENS):
+    """
+    mode に応じて SrtSub の列をチャンクのリストにする。
+        "time"   : max_minutes ごと（従来どおり）
+        "tokens" : max_tokens のトークン予算ごと
+        "topics" : 議題ごと（min_segment_tokens〜max_segment_tokens、iter_topic_segments）
+    compact=True なら本文を compact_chunk_text で圧縮する。
+    """
+    if mode == "tokens":
+        chunks = list(iter_token_chunks(subs, max_tokens, overlap_tokens, min_silence_ms))
+    elif mode == "topics":
+        chunks = list(iter_topic_segments(subs, min_segment_tokens, max_segment_tokens))
+    elif mode == "time":
+        chunks = list(iter_srt_chunks(subs, max_minutes))
+    else:
+        raise ValueError(f"unknown chunk mode: {mode}")
+    if compact:
+        compact_chunks(chunks)
+    return chunks
+
+def chunk_token_stats(chunks):
+    """チャンクのトークン数の分布 (count/min/p50/p95/max/total) を返す。"""
+    counts = sorted(
+        chunk['tokens'] if 'tokens' in chunk else count_tokens(chunk['text'])
+        for chunk in chunks
+    )
+    if not counts:
+        return {"count": 0, "min": 0, "p50": 0, "p95": 0, "max": 0, "total": 0}
+
+    def percentile(p):
+        return counts[min(len(counts) - 1, int(round(p * (len(counts) - 1))))]
+
+    return {
+        "count": len(counts),
+        "min": counts[0],
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "max": counts[-1],
+        "total": sum(counts),
+    }
+
+def format_token_stats(stats):
+    return (f"{stats['count']} chunk(s), tokens min/p50/p95/max = "
+            f"{stats['min']}/{stats['p50']}/{stats['p95']}/{stats['max']} "
+            f"(total {stats['total']})")
+
+############################################
+# 送信する字幕テキストの圧縮
+############################################
+_CHUNK_LINE_RE = re.compile(r"^(\d+:\d{2}:\d{2}),\d{3} (.*)$")
+_WHITESPACE_RE = re.compile(r"[\s\u3000]+")
+_SPEAKER_LABEL_RE = re.compile(r"^(?:[○◯◎]|[（(][^）)]{1,20}[）)])")
+
+def compact_chunk_text(text_chunk):
+    """
+    チャンク本文（"HH:MM:SS,mmm 字幕" の行の並び）を入力トークンが少ない形にする。
+
+    * 時刻は "[HH:MM:SS]"（ミリ秒なし）にし、分が変わったときと
+      話者が変わったとき（○ や（氏名）で始まる行）だけ付ける
+    * 直前と同じ字幕の繰り返しは 1 つにまとめる
+    * 連続する空白（全角スペースを含む）を 1 つにし、空行を除く
+
+    時刻は絶対時刻のままなので、要約中の "(HH:MM:SS)" はそのまま元の字幕に対応する。
+    """
+    out = []
+    last_minute = None
+    last_line = None
+    pending_time = None
+    for raw in text_chunk.splitlines():
+        match = _CHUNK_LINE_RE.match(raw)
+        if match:
+            pending_time, body = match.groups()
+        else:
+            body = raw
+        body = _WHITESPACE_RE.sub(" ", body).strip()
+        if not body or body == last_line:
+            continue
+        last_line = body
+        if pending_time is not None:
+            minute = pending_time[:5]
+            if minute != last_minute or _SPEAKER_LABEL_RE.match(body):
+                body = f"[{pending_time}] {body}"
+                last_minute = minute
+            pending_time = None
+        out.append(body)
+    return "\n".join(out) + "\n" if out else ""
+
+def compact_chunks(chunks):
+    """
+    chunks の本文を compact_chunk_text で置き換える。
+    各チャンクに raw_tokens（圧縮前）と tokens（圧縮後）を残す。
+    """
+    for chunk in chunks:
+        chunk['raw_tokens'] = chunk['tokens'] if 'tokens' in chunk else count_tokens(chunk['text'])
+        chunk['text'] = compact_chunk_text(chunk['text'])
+        chunk['tokens'] = count_tokens(chunk['text'])
+    return chunks
+
+def compaction_report(chunks):
+    """compact_chunks 後のチャンクについて、圧縮で減ったトークン数を返す。"""
+    before = sum(chunk.get('raw_tokens', chunk.get('tokens', 0)) for chunk in chunks)
+    after = sum(chunk.get('tokens', 0) for chunk in chunks)
+    return {
+        "raw_tokens": before,
+        "tokens": after,
+        "saved": before - after,
+        "saved_ratio": (before - after) / before if before else 0.0,
+    }
@@ -0,0 +1,191 @@
+"""要約の stance（立場）列の正規化。"""
+import os
+import csv
+
+# ---------------------------------------------------------------------
+#  Stance normalization utilities
+# ---------------------------------------------------------------------
+STANCE_CANON = {
+    # --- 導入決定 ---
+    "導入決定": "導入決定",
+    "契約":     "導入決定",
+    "予算計上": "導入決定",
+    # --- 導入済み ---
+    "導入済み": "導入済み",
+    "運用開始": "導入済み",
+    "本格運用": "導入済み",
+    # --- 内部決定・制度化 ---
+    "条例":        "内部決定・制度化",
+    "制定":        "内部決定・制度化",
+    "施行":        "内部決定・制度化",
+    "規則":        "内部決定・制度化",
+    "要綱":        "内部決定・制度化",
+    "改正条例":    "内部決定・制度化",
+    "内部決定":    "内部決定・制度化",
+    "事業廃止":    "内部決定・制度化",
+    "打ち切り":    "内部決定・制度化",
+    "廃止":        "内部決定・制度化",
+    "廃止決定":    "内部決定・制度化",
+    "廃止予定":    "内部決定・制度化",
+    "終了":        "内部決定・制度化",
+    "終了予定":    "内部決定・制度化",
+    # --- 前向き ---
+    "前向き":  "前向き",
+    "積極的":  "前向き",
+    "推進":    "前向き",
+    # --- 検討中 ---
+    "前向きに検討": "検討中",
+    "積極的に検討": "検討中",
+    "検討中": "検討中",
+    "協議":   "検討中",
+    "議論":   "検討中",
+    # --- 調査・情報収集段階 ---
+    "動向を見て":   "調査・情報収集段階",
+    "動向を注視":   "調査・情報収集段階",
+    "国の政策":     "調査・情報収集段階",
+    "情報収集":     "調査・情報収集段階",
+    "事例調査":     "調査・情報収集段階",
+    # --- 慎重・消極的 ---
+    "慎重":       "慎重・消極的",
+    "様子見":     "慎重・消極的",
+    "財源の動向": "慎重・消極的",
+    "導入困難":   "慎重・消極的",
+    # --- 反対・否定 ---
+    "反対": "反対・否定",
+    "否定": "反対・否定",
+    "不要": "反対・否定",
+    "否決": "反対・否定",
+    # --- 情報不足・判断不能 ---
+    "情報不足": "情報不足・判断不能",
+    "不明":     "情報不足・判断不能",
+    "言及なし": "情報不足・判断不能",
+    # --- 実証・試行段階 ---
+    "実証":     "実証・試行段階",
+    "試行":     "実証・試行段階",
+    "モデル事業": "実証・試行段階",
+    # --- 要望・提案段階 ---
+    "要望": "要望・提案段階",
+    "提案": "要望・提案段階",
+    "陳情": "要望・提案段階",
+    "請願": "要望・提案段階",
+}
+
+class StanceMatcher:
+    """
+    STANCE_CANON のキーを Aho-Corasick オートマトンにまとめた多パターン照合器。
+
+    テキストを 1 回走査するだけで、含まれるキーのうち
+    「最も長いもの（同じ長さなら辞書の定義順で先のもの）」を見つける。
+    これは旧実装の「長い順に並べて最初に含まれたキー」と同じ結果になる。
+    """
+
+    def __init__(self, canon):
+        # 長い順（同じ長さは定義順）に並べた順位が優先度。小さいほど優先。
+        self._keys = sorted(canon.keys(), key=len, reverse=True)
+        self._values = [canon[key] for key in self._keys]
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [len(self._keys)]  # len(keys) = マッチなし
+
+        for rank, key in enumerate(self._keys):
+            node = 0
+            for ch in key:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(len(self._keys))
+                node = nxt
+            self._best[node] = min(self._best[node], rank)
+
+        # 幅優先で失敗リンクを張り、失敗先で終わるキーの優先度も取り込む
+        order = list(self._goto[0].values())
+        for node in order:
+            for ch, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._best[child] = min(self._best[child], self._best[self._fail[child]])
+                order.append(child)
+
+    def match(self, text):
+        """text に含まれる最優先キーの正規ラベルを返す。無ければ None。"""
+        goto, fail, best = self._goto, self._fail, self._best
+        found = len(self._keys)
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if best[node] < found:
+                found = best[node]
+                if found == 0:
+                    break
+        return self._values[found] if found < len(self._keys) else None
+
+# STANCE_CANON を書き換えた場合は作り直すこと
+_STANCE_MATCHER = StanceMatcher(STANCE_CANON)
+
+def normalize_stance(text: str) -> str:
+    """
+    与えられた文字列を STANCE_CANON の正規ラベルに変換。
+    マッチしない場合は元の文字列を返す。
+    """
+    if not text or text.upper() == "NULL":
+        return "情報不足・判断不能"
+    # 長いフレーズほど優先的にマッチさせる
+    label = _STANCE_MATCHER.match(text)
+    return label if label is not None else text.strip()
+
+def normalize_stances(values):
+    """
+    複数の stance をまとめて正規化する（列全体など）。
+    同じ値は 1 度しか照合しないので、重複の多い過去データほど速い。
+    """
+    memo = {}
+    result = []
+    for value in values:
+        normalized = memo.get(value)
+        if normalized is None:
+            normalized = memo[value] = normalize_stance(value)
+        result.append(normalized)
+    return result
+
+def normalize_stance_csv(csv_path, column="stance"):
+    """
+    CSV の stance 列を一括で正規化して書き戻す（一時ファイル → rename）。
+    変更した行数を返す。column が無い CSV は何もしない。
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    if not rows or column not in rows[0]:
+        return 0
+    col = rows[0].index(column)
+    body = rows[1:]
+    normalized = normalize_stances([row[col] if col < len(row) else "" for row in body])
+    changed = 0
+    for row, value in zip(body, normalized):
+        if col < len(row) and row[col] != value:
+            row[col] = value
+            changed += 1
+    if changed:
+        tmp_path = csv_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f, quoting=csv.QUOTE_ALL).writerows(rows)
+        os.replace(tmp_path, csv_path)
+    return changed
+
+def normalize_stance_csv_dir(csv_dir, column="stance"):
+    """csv_dir 直下の全 CSV の stance 列を正規化する。(ファイル数, 変更行数) を返す。"""
+    files = 0
+    changed = 0
+    for name in sorted(os.listdir(csv_dir)):
+        if not name.endswith(".csv"):
+            continue
+        changed += normalize_stance_csv(os.path.join(csv_dir, name), column)
+        files += 1
+    return files, changed
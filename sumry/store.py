@@ -0,0 +1,356 @@
+"""要約 CSV の書き出しと、索引付きストア（SQLite + FTS5）。"""
+import os
+import re
+import csv
+import threading
+import time
+import sqlite3
+
+from . import metrics
+from .stance import normalize_stance
+from .srt import topic_terms
+from .llm import CSV_HEADER, parse_structured_output
+
+def _ensure_milliseconds(time_str):
+    if not time_str:
+        return time_str
+    return time_str + ",000" if "," not in time_str else time_str
+
+def build_summary_rows(csv_texts):
+    """
+    AI の出力（チャンクごとの CSV 文字列）を 6 列の行に揃える。
+    headline / overview が NULL の行は捨て、stance を正規化し、
+    timestamp をミリ秒付きの形式に揃える。
+    """
+    all_rows = []
+    for structured_text in csv_texts:
+        row = parse_structured_output(structured_text)
+        if row[0] == "NULL" or row[1] == "NULL":
+            continue
+        # 正規化
+        row[4] = normalize_stance(row[4])
+        if "〜" in row[5]:
+            parts = row[5].split("〜", 1)
+            row[5] = f"{_ensure_milliseconds(parts[0].strip())}〜{_ensure_milliseconds(parts[1].strip())}"
+        else:
+            row[5] = _ensure_milliseconds(row[5].strip())
+        all_rows.append(row)
+    return all_rows
+
+TOPIC_MERGE_SIMILARITY = 0.5
+TOPIC_MERGE_MAX_TAGS = 3
+
+_TAG_SEPARATOR_RE = re.compile(r"[,、，]")
+
+def _split_tags(tags):
+    return [tag.strip() for tag in _TAG_SEPARATOR_RE.split(tags) if tag.strip()]
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def _same_topic(row, other):
+    """カテゴリが同じで、タグか headline の 2-gram が十分重なれば同じ議題とみなす。"""
+    if row[2] != other[2]:
+        return False
+    if _jaccard(set(_split_tags(row[3])), set(_split_tags(other[3]))) >= TOPIC_MERGE_SIMILARITY:
+        return True
+    return _jaccard(set(topic_terms(row[0])), set(topic_terms(other[0]))) >= TOPIC_MERGE_SIMILARITY
+
+def merge_adjacent_topic_rows(rows):
+    """
+    build_summary_rows の行のうち、隣り合っていて同じ議題（_same_topic）の行を 1 行にまとめる
+    （--chunk-mode topics で 1 つの議題が複数のセグメントに分かれた場合の reduce）。
+    LLM は呼ばず、headline は最初の行、overview はつなげ、タグは和集合（先頭
+    TOPIC_MERGE_MAX_TAGS 個）、stance は後の行（判断不能なら前の行）、timestamp は
+    最初の開始〜最後の終了にする。
+    """
+    merged = []
+    for row in rows:
+        if not merged or not _same_topic(merged[-1], row):
+            merged.append(list(row))
+            continue
+        last = merged[-1]
+        last[1] = f"{last[1]} {row[1]}"
+        tags = _split_tags(last[3])
+        tags += [tag for tag in _split_tags(row[3]) if tag not in tags]
+        last[3] = ",".join(tags[:TOPIC_MERGE_MAX_TAGS])
+        if row[4] != "情報不足・判断不能":
+            last[4] = row[4]
+        last[5] = f"{last[5].split('〜', 1)[0]}〜{row[5].split('〜', 1)[-1]}"
+        metrics.METRICS.incr("topic_rows_merged")
+    return merged
+
+def unify_and_save_csv(csv_texts, output_csv_path, base_id=None, merge_topics=False):
+    """
+    csv_texts: list of CSV strings from AI
+    output_csv_path: path to the unified CSV
+    base_id: if given, an "id" column holding base_id is written as the first column
+    merge_topics: if True, adjacent rows on the same topic are merged (merge_adjacent_topic_rows)
+    This function concatenates multiple CSV strings (with identical headers) into one,
+    ensuring the final CSV is a horizontal format where each line is one record.
+    Returns the rows written (without the header).
+    """
+    with metrics.METRICS.span("unify_and_save_csv"):
+        header = list(CSV_HEADER)
+        rows = build_summary_rows(csv_texts)
+        if merge_topics:
+            rows = merge_adjacent_topic_rows(rows)
+        if base_id is not None:
+            header.insert(0, "id")
+            rows = [[base_id] + row for row in rows]
+
+        # Write to output CSV
+        with open(output_csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter=",", quotechar='"', quoting=csv.QUOTE_ALL)
+            writer.writerow(header)
+            writer.writerows(rows)
+    metrics.METRICS.incr("csv_rows_written", len(rows))
+    return rows
+
+def add_id_column_to_csv(csv_path, base_id):
+    """
+    Adds an ID column to the existing CSV file at csv_path.
+    The ID will be the base_id provided.
+    The file is rewritten row by row (same QUOTE_ALL quoting as unify_and_save_csv).
+    New code should pass base_id to unify_and_save_csv instead.
+    """
+    tmp_path = csv_path + ".id.tmp"
+    with metrics.METRICS.span("add_id_column_to_csv"):
+        with open(csv_path, "r", encoding="utf-8", newline="") as src, \
+                open(tmp_path, "w", encoding="utf-8", newline="") as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst, delimiter=",", quotechar='"', quoting=csv.QUOTE_ALL)
+            for i, row in enumerate(reader):
+                writer.writerow(["id" if i == 0 else base_id] + row)
+        os.replace(tmp_path, csv_path)
+
+class ConsolidatedCsvWriter:
+    """
+    確定した行を、日別または自治体別の集約 CSV に追記していく。
+
+    mode:
+        "day"          : 会議日ごと  <out_dir>/summaries_YYYY-MM-DD.csv
+                         （base_id に日付が無ければ処理日）
+        "municipality" : base_id の最初の "_" より前を自治体名とみなし
+                         <out_dir>/<自治体名>.csv
+    ヘッダーはファイルを新規作成したときだけ書く。
+    追記は id 単位の置き換えなので、確定の途中で落ちて同じファイルを
+    やり直しても行は重複しない。
+    """
+
+    def __init__(self, out_dir, mode="day"):
+        if mode not in ("day", "municipality"):
+            raise ValueError(f"unknown consolidation mode: {mode}")
+        self.out_dir = out_dir
+        self.mode = mode
+        self._lock = threading.Lock()
+        os.makedirs(out_dir, exist_ok=True)
+
+    def path_for(self, base_id):
+        if self.mode == "day":
+            day = meeting_date_from_id(base_id) or time.strftime('%Y-%m-%d')
+            return os.path.join(self.out_dir, f"summaries_{day}.csv")
+        return os.path.join(self.out_dir, f"{base_id.split('_', 1)[0]}.csv")
+
+    @staticmethod
+    def _remove_rows(path, base_id):
+        """path に base_id の行があれば、それを除いて書き直す。"""
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            existing = list(csv.reader(f))
+        kept = [row for row in existing if not row or row[0] != base_id]
+        if len(kept) == len(existing):
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f, delimiter=",", quotechar='"', quoting=csv.QUOTE_ALL).writerows(kept)
+        os.replace(tmp_path, path)
+        print(f"=== Replacing {len(existing) - len(kept)} earlier row(s) of {base_id} in {path} ===")
+
+    def append(self, base_id, rows):
+        """rows は id 列付きの行。書き込んだファイルのパスを返す。"""
+        path = self.path_for(base_id)
+        with self._lock:
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            if not new_file:
+                self._remove_rows(path, base_id)
+            with open(path, "a", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=",", quotechar='"', quoting=csv.QUOTE_ALL)
+                if new_file:
+                    writer.writerow(["id"] + CSV_HEADER)
+                writer.writerows(rows)
+        return path
+
+############################################
+# 要約の索引付きストア（SQLite + FTS5 全文検索）
+############################################
+_MEETING_DATE_RE = re.compile(r"(20\d{2})[-_.]?(0[1-9]|1[0-2])[-_.]?(0[1-9]|[12]\d|3[01])")
+
+def meeting_date_from_id(base_id):
+    """base_id に含まれる YYYYMMDD / YYYY-MM-DD 形式の日付を "YYYY-MM-DD" で返す。無ければ None。"""
+    match = _MEETING_DATE_RE.search(base_id)
+    return "-".join(match.groups()) if match else None
+
+class SummaryStore:
+    """
+    確定した要約行（id, headline, overview, category, tags, stance, timestamp）を
+    SQLite に取り込み、条件検索と全文検索をできるようにする。
+
+    * headline / overview は FTS5 の trigram トークナイザで索引する
+      （日本語を分かち書きせずに 3-gram で引ける。2 文字以下の語は LIKE で探す）
+    * category / stance / tags（1 タグ 1 行）/ 会議日には通常の索引を張る
+    * 取り込みは id 単位の置き換えなので、同じファイルを何度取り込んでも重複しない
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL なら NORMAL でも壊れない（電源断で最後のコミットを失うだけで、CSV から再取り込みできる）
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                row_no INTEGER NOT NULL,
+                headline TEXT,
+                overview TEXT,
+                category TEXT,
+                tags TEXT,
+                stance TEXT,
+                timestamp TEXT,
+                meeting_date TEXT,
+                source_path TEXT,
+                ingested_at REAL,
+                UNIQUE (id, row_no)
+            );
+            CREATE INDEX IF NOT EXISTS summaries_category ON summaries(category);
+            CREATE INDEX IF NOT EXISTS summaries_stance ON summaries(stance);
+            CREATE INDEX IF NOT EXISTS summaries_meeting_date ON summaries(meeting_date);
+            CREATE TABLE IF NOT EXISTS summary_tags (
+                summary_rowid INTEGER NOT NULL REFERENCES summaries(rowid) ON DELETE CASCADE,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (tag, summary_rowid)
+            );
+            """
+        )
+        self.fts = self._create_fts()
+        self._conn.commit()
+
+    def _create_fts(self):
+        try:
+            self._conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+                    headline, overview, content='summaries', content_rowid='rowid',
+                    tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS summaries_ai AFTER INSERT ON summaries BEGIN
+                    INSERT INTO summaries_fts(rowid, headline, overview)
+                    VALUES (new.rowid, new.headline, new.overview);
+                END;
+                CREATE TRIGGER IF NOT EXISTS summaries_ad AFTER DELETE ON summaries BEGIN
+                    INSERT INTO summaries_fts(summaries_fts, rowid, headline, overview)
+                    VALUES ('delete', old.rowid, old.headline, old.overview);
+                END;
+                """
+            )
+            return True
+        except sqlite3.OperationalError as e:
+            # FTS5 / trigram の無い古い SQLite では LIKE 検索だけにする
+            print(f"=== WARNING: full-text index unavailable ({e}); falling back to LIKE search ===")
+            return False
+
+    def ingest_rows(self, base_id, rows, source_path=None):
+        """
+        1 ファイル分の行（id 列付き、CSV と同じ並び）を取り込む。
+        同じ id の既存行は置き換える。取り込んだ行数を返す。
+        """
+        now = time.time()
+        meeting_date = meeting_date_from_id(base_id)
+        with self._lock, self._conn:
+            old = [r[0] for r in self._conn.execute(
+                "SELECT rowid FROM summaries WHERE id = ?", (base_id,))]
+            if old:
+                self._conn.executemany(
+                    "DELETE FROM summary_tags WHERE summary_rowid = ?", [(r,) for r in old])
+                self._conn.execute("DELETE FROM summaries WHERE id = ?", (base_id,))
+            for row_no, row in enumerate(rows):
+                _, headline, overview, category, tags, stance, timestamp = (list(row) + [""] * 7)[:7]
+                cur = self._conn.execute(
+                    "INSERT INTO summaries (id, row_no, headline, overview, category, tags, stance,"
+                    " timestamp, meeting_date, source_path, ingested_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (base_id, row_no, headline, overview, category, tags, stance, timestamp,
+                     meeting_date, source_path, now),
+                )
+                tag_list = {tag for tag in _split_tags(tags) if tag != "NULL"}
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO summary_tags (summary_rowid, tag) VALUES (?, ?)",
+                    [(cur.lastrowid, tag) for tag in sorted(tag_list)],
+                )
+        return len(rows)
+
+    def ingest_csv(self, csv_path):
+        """id 列付きの CSV を取り込む。id ごとに置き換えるので何度呼んでもよい。"""
+        by_id = {}
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header or header[0] != "id":
+                return 0
+            for row in reader:
+                if row:
+                    by_id.setdefault(row[0], []).append(row)
+        return sum(self.ingest_rows(base_id, rows, csv_path) for base_id, rows in by_id.items())
+
+    def ingest_dir(self, csv_dir):
+        """csv_dir 直下の全 CSV を取り込む。(ファイル数, 行数) を返す。"""
+        files = rows = 0
+        for name in sorted(os.listdir(csv_dir)):
+            if name.endswith(".csv"):
+                rows += self.ingest_csv(os.path.join(csv_dir, name))
+                files += 1
+        return files, rows
+
+    def search(self, text=None, category=None, stance=None, tag=None, year=None, limit=50):
+        """
+        条件に合う行を新しい会議日順に返す（dict のリスト）。
+        text は headline / overview の全文検索（空白区切りで AND）。
+        """
+        where, params = [], []
+        for term in (text or "").split():
+            if self.fts and len(term) >= 3:
+                where.append("s.rowid IN (SELECT rowid FROM summaries_fts WHERE summaries_fts MATCH ?)")
+                params.append('"' + term.replace('"', '""') + '"')
+            else:
+                like = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                where.append("(s.headline LIKE ? ESCAPE '\\' OR s.overview LIKE ? ESCAPE '\\')")
+                params += [like, like]
+        if category:
+            where.append("s.category = ?")
+            params.append(category)
+        if stance:
+            where.append("s.stance = ?")
+            params.append(stance)
+        if tag:
+            where.append("s.rowid IN (SELECT summary_rowid FROM summary_tags WHERE tag = ?)")
+            params.append(tag)
+        if year:
+            where.append("s.meeting_date >= ? AND s.meeting_date < ?")
+            params += [f"{int(year):04d}-01-01", f"{int(year) + 1:04d}-01-01"]
+        sql = ("SELECT s.id, s.headline, s.overview, s.category, s.tags, s.stance, s.timestamp,"
+               " s.meeting_date FROM summaries s")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.meeting_date DESC, s.id, s.row_no LIMIT ?"
+        params.append(limit)
+        columns = ["id", "headline", "overview", "category", "tags", "stance", "timestamp",
+                   "meeting_date"]
+        with self._lock:
+            return [dict(zip(columns, r)) for r in self._conn.execute(sql, params)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
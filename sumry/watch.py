@@ -0,0 +1,192 @@
+"""常駐（watch）モード: 新しい .srt が置かれたらすぐ処理する。"""
+import os
+import select
+import struct
+import threading
+import time
+
+from . import metrics
+from .llm import CircuitOpenError, classify_llm_error
+from .pipeline import FileJob
+
+############################################
+# 常駐（watch）モード: 新しい .srt が置かれたらすぐ処理する
+############################################
+class _Inotify:
+    """ctypes 経由の最小限の inotify ラッパー（Linux のみ）。"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, path):
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout):
+        """timeout 秒までイベントを待ち、変化のあったファイル名のリストを返す。"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            _, _, _, name_len = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+DEFAULT_WATCH_MAX_ATTEMPTS = 5
+DEFAULT_WATCH_RETRY_DELAY = 60.0
+WATCH_MAX_RETRY_DELAY = 3600.0
+
+class FileRetryTracker:
+    """
+    watch モードで要約に失敗したファイルの再試行を管理する。
+
+    * 再試行できるエラー（429・5xx・タイムアウト・接続エラー・サーキットブレーカー・
+      ローカルの I/O エラー）だけなら、
+      base_delay × 2^(失敗回数 - 1)（最大 WATCH_MAX_RETRY_DELAY 秒）待ってから再試行する
+    * 致命的なエラー（401・400 など classify_llm_error が "fatal" とするもの）か、
+      max_attempts 回失敗したファイルは止めておき（parked）、再起動するまで再試行しない
+    """
+
+    def __init__(self, max_attempts=DEFAULT_WATCH_MAX_ATTEMPTS, base_delay=DEFAULT_WATCH_RETRY_DELAY,
+                 max_delay=WATCH_MAX_RETRY_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempts = {}
+        self.parked = {}
+        self._waiting = {}  # base_id -> 再試行してよい時刻（monotonic）
+        self._lock = threading.Lock()
+
+    def failed(self, job, errors):
+        """失敗を記録する。再試行するなら "retry"、止めたなら "parked" を返す。"""
+        fatal = [e for e in errors
+                 if not isinstance(e, (CircuitOpenError, OSError)) and classify_llm_error(e) == "fatal"]
+        with self._lock:
+            attempts = self.attempts.get(job.base_id, 0) + 1
+            self.attempts[job.base_id] = attempts
+            if fatal or attempts >= self.max_attempts:
+                reason = f"fatal error: {fatal[0]}" if fatal else f"failed {attempts} time(s)"
+                self.parked[job.base_id] = reason
+                print(f"=== Parking {job.filename} ({reason}); "
+                      f"it will not be retried until restart ===")
+                metrics.METRICS.incr("watch_files_parked")
+                return "parked"
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            self._waiting[job.base_id] = time.monotonic() + delay
+        print(f"=== Leaving {job.filename} for retry in {delay:g}s: {len(errors)} error(s) "
+              f"(attempt {attempts}/{self.max_attempts}) ===")
+        metrics.METRICS.incr("watch_retries_scheduled")
+        return "retry"
+
+    def succeeded(self, base_id):
+        with self._lock:
+            self.attempts.pop(base_id, None)
+
+    def due(self):
+        """待ち時間が過ぎて再試行してよくなった base_id のリスト。"""
+        now = time.monotonic()
+        with self._lock:
+            ready = [base_id for base_id, at in self._waiting.items() if at <= now]
+            for base_id in ready:
+                del self._waiting[base_id]
+        return ready
+
+def watch_pending_jobs(api_dir, seen_ids, stop_event, settle_seconds=5.0, poll_interval=10.0,
+                       retry=None):
+    """
+    api_dir に置かれる .srt を監視し、書き込みが落ち着いたものから FileJob を yield する。
+
+    * inotify が使えればそれで変化を受け取り、使えなければ poll_interval ごとに走査する
+      （inotify でも取りこぼし対策に poll_interval ごとに走査する）
+    * サイズと mtime が settle_seconds 変化しなくなったファイルだけを処理対象にする
+      （アップロード途中のファイルを読まないため）
+    * seen_ids（処理済み / 処理中の base_id の集合）は呼び出し側と共有し、ここで追加していく
+    * stop_event がセットされたら新しいファイルの受け付けをやめて終了する
+    * retry（FileRetryTracker）を渡すと、失敗したファイルは retry.due() になってから拾い直す
+    """
+    try:
+        notifier = _Inotify(api_dir)
+        print(f"=== Watching {api_dir} (inotify) ===")
+    except (OSError, AttributeError) as e:
+        notifier = None
+        print(f"=== Watching {api_dir} (polling every {poll_interval}s; inotify unavailable: {e}) ===")
+
+    # filename -> (size, mtime_ns, 最後に変化を見た時刻)
+    candidates = {}
+
+    def consider(filename):
+        if not filename.endswith(".srt") or filename in candidates:
+            return
+        if os.path.splitext(filename)[0] in seen_ids:
+            return
+        candidates[filename] = (-1, -1, time.monotonic())
+
+    def scan():
+        for filename in os.listdir(api_dir):
+            consider(filename)
+
+    try:
+        scan()
+        last_scan = time.monotonic()
+        while not stop_event.is_set():
+            if retry is not None:
+                for base_id in retry.due():
+                    seen_ids.discard(base_id)
+                    consider(f"{base_id}.srt")
+            now = time.monotonic()
+            for filename in sorted(candidates):
+                size, mtime_ns, since = candidates[filename]
+                file_path = os.path.join(api_dir, filename)
+                try:
+                    st = os.stat(file_path)
+                except FileNotFoundError:
+                    del candidates[filename]
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                    candidates[filename] = (st.st_size, st.st_mtime_ns, now)
+                    continue
+                if now - since < settle_seconds:
+                    continue
+                del candidates[filename]
+                base_id = os.path.splitext(filename)[0]
+                seen_ids.add(base_id)
+                yield FileJob(filename, file_path, base_id)
+                if stop_event.is_set():
+                    return
+
+            wait = min(1.0, settle_seconds / 2) if candidates else 1.0
+            if notifier is not None:
+                for filename in notifier.read(wait):
+                    consider(filename)
+            else:
+                stop_event.wait(wait)
+            if time.monotonic() - last_scan >= poll_interval:
+                scan()
+                last_scan = time.monotonic()
+    finally:
+        if notifier is not None:
+            notifier.close()
+        print(f"=== Stopped watching {api_dir} ===")
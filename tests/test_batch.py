@@ -0,0 +1,51 @@
+import contextlib
+import io
+import os
+
+from sumry import srt, pipeline, batch
+
+
+def write_srt(path, minutes, step_ms=30000):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(minutes * 60000 // step_ms):
+            start_ms = i * step_ms
+            f.write(f"{i + 1}\n{srt.format_srt_time(start_ms)} --> "
+                    f"{srt.format_srt_time(start_ms + 5000)}\n○{i % 7}番議員　防災訓練の予算について伺います。\n\n")
+
+
+def run_batch(api_dir, responder):
+    client = batch.LocalBatchClient(os.path.join(api_dir, ".batch", "local"), responder, pending_polls=0)
+    done_srt_dir = os.path.join(api_dir, "done_srt")
+    os.makedirs(done_srt_dir, exist_ok=True)
+    jobs = pipeline.collect_pending_jobs(api_dir, set())
+    with contextlib.redirect_stdout(io.StringIO()):
+        return batch.run_batch(client, jobs, api_dir, done_srt_dir, poll_interval=0.0)
+
+
+def test_failed_chunks_keep_the_file_and_only_they_are_resubmitted(tmp_path):
+    api_dir = str(tmp_path)
+    write_srt(os.path.join(api_dir, "council_20250301.srt"), minutes=180)
+    requested = []
+
+    def flaky(custom_id, body):
+        requested.append(custom_id)
+        if custom_id.endswith("01:00:00,000"):
+            raise RuntimeError("server error")
+        return batch.LocalBatchClient.canned_response(custom_id, body)
+
+    assert run_batch(api_dir, flaky) == 0
+    assert len(requested) == 3
+    assert os.path.exists(os.path.join(api_dir, "council_20250301.srt"))
+    assert not os.path.exists(os.path.join(api_dir, "council_20250301.csv"))
+
+    def healthy(custom_id, body):
+        requested.append(custom_id)
+        return batch.LocalBatchClient.canned_response(custom_id, body)
+
+    requested.clear()
+    assert run_batch(api_dir, healthy) == 1
+    assert requested == ["council_20250301::01:00:00,000"]
+    assert os.path.exists(os.path.join(api_dir, "done_srt", "council_20250301.srt"))
+    with open(os.path.join(api_dir, "council_20250301.csv"), encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 4
+    assert not os.path.exists(os.path.join(api_dir, ".journal", "council_20250301.jsonl"))
@@ -0,0 +1,65 @@
+import contextlib
+import csv
+import io
+import random
+
+import pytest
+
+from fake_llm_server import FakeLLMServer
+from sumry import srt, cli
+
+WORDS = ("子ども食堂 学校給食 防災 避難所 公共交通 予算 条例 議員 市長 答弁 "
+         "質問 検討 推進 課題 地域 支援 高齢者 福祉 教育 環境").split()
+
+
+def write_srt(path, texts, offset_ms=0, step_ms=10000):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, text in enumerate(texts):
+            start_ms = offset_ms + i * step_ms
+            f.write(f"{i + 1}\n{srt.format_srt_time(start_ms)} --> "
+                    f"{srt.format_srt_time(start_ms + 5000)}\n{text}\n\n")
+
+
+def read_rows(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+    fake = FakeLLMServer()
+    base_url = fake.start()
+    yield fake, base_url
+    fake.stop()
+
+
+def run_main(argv):
+    with contextlib.redirect_stdout(io.StringIO()):
+        cli.main(argv)
+
+
+def test_shifted_duplicate_file_reuses_summaries_with_shifted_timestamps(tmp_path, server):
+    fake, base_url = server
+    rng = random.Random(0)
+    texts = ["".join(rng.choice(WORDS) for _ in range(6)) + "について伺います" for _ in range(1080)]
+    argv = ["--api-dir", str(tmp_path), "--base-url", base_url, "--no-cache", "--no-prefilter",
+            "--no-index"]
+
+    write_srt(tmp_path / "a_20250301.srt", texts)
+    run_main(argv)
+    source = read_rows(tmp_path / "a_20250301.csv")
+    assert [row["timestamp"].split("〜")[0] for row in source] == \
+        ["00:00:00,000", "01:00:00,000", "02:00:00,000"]
+
+    # 同じ内容を 10 分遅れで始まる録画として置く
+    requests = fake.status_counts.get(200, 0)
+    write_srt(tmp_path / "b_20250302.srt", texts, offset_ms=10 * 60 * 1000)
+    run_main(argv)
+    assert fake.status_counts.get(200, 0) == requests  # LLM は呼ばずに使い回す
+
+    mirror = read_rows(tmp_path / "b_20250302.csv")
+    assert [row["timestamp"].split("〜")[0] for row in mirror] == \
+        ["00:10:00,000", "01:10:00,000", "02:10:00,000"]
+    assert mirror[1]["overview"].startswith("(01:10:00)")
+    assert [row["id"] for row in mirror] == ["b_20250302"] * 3
@@ -0,0 +1,14 @@
+from sumry.store import SummaryStore, _split_tags
+
+
+def test_tags_split_on_japanese_separators(tmp_path):
+    store = SummaryStore(str(tmp_path / "summaries.sqlite"))
+    store.ingest_rows("council_20250301", [
+        ["council_20250301", "給食費の無償化", "概要", "教育・子育て", "給食費、無償化，学校給食,NULL",
+         "賛成", "00:00:00,000〜00:10:00,000"],
+    ])
+
+    for tag in ("給食費", "無償化", "学校給食"):
+        assert [row["id"] for row in store.search(tag=tag)] == ["council_20250301"]
+    assert store.search(tag="NULL") == []
+    assert _split_tags("給食費、無償化，学校給食") == ["給食費", "無償化", "学校給食"]
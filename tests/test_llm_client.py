@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fake_llm_server import FakeLLMServer
+from sumry import llm
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+    server = FakeLLMServer(retry_after=0.05, seed=1)
+    server.start()
+    yield server
+    server.stop()
+
+
+def make_client(server, **kwargs):
+    options = dict(base_url=server.base_url, max_retries=8, base_backoff=0.05, max_backoff=0.5,
+                   max_concurrency=8, reset_timeout=0.5)
+    options.update(kwargs)
+    return llm.LLMClient(**options)
+
+
+def call_many(client, n):
+    def call(i):
+        client.create(model="fake", max_tokens=50, messages=[
+            {"role": "user", "content": f"以下が対象テキストです：\nTimestamp: 00:00:{i:02d},000\n\n発言"}])
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(call, range(n)))
+
+
+def test_burst_of_429s_backs_off_without_opening_the_circuit(fake):
+    fake.error_429 = 0.6
+    client = make_client(fake)
+
+    call_many(client, 40)
+
+    stats = client.stats()
+    assert fake.status_counts[200] == 40
+    assert stats["throttled"] == fake.status_counts[429] > 0
+    assert stats["circuit_opened"] == 0
+
+
+def test_mixed_429_and_5xx_are_retried(fake):
+    fake.error_429 = 0.3
+    fake.error_5xx = 0.3
+    client = make_client(fake)
+
+    call_many(client, 40)
+
+    assert fake.status_counts[200] == 40
+    assert client.stats()["retries"] == sum(n for status, n in fake.status_counts.items() if status != 200)
+
+
+def test_open_circuit_waits_instead_of_failing(fake):
+    fake.error_5xx = 1.0
+    client = make_client(fake, failure_threshold=3)
+    # 障害は回路が開いてしばらくしてから直る
+    def recover():
+        while client.breaker.state != "open":
+            time.sleep(0.01)
+        time.sleep(0.2)
+        fake.error_5xx = 0.0
+    threading.Thread(target=recover, daemon=True).start()
+
+    call_many(client, 8)
+
+    assert fake.status_counts[200] == 8
+    assert client.stats()["circuit_opened"] >= 1
+    assert client.breaker.state == "closed"
+
+
+def test_gives_up_after_max_retries(fake):
+    fake.error_5xx = 1.0
+    client = make_client(fake, max_retries=2, reset_timeout=0.05)
+
+    with pytest.raises(Exception) as excinfo:
+        call_many(client, 1)
+
+    assert llm.classify_llm_error(excinfo.value) in ("retry", "throttle")
+    assert sum(fake.status_counts.values()) == 3
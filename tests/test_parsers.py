@@ -0,0 +1,88 @@
+import pytest
+
+from sumry import llm
+
+HEADER = "headline,overview,category,tags,stance,timestamp\n"
+ROW = ('"給食費の無償化","国の動向を見て、来年度に判断する。\n財源は""調整中""。",'
+       '教育・子育て,"給食費,無償化",検討中,00:12:00〜00:20:00\n')
+RECORD = ["給食費の無償化", "国の動向を見て、来年度に判断する。\n財源は\"調整中\"。",
+          "教育・子育て", "給食費,無償化", "検討中", "00:12:00〜00:20:00"]
+
+
+def feed(text, step=None):
+    """text を step 文字ずつ（None なら一度に）流し込み、close まで済ませた parser を返す。"""
+    parser = llm.CsvRecordParser()
+    step = step or max(1, len(text))
+    for i in range(0, len(text), step):
+        if parser.feed(text[i:i + step]):
+            break
+    parser.close()
+    return parser
+
+
+def test_quoted_commas_newlines_and_escaped_quotes():
+    parser = feed(ROW)
+    assert parser.complete
+    assert parser.record == RECORD
+
+
+def test_header_blank_lines_and_fences_are_skipped():
+    parser = feed("```csv\n\n" + HEADER + ROW + "```\n")
+    assert parser.complete
+    assert parser.record == RECORD
+
+
+@pytest.mark.parametrize("step", [1, 2, 7, 50])
+def test_record_is_the_same_however_the_deltas_are_split(step):
+    parser = feed("```\n" + HEADER + ROW, step)
+    assert parser.record == RECORD
+    assert parser.off_format is None
+
+
+def test_stops_at_the_closing_quote_of_the_last_field():
+    parser = llm.CsvRecordParser()
+    # 閉じ引用符か "" かは次の 1 文字で決まる
+    assert not parser.feed('a,b,c,d,e,"00:00:00〜00:01:00"')
+    assert parser.feed(' 以上です。')
+    assert parser.record == ["a", "b", "c", "d", "e", "00:00:00〜00:01:00"]
+    assert parser.complete
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("a,b,c\n", "too_few_fields"),
+    ("a,b,c,d,e,f,g\n", "too_many_fields"),
+    ("x" * (llm.CsvRecordParser.MAX_HEADLINE_CHARS + 1), "headline_too_long"),
+    ('"' + "x" * (llm.CsvRecordParser.MAX_HEADLINE_CHARS + 1), "headline_too_long"),
+    (HEADER, "incomplete"),
+    ("", "incomplete"),
+])
+def test_off_format_reasons(text, reason):
+    parser = feed(text)
+    assert parser.off_format == reason
+    assert not parser.complete
+
+
+def test_unterminated_last_line_is_closed():
+    parser = feed("a,b,c,d,e,f")
+    assert parser.complete
+    assert parser.record == ["a", "b", "c", "d", "e", "f"]
+
+
+def test_bracket_reply_is_read_to_the_end_and_parsed():
+    text = ("【headline】給食費の無償化\n【overview】来年度に判断する。\n【category】教育・子育て\n"
+            "【tags】給食費,無償化\n【stance】検討中\n【timestamp】00:12:00〜00:20:00\n")
+    parser = llm.CsvRecordParser()
+    for line in text.splitlines(keepends=True):
+        assert not parser.feed(line)
+    parser.close()
+    assert parser.bracket
+    assert parser.record is None and parser.off_format is None
+    assert parser.text == text
+    assert llm.parse_structured_output(parser.text) == [
+        "給食費の無償化", "来年度に判断する。", "教育・子育て", "給食費,無償化", "検討中",
+        "00:12:00〜00:20:00"]
+
+
+def test_parse_structured_output_matches_the_streaming_parser():
+    assert llm.parse_structured_output("```csv\n" + HEADER + ROW + "```") == RECORD
+    assert llm.parse_structured_output("a,b,c\n") == ["a", "b", "c", "NULL", "NULL", "NULL"]
@@ -0,0 +1,178 @@
+import contextlib
+import io
+import os
+import threading
+
+import pytest
+
+from fake_llm_server import FakeLLMServer, canned_reply
+from sumry import srt, llm, store, pipeline, watch
+from sumry.journal import open_chunk_journal
+
+
+def write_srt(path, minutes, step_ms=30000):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(minutes * 60000 // step_ms):
+            start_ms = i * step_ms
+            f.write(f"{i + 1}\n{srt.format_srt_time(start_ms)} --> "
+                    f"{srt.format_srt_time(start_ms + 5000)}\n○{i % 7}番議員　防災訓練の予算について伺います。\n\n")
+
+
+@pytest.fixture
+def api_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+    server = FakeLLMServer()
+    base_url = server.start()
+    monkeypatch.setattr(llm, "LLM_CLIENT", llm.LLMClient(base_url=base_url, max_retries=0))
+    monkeypatch.setattr(llm, "LLM_CACHE", None)
+    os.makedirs(tmp_path / "done_srt")
+    yield str(tmp_path), server
+    server.stop()
+
+
+def run_pipeline(api_dir, jobs=None, **kwargs):
+    """別スレッドで run_pipeline を回し、固まったら失敗にする。(戻り値, 例外) を返す。"""
+    outcome = {}
+
+    def target():
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                outcome["processed"] = pipeline.run_pipeline(
+                    pipeline.collect_pending_jobs(api_dir, set()) if jobs is None else jobs,
+                    api_dir, os.path.join(api_dir, "done_srt"), prefilter=None, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "run_pipeline hung"
+    return outcome.get("processed"), outcome.get("error")
+
+
+def test_submit_failure_leaves_the_file_and_finishes_the_rest(api_dir, monkeypatch):
+    api_dir, _ = api_dir
+    write_srt(os.path.join(api_dir, "a_20250101.srt"), 120)
+    write_srt(os.path.join(api_dir, "b_20250101.srt"), 120)
+    open_journal = open_chunk_journal
+
+    def broken(directory, base_id):
+        if base_id.startswith("a_"):
+            raise OSError("disk gone")
+        return open_journal(directory, base_id)
+
+    monkeypatch.setattr(pipeline, "open_chunk_journal", broken)
+    seen_ids = {"a_20250101", "b_20250101"}
+
+    processed, error = run_pipeline(api_dir, seen_ids=seen_ids)
+
+    assert (processed, error) == (1, None)
+    assert os.path.exists(os.path.join(api_dir, "a_20250101.srt"))
+    assert os.path.exists(os.path.join(api_dir, "b_20250101.csv"))
+    assert seen_ids == {"b_20250101"}
+
+
+def test_failing_job_source_is_raised_instead_of_hanging(api_dir):
+    api_dir, _ = api_dir
+
+    def jobs():
+        raise OSError("listdir failed")
+        yield
+
+    processed, error = run_pipeline(api_dir, jobs())
+
+    assert processed is None
+    assert isinstance(error, OSError)
+
+
+def test_resume_from_journal_requests_only_the_missing_chunks(api_dir):
+    api_dir, server = api_dir
+    path = os.path.join(api_dir, "c_20250101.srt")
+    write_srt(path, 300)
+    chunks = srt.chunk_subs(srt.iter_srt_subs(path))
+    assert len(chunks) == 5
+    # 2 チャンク分を記録したところで落ち、3 つ目は書きかけの行が残った状態
+    journal = open_chunk_journal(api_dir, "c_20250101")
+    for chunk_data in chunks[:2]:
+        journal.record(chunk_data, canned_reply(
+            llm.build_summary_messages(chunk_data['text'], chunk_data['timestamp'])))
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"timestamp": "%s", "text_sha1": "' % chunks[2]['timestamp'])
+    requested = []
+
+    def reply(messages):
+        requested.append(messages[-1]["content"].split("Timestamp: ", 1)[1].split()[0])
+        return server_reply(messages)
+
+    server_reply, server.reply = server.reply, reply
+
+    processed, error = run_pipeline(api_dir)
+
+    assert (processed, error) == (1, None)
+    assert sorted(requested) == [chunk_data['timestamp'] for chunk_data in chunks[2:]]
+    with open(os.path.join(api_dir, "c_20250101.csv"), encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 1 + len(chunks)
+    assert not os.path.exists(journal.path)
+    assert os.path.exists(os.path.join(api_dir, "done_srt", "c_20250101.srt"))
+
+
+def test_crash_while_writing_the_csv_leaves_no_partial_file(api_dir, monkeypatch):
+    api_dir, _ = api_dir
+    write_srt(os.path.join(api_dir, "d_20250101.srt"), 180)
+    unify = store.unify_and_save_csv
+
+    def crash_after_writing(csv_texts, output_csv_path, *args, **kwargs):
+        unify(csv_texts, output_csv_path, *args, **kwargs)
+        raise OSError("power cut")
+
+    monkeypatch.setattr(pipeline, "unify_and_save_csv", crash_after_writing)
+    processed, error = run_pipeline(api_dir)
+
+    assert (processed, error) == (0, None)
+    assert not os.path.exists(os.path.join(api_dir, "d_20250101.csv"))
+    assert os.path.exists(os.path.join(api_dir, "d_20250101.srt"))
+    assert len(open_chunk_journal(api_dir, "d_20250101")) == 3
+
+
+def test_consolidated_rows_are_not_duplicated_when_a_file_is_redone(api_dir):
+    api_dir, _ = api_dir
+    write_srt(os.path.join(api_dir, "tokyo_20250301.srt"), 180)
+    consolidator = store.ConsolidatedCsvWriter(os.path.join(api_dir, "consolidated"), "day")
+
+    assert run_pipeline(api_dir, consolidator=consolidator) == (1, None)
+    # 集約 CSV に追記したあと、SRT を移動する前に落ちた場合と同じ状態に戻す
+    os.replace(os.path.join(api_dir, "done_srt", "tokyo_20250301.srt"),
+               os.path.join(api_dir, "tokyo_20250301.srt"))
+    assert run_pipeline(api_dir, consolidator=consolidator) == (1, None)
+
+    assert os.listdir(os.path.join(api_dir, "consolidated")) == ["summaries_2025-03-01.csv"]
+    with open(os.path.join(api_dir, "consolidated", "summaries_2025-03-01.csv"), encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith('"id"')
+    assert len(lines) == 1 + 3
+
+
+def test_finalize_failure_goes_back_to_the_watch_queue(api_dir, monkeypatch):
+    api_dir, _ = api_dir
+    write_srt(os.path.join(api_dir, "e_20250101.srt"), 180)
+    write_srt(os.path.join(api_dir, "f_20250101.srt"), 180)
+
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pipeline, "unify_and_save_csv", broken)
+    seen_ids = {"e_20250101", "f_20250101"}
+    retry = watch.FileRetryTracker(max_attempts=3, base_delay=0.0)
+
+    assert run_pipeline(api_dir, jobs=[pipeline.FileJob("e_20250101.srt",
+                                                    os.path.join(api_dir, "e_20250101.srt"),
+                                                    "e_20250101")],
+                        seen_ids=seen_ids) == (0, None)
+    assert run_pipeline(api_dir, jobs=[pipeline.FileJob("f_20250101.srt",
+                                                    os.path.join(api_dir, "f_20250101.srt"),
+                                                    "f_20250101")],
+                        seen_ids=seen_ids, retry=retry) == (0, None)
+
+    assert seen_ids == {"f_20250101"}
+    assert retry.attempts == {"f_20250101": 1}
+    assert retry.due() == ["f_20250101"]
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fake_llm_server import FakeLLMServer
+from sumry import srt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_srt(path, minutes, step_ms=30000):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(minutes * 60000 // step_ms):
+            start_ms = i * step_ms
+            f.write(f"{i + 1}\n{srt.format_srt_time(start_ms)} --> "
+                    f"{srt.format_srt_time(start_ms + 5000)}\n○{i % 7}番議員　防災訓練の予算について伺います。\n\n")
+
+
+@pytest.mark.parametrize("mode", ["files", "chunks"])
+def test_workers_share_an_api_dir_without_duplicate_work(tmp_path, mode):
+    api_dir = tmp_path / "api"
+    api_dir.mkdir()
+    expected_chunks = 0
+    for i in range(4):
+        path = str(api_dir / f"council_2025010{i + 1}.srt")
+        write_srt(path, 180)
+        expected_chunks += len(srt.chunk_subs(srt.iter_srt_subs(path)))
+    server = FakeLLMServer(latency=0.05)
+    base_url = server.start()
+    env = dict(os.environ, OPENAI_API_KEY="sk-fake", SUMRY_STATE_DIR=str(tmp_path / "state"))
+    try:
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-m", "sumry", "--api-dir", str(api_dir), "--base-url", base_url,
+                 "--queue", mode, "--worker-id", f"worker{n}", "--workers", "2", "--no-cache",
+                 "--no-dedup", "--no-prefilter", "--no-index"],
+                cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            for n in range(3)
+        ]
+        logs = [proc.communicate(timeout=120)[0] for proc in procs]
+    finally:
+        server.stop()
+
+    assert [proc.returncode for proc in procs] == [0, 0, 0], logs
+    saved = [line for log in logs for line in log.splitlines() if line.startswith("CSV saved to:")]
+    assert len(saved) == len(set(saved)) == 4
+    assert sorted(name for name in os.listdir(api_dir) if name.endswith(".csv")) == [
+        f"council_2025010{i + 1}.csv" for i in range(4)]
+    assert not [name for name in os.listdir(api_dir) if name.endswith(".srt")]
+    assert server.status_counts == {200: expected_chunks}
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from sumry import srt, llm, pipeline
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.charged = []
+
+    def acquire(self, tokens=0):
+        self.charged.append(tokens)
+
+
+class StubClient:
+    """messages に応じた固定の応答を返す LLMClient の代わり。"""
+
+    stream_responses = False
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, messages, max_tokens, temperature):
+        self.calls += 1
+        content = "Yes" if max_tokens == llm.FILTER_MAX_TOKENS else "row"
+        message = type("Message", (), {"content": content})
+        choice = type("Choice", (), {"message": message})
+        return type("Response", (), {"choices": [choice], "usage": None})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    stub = StubClient()
+    monkeypatch.setattr(llm, "LLM_CLIENT", stub)
+    monkeypatch.setattr(llm, "LLM_CACHE", None)
+    return stub
+
+
+CHUNK = {"text": "○議長　次に、日程第2を議題とします。", "timestamp": "00:00:00,000"}
+
+
+def test_summary_charge_includes_system_prompt(client):
+    limiter = RecordingLimiter()
+
+    assert llm.summarize_chunk(CHUNK["text"], "", CHUNK["timestamp"], limiter) == "row"
+
+    assert limiter.charged == [srt.count_message_tokens(
+        llm.build_summary_messages(CHUNK["text"], CHUNK["timestamp"])) + llm.SUMMARY_MAX_TOKENS]
+    assert limiter.charged[0] > srt.count_tokens(llm.SUMMARY_INSTRUCTIONS) + llm.SUMMARY_MAX_TOKENS
+
+
+def test_check_call_is_charged_before_summary(client):
+    limiter = RecordingLimiter()
+
+    assert pipeline._summarize_chunk_task(CHUNK, "", limiter, None, True) == "row"
+
+    assert limiter.charged[0] == (srt.count_message_tokens(llm.build_filter_messages(CHUNK["text"]))
+                                  + llm.FILTER_MAX_TOKENS)
+    assert len(limiter.charged) == 2
+
+
+def test_cache_hits_do_not_use_the_rate_limit(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(llm, "LLM_CACHE", llm.LLMCache(str(tmp_path / "cache.sqlite")))
+    chunks = [dict(CHUNK, timestamp=f"00:0{i}:00,000") for i in range(8)]
+    for chunk_data in chunks:
+        pipeline._summarize_chunk_task(chunk_data, "", None, None, False)
+    client.calls = 0
+    # 1 分に 1 回: 送信が 2 回あれば 1 分待たされる
+    limiter = llm.RateLimiter(requests_per_minute=1)
+
+    started = time.monotonic()
+    for chunk_data in chunks:
+        assert pipeline._summarize_chunk_task(chunk_data, "", limiter, None, False) == "row"
+
+    assert client.calls == 0
+    assert time.monotonic() - started < 1.0
+    llm.LLM_CACHE.close()
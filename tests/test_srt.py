@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from sumry import srt
+
+
+def write(tmp_path, content, name="council.srt", newline="\n", bom=False):
+    path = tmp_path / name
+    data = content.replace("\n", newline).encode("utf-8")
+    path.write_bytes((b"\xef\xbb\xbf" if bom else b"") + data)
+    return str(path)
+
+
+SAMPLE = """1
+00:00:01,000 --> 00:00:03,500
+○議長　ただいまから会議を開きます。
+
+2
+00:00:04,000 --> 00:00:08,250
+○3番議員　防災訓練について
+伺います。
+
+3
+01:02:03,004 --> 01:02:05,000
+○市長　お答えします。
+"""
+EXPECTED = [
+    srt.SrtSub(1, 1000, 3500, "○議長　ただいまから会議を開きます。"),
+    srt.SrtSub(2, 4000, 8250, "○3番議員　防災訓練について\n伺います。"),
+    srt.SrtSub(3, 3723004, 3725000, "○市長　お答えします。"),
+]
+
+
+def test_multi_line_text(tmp_path):
+    assert list(srt.iter_srt_subs(write(tmp_path, SAMPLE))) == EXPECTED
+
+
+def test_bom_is_ignored(tmp_path):
+    assert list(srt.iter_srt_subs(write(tmp_path, SAMPLE, bom=True))) == EXPECTED
+
+
+def test_crlf_line_endings(tmp_path):
+    assert list(srt.iter_srt_subs(write(tmp_path, SAMPLE, newline="\r\n"))) == EXPECTED
+
+
+def test_blank_trailing_blocks_and_extra_blank_lines(tmp_path):
+    content = "\n\n" + SAMPLE.replace("\n\n", "\n\n\n\n") + "\n\n   \n\n"
+    assert list(srt.iter_srt_subs(write(tmp_path, content))) == EXPECTED
+
+
+def test_missing_index_line_gets_the_running_number(tmp_path):
+    content = SAMPLE.replace("2\n00:00:04,000", "00:00:04,000")
+    assert list(srt.iter_srt_subs(write(tmp_path, content))) == EXPECTED
+
+
+def test_block_without_timing_is_skipped(tmp_path):
+    content = "0\nタイトル\n\n" + SAMPLE
+    assert list(srt.iter_srt_subs(write(tmp_path, content))) == EXPECTED
+
+
+def test_parse_srt_as_subs_keeps_the_old_tuple_format(tmp_path):
+    assert srt.parse_srt_as_subs(write(tmp_path, SAMPLE)) == [
+        (1, "00:00:01,000", "○議長　ただいまから会議を開きます。"),
+        (2, "00:00:04,000", "○3番議員　防災訓練について\n伺います。"),
+        (3, "01:02:03,004", "○市長　お答えします。"),
+    ]
+
+
+def pysrt_parse(file_path):
+    """pysrt を使っていた旧 parse_srt_as_subs。"""
+    pysrt = pytest.importorskip("pysrt")
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        subs = pysrt.from_string(f.read())
+    return [(sub.index, f"{sub.start.hours:02}:{sub.start.minutes:02}:{sub.start.seconds:02},"
+                        f"{sub.start.milliseconds:03}", sub.text) for sub in subs]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_the_old_pysrt_output(tmp_path, seed):
+    rng = random.Random(seed)
+    blocks = []
+    start_ms = 0
+    for i in range(200):
+        start_ms += rng.randint(500, 20000)
+        lines = [f"○{rng.randint(1, 20)}番議員　" + "質疑" * rng.randint(1, 5)
+                 for _ in range(rng.randint(1, 3))]
+        blocks.append(f"{i + 1}\n{srt.format_srt_time(start_ms)} --> "
+                      f"{srt.format_srt_time(start_ms + 1500)}\n" + "\n".join(lines) + "\n")
+    path = write(tmp_path, "\n".join(blocks), newline=rng.choice(["\n", "\r\n"]))
+
+    assert srt.parse_srt_as_subs(path) == pysrt_parse(path)
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from sumry import stance
+
+
+def linear_scan(canon, text):
+    """旧実装の normalize_stance の照合: 長い順に並べて最初に含まれたキー。"""
+    for key in sorted(canon.keys(), key=len, reverse=True):
+        if key in text:
+            return canon[key]
+    return None
+
+
+def random_text(rng, keys, alphabet, max_len=30):
+    """キーの断片・キーそのもの・キーに使われる文字を混ぜた文字列。"""
+    parts = []
+    while sum(map(len, parts)) < rng.randint(0, max_len):
+        roll = rng.random()
+        if roll < 0.3:
+            parts.append(rng.choice(keys))
+        elif roll < 0.6:
+            key = rng.choice(keys)
+            start = rng.randrange(len(key))
+            parts.append(key[start:rng.randint(start + 1, len(key))])
+        else:
+            parts.append(rng.choice(alphabet))
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_the_sorted_linear_scan_on_stance_canon(seed):
+    rng = random.Random(seed)
+    keys = list(stance.STANCE_CANON)
+    alphabet = sorted(set("".join(keys))) + list("、。 ・NULLabc")
+    matcher = stance.StanceMatcher(stance.STANCE_CANON)
+    for _ in range(2000):
+        text = random_text(rng, keys, alphabet)
+        assert matcher.match(text) == linear_scan(stance.STANCE_CANON, text), text
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_the_sorted_linear_scan_on_overlapping_keys(seed):
+    # 接頭辞・接尾辞を共有する短いキーで、失敗リンクをたどる経路を多く通す
+    rng = random.Random(seed)
+    keys = sorted({"".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(12)})
+    rng.shuffle(keys)
+    canon = {key: f"label{n}" for n, key in enumerate(keys)}
+    matcher = stance.StanceMatcher(canon)
+    for _ in range(2000):
+        text = random_text(rng, keys, list("abcd"), max_len=12)
+        assert matcher.match(text) == linear_scan(canon, text), (canon, text)
+
+
+def test_normalize_stance_falls_back_to_the_stripped_text():
+    assert stance.normalize_stance("NULL") == "情報不足・判断不能"
+    assert stance.normalize_stance(" 未分類の回答 ") == "未分類の回答"
+    assert stance.normalize_stance("様子見としたい") == "慎重・消極的"
@@ -0,0 +1,47 @@
+from sumry import llm, pipeline, watch
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def job(base_id="w_20250101"):
+    return pipeline.FileJob(f"{base_id}.srt", f"/tmp/{base_id}.srt", base_id)
+
+
+def test_retryable_failures_back_off_and_park_after_max_attempts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(watch.time, "monotonic", lambda: now[0])
+    retry = watch.FileRetryTracker(max_attempts=3, base_delay=10.0)
+
+    assert retry.failed(job(), [StatusError(503)]) == "retry"
+    assert retry.due() == []
+    now[0] += 10.0
+    assert retry.due() == ["w_20250101"]
+    assert retry.due() == []
+
+    assert retry.failed(job(), [StatusError(500)]) == "retry"
+    now[0] += 19.0
+    assert retry.due() == []  # 2 回目は 20 秒待つ
+    now[0] += 1.0
+    assert retry.due() == ["w_20250101"]
+
+    assert retry.failed(job(), [llm.CircuitOpenError("open")]) == "parked"
+    assert "w_20250101" in retry.parked
+    now[0] += 3600.0
+    assert retry.due() == []
+
+
+def test_fatal_errors_are_parked_immediately():
+    retry = watch.FileRetryTracker()
+    assert retry.failed(job(), [StatusError(503), StatusError(401)]) == "parked"
+    assert retry.due() == []
+
+
+def test_success_resets_attempts():
+    retry = watch.FileRetryTracker(max_attempts=2, base_delay=0.0)
+    assert retry.failed(job(), [StatusError(429)]) == "retry"
+    retry.succeeded("w_20250101")
+    assert retry.failed(job(), [StatusError(429)]) == "retry"